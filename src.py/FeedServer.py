@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+"""
+MIT License
+
+Copyright (c) 2020-24 PyKOB - MorseKOB in Python
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+"""
+FeedServer.py
+
+Runs many feeds (each a wire, station ID, and a text file, recording, or
+Scheduled Feed spec to send) in one process. The feeds share one network
+multiplexer thread, the shared scheduler, and the code stream Sender cache,
+rather than each needing its own MRT or Feed process.
+
+The feeds are read from a JSON manifest:
+    {
+        "server_url": "mtc-kob.dyndns.org:7890",        (optional)
+        "feeds": [
+            {
+                "name": "news",                         (required, unique)
+                "wire": 105,                            (required)
+                "station": "News, 20 wpm, AC",          (required)
+                "file": "news.txt",                     (one of 'file', 'recording', or 'schedfeed')
+                "wpm": 20,                              (file & schedfeed, default 20)
+                "cwpm": 0,                              (default: same as 'wpm')
+                "code_type": "american",                (or 'international')
+                "spacing": "char",                      (or 'none' or 'word')
+                "repeat": true,                         (file & recording, default true)
+                "repeat_delay": 5.0,                    (seconds, default 5)
+                "max_silence": 5.0,                     (recording, longest pause in seconds)
+                "wait": 0.0,                            (seconds the wire must be idle, default 0 (don't wait))
+                "require_listener": true,               (default: true, except for schedfeed)
+                "enabled": true
+            }
+        ]
+    }
+Relative paths are relative to the manifest's directory.
+
+The manifest (and the Scheduled Feed specs) are checked for changes every
+few seconds, or when the process receives SIGHUP. Only the feeds that were
+added, changed, or removed are started/stopped. Changes to a text file or
+recording are picked up on the feed's next pass.
+
+Example:
+    python FeedServer.py feeds.json
+"""
+from pykob import VERSION, codestream, config, config2, log, scheduler
+from pykob.codestream import FileCodeStream, RecordingCodeStream
+from pykob.internet import Internet, Multiplexer
+from pykob.morse import Sender
+from pykob.schedfeed import SchedFeedProcessor
+
+import argparse
+import json
+import os
+from pathlib import Path
+import signal
+import sys
+from threading import Event, Lock
+import time
+import traceback
+from typing import Any
+
+FEEDSERVER_VERSION_TEXT = "FeedServer " + VERSION
+
+MANIFEST_CHECK = 5.0        # Seconds between checks for manifest (and spec) changes
+LISTENER_TIMEOUT = 30.0     # Seconds to keep sending after the last indication of a live listener
+LISTENER_CHECK = 5.0        # Seconds between checks for a listener when there isn't one
+SENDER_ACTIVE = 2.0         # Seconds after the last code received that the wire is considered active
+OPEN_CIRCUIT = (-0x7fff, +2, -1000, +2)  # Open the circuit and wait 1 second
+OPEN_CIRCUIT_SECS = 1.0
+CLOSE_CIRCUIT = (-1000, +1)              # Close the circuit after 1 second
+
+
+class FeedSpecError(Exception):
+    pass
+
+
+class FeedRunner:
+    """
+    Sends one feed to a wire. The feed is stepped by jobs on the shared
+    scheduler, one for each code sequence (or pause), so no threads are needed.
+    A step must not block. Sending doesn't look up the server address (that
+    is done by the Internet object's own thread).
+    """
+
+    def __init__(self, name, spec, base_dir, server_url, mux):
+        # type: (str, dict[str,Any], Path, str|None, Multiplexer) -> None
+        self._name = name
+        self._server_url = server_url
+        self._mux = mux
+        try:
+            self._wire = int(spec["wire"])
+            self._station = str(spec["station"])
+            self._wpm = int(spec.get("wpm", 20))
+            self._cwpm = int(spec.get("cwpm", 0))
+            self._code_type = config.CodeType[str(spec.get("code_type", "american")).lower()]
+            self._spacing = config.Spacing[str(spec.get("spacing", "char")).lower()]
+            self._repeat = bool(spec.get("repeat", True))
+            self._repeat_delay = float(spec.get("repeat_delay", 5.0))
+            self._wait = float(spec.get("wait", 0.0))
+            max_silence = float(spec.get("max_silence", 5.0))
+        except KeyError as ke:
+            raise FeedSpecError("Feed '{}' is missing or has an invalid value for {}".format(name, ke))
+        except (TypeError, ValueError) as ex:
+            raise FeedSpecError("Feed '{}' has an invalid value: {}".format(name, ex))
+        sources = [k for k in ("file", "recording", "schedfeed") if spec.get(k)]
+        if not len(sources) == 1:
+            raise FeedSpecError("Feed '{}' must have one of 'file', 'recording', or 'schedfeed'".format(name))
+        path = base_dir / spec[sources[0]]
+        self._file_stream = None    # type: FileCodeStream|None
+        self._rec_stream = None     # type: RecordingCodeStream|None
+        self._sfp = None            # type: SchedFeedProcessor|None
+        self._sf_sender = None      # type: Sender|None
+        self._sf_pending = []       # type: list[tuple[tuple[int,...]|None,str|None,float]]
+        if sources[0] == "file":
+            self._file_stream = FileCodeStream(str(path))
+        elif sources[0] == "recording":
+            self._rec_stream = RecordingCodeStream(str(path), max_silence)
+        else:
+            self._sf_sender = Sender(self._wpm, self._cwpm, codeType=self._code_type, spacing=self._spacing)
+            self._sfp = SchedFeedProcessor(
+                Path(SchedFeedProcessor.add_ext_if_needed(str(path))), self._sf_sender,
+                self._from_schedfeed_processor, Event(), self._sf_pause
+            )
+        self._require_listener = bool(spec.get("require_listener", self._sfp is None))
+        self._job_name = "Feed-" + name
+        self._guard = Lock()
+        self._job = None            # type: scheduler.Job|None
+        self._stopped = False
+        self._internet = None       # type: Internet|None
+        self._stream = []           # type: list[tuple[tuple[int,...]|None,str|None,float]]
+        self._index = 0
+        self._t_due = 0.0           # monotonic time the next entry is due
+        self._txt = ""              # Text (spaces) to send with the next code (for CWCom clients)
+        self._circuit_open = False
+        self._t_last_sender = 0.0
+        return
+
+    @property
+    def name(self):  # type: () -> str
+        return self._name
+
+    def _from_schedfeed_processor(self, code, char):  # type: (tuple[int,...], str|None) -> None
+        """
+        Called by the SchedFeed Processor (from `process`) for each character of a message.
+        """
+        self._sf_pending.append((code, char, codestream.code_secs(code)))
+        return
+
+    def _sf_pause(self, secs):  # type: (float) -> None
+        """
+        Called by the SchedFeed Processor for a Pause control. Queue it rather than waiting.
+        """
+        self._sf_pending.append((None, None, secs))
+        return
+
+    def _from_wire(self, code):  # type: (tuple[int,...]) -> None
+        """
+        Called (by the multiplexer thread) with code received from the wire.
+        """
+        self._t_last_sender = time.time()
+        sfp = self._sfp
+        if sfp:
+            sfp.activity()
+        return
+
+    def _close_circuit(self):  # type: () -> None
+        if self._circuit_open:
+            self._circuit_open = False
+            self._send(CLOSE_CIRCUIT, None)
+        return
+
+    def _send(self, code, char):  # type: (tuple[int,...], str|None) -> None
+        if not code:
+            # A space. Send it with the text of the next code.
+            if char:
+                self._txt += char
+            return
+        txt = self._txt + (char if char else "")
+        self._txt = ""
+        self._internet.write(code, txt.upper())
+        return
+
+    def _load(self):  # type: () -> float|None
+        """
+        Load the stream to send. If there isn't anything to send, return the
+        seconds to wait before trying again (or None to wait indefinitely).
+        """
+        self._index = 0
+        if self._file_stream:
+            self._stream = self._file_stream.get(self._wpm, self._cwpm, self._code_type, self._spacing)
+        elif self._rec_stream:
+            self._stream = self._rec_stream.get()
+        else:
+            self._sf_pending = []
+            wire_active = time.time() < self._t_last_sender + SENDER_ACTIVE
+            self._sfp.process(True, wire_active)
+            self._stream = self._sf_pending
+            self._sf_pending = []
+            if not self._stream:
+                return self._sfp.next_due()
+        return None
+
+    def _step(self):  # type: () -> float|None
+        """
+        Send the next entry. Return the seconds until the next step, or None if
+        the feed is done.
+        """
+        now = time.time()
+        if self._require_listener and now > self._internet.last_listener_time + LISTENER_TIMEOUT:
+            if self._circuit_open:
+                # Nobody is listening. Stop, and start over when someone is.
+                self._close_circuit()
+                self._stream = []
+                self._index = 0
+            return LISTENER_CHECK
+        if self._wait > 0 and now < self._t_last_sender + self._wait:
+            # Someone else is sending. Wait for the wire to be idle.
+            self._close_circuit()
+            return self._t_last_sender + self._wait - now
+        if self._index >= len(self._stream):
+            if self._stream:
+                # Finished a pass
+                self._stream = []
+                self._index = 0
+                self._close_circuit()
+                if self._sfp is None:
+                    if not self._repeat:
+                        log.info("Feed '{}' finished.".format(self._name))
+                        return None
+                    return self._repeat_delay
+            delay = self._load()
+            if not self._stream:
+                return delay
+        if not self._circuit_open and self._sfp is None:
+            # (Scheduled Feed messages open and close the circuit themselves.)
+            self._circuit_open = True
+            self._send(OPEN_CIRCUIT, None)
+            self._t_due = time.monotonic() + OPEN_CIRCUIT_SECS
+            return OPEN_CIRCUIT_SECS
+        code, char, secs = self._stream[self._index]
+        self._index += 1
+        if code is not None:
+            self._send(code, char)
+            if self._sfp:
+                self._sfp.activity()
+        # Pace from when it was due, but don't try to catch up if we are late.
+        t_now = time.monotonic()
+        self._t_due = max(self._t_due + secs, t_now)
+        return self._t_due - t_now
+
+    def _job_step_body(self):
+        with self._guard:
+            if self._stopped:
+                return
+            try:
+                delay = self._step()
+            except Exception as ex:
+                log.err("Feed '{}' encountered an error and will stop: {}".format(self._name, ex))
+                log.debug(traceback.format_exc(), 3)
+                self._close_circuit()
+                delay = None
+            self._job = None
+            if delay is not None:
+                self._job = scheduler.shared().once(self._job_name, delay, self._job_step_body)
+        return
+
+    def start(self):  # type: () -> None
+        """
+        Connect to the wire and start sending. This can block while the server
+        address is looked up.
+        """
+        inet = Internet(self._station, code_callback=self._from_wire, appver=FEEDSERVER_VERSION_TEXT,
+            server_url=self._server_url, mux=self._mux)
+        self._internet = inet
+        inet.connect(self._wire)
+        with self._guard:
+            if not self._stopped:
+                self._job = scheduler.shared().once(self._job_name, 0, self._job_step_body)
+        log.info("Feed '{}' started on wire {}.".format(self._name, self._wire))
+        return
+
+    def exit(self):  # type: () -> None
+        """
+        Stop sending and disconnect from the wire.
+        """
+        with self._guard:
+            self._stopped = True
+            job = self._job
+            if job:
+                job.cancel()
+                self._job = None
+            if self._internet:
+                self._close_circuit()
+        inet = self._internet
+        if inet:
+            inet.exit()
+        log.info("Feed '{}' stopped.".format(self._name))
+        return
+
+
+class FeedServer:
+    def __init__(self, manifest_path, server_url=None):  # type: (str, str|None) -> None
+        self._manifest_path = Path(manifest_path)
+        self._server_url = server_url
+        self._mux = Multiplexer()
+        self._feeds = {}            # type: dict[str, FeedRunner]
+        self._feed_keys = {}        # type: dict[str, tuple]
+        self._manifest_key = None   # type: tuple|None
+        self._reload_requested = Event()
+        self._shutdown = Event()
+        return
+
+    @staticmethod
+    def _mtime(path):  # type: (Path) -> int
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return 0
+
+    def _current_manifest_key(self):  # type: () -> tuple
+        """
+        A key that changes when the manifest or a Scheduled Feed spec it uses changes.
+        """
+        key = [self._mtime(self._manifest_path)]
+        for name, feed_key in sorted(self._feed_keys.items()):
+            spec_path = feed_key[2]
+            if spec_path:
+                key.append(self._mtime(spec_path))
+        return tuple(key)
+
+    def _read_manifest(self):  # type: () -> tuple[str|None, dict[str, dict[str,Any]]]
+        with open(self._manifest_path, "r", encoding="utf-8") as fp:
+            jd = json.load(fp)
+        server_url = jd.get("server_url", self._server_url)
+        feeds = {}
+        for spec in jd.get("feeds", []):
+            name = spec.get("name")
+            if not name:
+                raise FeedSpecError("A feed in the manifest doesn't have a 'name'")
+            if name in feeds:
+                raise FeedSpecError("Feed name '{}' is used more than once".format(name))
+            if spec.get("enabled", True):
+                feeds[name] = spec
+        return (server_url, feeds)
+
+    def reload(self):  # type: () -> None
+        """
+        Read the manifest and start, restart, or stop the feeds that were
+        added, changed, or removed.
+        """
+        try:
+            server_url, specs = self._read_manifest()
+        except (OSError, ValueError, FeedSpecError) as ex:
+            log.err("Manifest '{}' not loaded (the current feeds are unchanged): {}".format(self._manifest_path, ex))
+            self._manifest_key = self._current_manifest_key()
+            return
+        base_dir = self._manifest_path.parent
+        keys = {}
+        for name, spec in specs.items():
+            sf = spec.get("schedfeed")
+            spec_path = base_dir / SchedFeedProcessor.add_ext_if_needed(sf) if sf else None
+            keys[name] = (json.dumps(spec, sort_keys=True), server_url, spec_path, self._mtime(spec_path) if spec_path else 0)
+        for name in list(self._feeds):
+            if not keys.get(name) == self._feed_keys.get(name):
+                self._feeds.pop(name).exit()
+                self._feed_keys.pop(name)
+        for name, spec in specs.items():
+            if name in self._feeds:
+                continue
+            feed = None
+            try:
+                feed = FeedRunner(name, spec, base_dir, server_url, self._mux)
+                feed.start()
+            except Exception as ex:
+                log.err("Feed '{}' could not be started: {}".format(name, ex))
+                log.debug(traceback.format_exc(), 3)
+                if feed:
+                    feed.exit()
+                continue
+            # Only keep it once it has started, so a failed feed is tried again on the next reload.
+            self._feeds[name] = feed
+            self._feed_keys[name] = keys[name]
+        self._manifest_key = self._current_manifest_key()
+        log.info("Manifest loaded. {} feeds running.".format(len(self._feeds)))
+        return
+
+    def request_reload(self):  # type: () -> None
+        self._reload_requested.set()
+        return
+
+    def run(self):  # type: () -> None
+        """
+        Run the feeds until shutdown, reloading them when the manifest changes.
+        """
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.request_reload())
+        self.reload()
+        while not self._shutdown.is_set():
+            self._reload_requested.wait(MANIFEST_CHECK)
+            if self._shutdown.is_set():
+                break
+            if self._reload_requested.is_set() or not self._current_manifest_key() == self._manifest_key:
+                self._reload_requested.clear()
+                self.reload()
+        return
+
+    def exit(self):  # type: () -> None
+        self.shutdown()
+        for feed in self._feeds.values():
+            feed.exit()
+        self._feeds.clear()
+        self._feed_keys.clear()
+        self._mux.exit()
+        return
+
+    def shutdown(self):  # type: () -> None
+        """
+        Initiate shutdown of our operations (and don't start anything new),
+        but DO NOT BLOCK.
+        """
+        self._shutdown.set()
+        self._reload_requested.set()
+        return
+
+
+if __name__ == "__main__":
+    feed_server = None
+    exit_status = 0
+    try:
+        print(FEEDSERVER_VERSION_TEXT)
+        print("Python: " + sys.version + " on " + sys.platform, flush=True)
+        arg_parser = argparse.ArgumentParser(
+            description="Run many wire feeds (text files, recordings, and Scheduled Feeds) in one process.",
+            parents=[
+                config2.config_file_override,
+                config2.logging_level_override,
+                config2.server_url_override,
+            ]
+        )
+        arg_parser.add_argument("manifest", metavar="manifest-path",
+            help="The JSON manifest of the feeds to run. It is reloaded when it changes (or on SIGHUP).")
+        args = arg_parser.parse_args()
+        cfg = config2.process_config_args(args)
+        log.set_logging_level(cfg.logging_level)
+
+        feed_server = FeedServer(args.manifest, cfg.server_url)
+        feed_server.run()
+    except KeyboardInterrupt:
+        exit_status = 0
+    except Exception as ex:
+        exit_status = 1
+        print("Error encountered: {}".format(ex))
+        log.debug(traceback.format_exc(), 3)
+    finally:
+        if feed_server:
+            feed_server.exit()
+        scheduler.exit_shared()
+        print()
+        print("~73", flush=True)
+        sys.exit(exit_status)
@@ -35,15 +35,12 @@ from sys import path
 from sys import exit as sys_exit
 from sys import platform as sys_platform
 from sys import version as sys_version
-import tkinter as tk
 import traceback
 
-from pykob import config, config2, log
+from pykob import config, config2, log, metrics, scheduler, trace
 from pykob import VERSION as PKVERSION
 import pkappargs
 from mkobenv import MKOBEnv
-import mkobwindow as mkw
-from mkobwindow import MKOBWindow
 
 COMPILE_INFO = globals().get("__compiled__")
 __version__ = "4.4.3"
@@ -53,7 +50,6 @@ MKOB_VERSION_TEXT = "MKOB " + VERSION
 print(MKOB_VERSION_TEXT)
 print(" Python: " + sys_version + " on " + sys_platform)
 print(" pykob: " + PKVERSION)
-print(" Tcl/Tk: {}/{}".format(tk.TclVersion, tk.TkVersion))
 
 destoy_on_exit = True
 # type: Optional[MKOBWindow]
@@ -71,7 +67,11 @@ try:
             config2.config_file_override,
             config2.logging_level_override,
             pkappargs.record_session_override,
-            pkappargs.sender_datetime_override
+            pkappargs.reader_scrollback_override,
+            pkappargs.reader_transcript_override,
+            pkappargs.sender_datetime_override,
+            pkappargs.trace_latency_override,
+            pkappargs.metrics_override
         ]
     )
     args = arg_parser.parse_args()
@@ -90,11 +90,22 @@ try:
 
     record_filepath = pkappargs.record_filepath_from_args(args)
     sender_dt = args.sender_dt
+    reader_scrollback = args.reader_scrollback
+    reader_transcript = args.reader_transcript
+    pkappargs.trace_latency_from_args(args)
+    pkappargs.metrics_from_args(args)
 
     log.set_logging_level(cfg.logging_level)
     log.debug("MKOB: Logging level: {}".format(cfg.logging_level))
     log.debug("Compiled: {}".format(COMPILE_INFO), 2, dt="")
 
+    # Tk (and the window modules, which load the rest of pykob) are imported
+    # once the arguments and configuration are good and the window is needed.
+    import tkinter as tk
+    import mkobwindow as mkw
+    from mkobwindow import MKOBWindow
+    print(" Tcl/Tk: {}/{}".format(tk.TclVersion, tk.TkVersion))
+
     root = tk.Tk(className="MKOB")
     script_dir = path[0]
     script_dir = script_dir + "/" if ((not script_dir is None) and (not script_dir == "")) else ""
@@ -108,7 +119,8 @@ try:
     root.rowconfigure(0, weight=1)
     root.columnconfigure(0, weight=1)
     # Our content
-    mkobwin = MKOBWindow(root, MKOB_VERSION_TEXT, cfg, env, sender_dt, record_filepath)
+    mkobwin = MKOBWindow(root, MKOB_VERSION_TEXT, cfg, env, sender_dt, record_filepath,
+        reader_scrollback=reader_scrollback, reader_transcript=reader_transcript)
 
     # Set a minsize for the window, and place it in the middle
     root.update()
@@ -139,6 +151,10 @@ finally:
     try:
         if mkobwin:
             mkobwin.exit(destoy_on_exit)
+        scheduler.exit_shared()
+        metrics.stop_exporter()
+        if trace.is_enabled():
+            print(trace.report())
         print("~73")
         sys_exit(0)
     except BaseException:
@@ -45,16 +45,19 @@ Also supports a Selector Switch and built-in Scheduled Feed functionality.
 
 """
 
-from pykob import VERSION, config, config2, log, kob, internet, morse, recorder
+from pykob import VERSION, codestream, config, config2, log, kob, internet, metrics, morse, recorder, scheduler, trace
+from pykob.codestream import FileCodeStream
 from pykob.config2 import Config
 from pykob.internet import Internet
 from pykob.kob import KOB
 from pykob.morse import Reader, Sender
 from pykob.recorder import Recorder
+from pykob.schedfeed import SchedFeedProcessor
 from pykob.selector import Selector, SelectorMode, SelectorChange, SEL_FIND_SDSEL
 import pkappargs
 
 import argparse
+from collections import deque
 from enum import Enum, IntEnum, unique
 import json
 from json import JSONDecodeError
@@ -62,17 +65,17 @@ import os
 from pathlib import Path
 import platform
 import queue
-from queue import Empty, Queue
+from queue import Full, Queue
 import random
 import re  # RegEx
 import select
 import sys
 from sys import platform
-from threading import Event, Thread
+from threading import Event, Lock, Thread, current_thread
 import time
 from time import sleep
 import traceback
-from typing import Optional, Sequence
+from typing import Callable, Optional, Sequence
 
 COMPILE_INFO = globals().get("__compiled__")
 __version__ = '1.4.6'
@@ -127,6 +130,9 @@ SELECTION_DESCRIPTION_KEY = "desc"
 LATCH_CODE = (-0x7fff, +1)  # code sequence to force latching (close)
 UNLATCH_CODE = (-0x7fff, +2)  # code sequence to unlatch (open)
 
+GETCH_WAIT = 0.25  # Seconds to wait for a key before checking for shutdown
+EXIT_THREAD_WAIT = 0.3  # Seconds to wait for the Mrt threads to end when exiting
+
 class RawTerm:
     """
     Sets the terminal to Raw Mode (but still w/CRNL on output) and provides a method to
@@ -208,10 +214,9 @@ class _GetchUnix:
 
     def _getch(self) -> str:
         while not self.shutdown_event.is_set():
-            char_ready = select.select([self.fd], [], [], 0)  # Check readability and never block
+            char_ready = select.select([self.fd], [], [], GETCH_WAIT)  # Wait for a key (or time to check for shutdown)
             if len(char_ready[0]) > 0:  # Simple check since we only have stdin registered
                 return sys.stdin.read(1)
-            self.shutdown_event.wait(0.01)
         return ''
 
     def _exit(self):
@@ -252,416 +257,6 @@ class _GetchWindows:
         self.shutdown_event.set()
         return
 
-class SchedFeedError(Exception):
-    pass
-class MultipleSFConditions(SchedFeedError):
-    pass
-
-class SFConditionUnknown(SchedFeedError):
-    pass
-class SFConditionTimeInvalid(SchedFeedError):
-    pass
-
-class SFConditionPeriodInvalid(SchedFeedError):
-    pass
-
-class SFConditionMultipleMsgMsgsEntries(SchedFeedError):
-    pass
-
-class SFConditionMsgsNotList(SchedFeedError):
-    pass
-
-class SFControlInvalid(SchedFeedError):
-    pass
-
-
-class _SFSpecOp:
-    """
-    Internal class to contain a Scheduled Feed Spec and operation history.
-
-    Contains:
-        condition   - The condition that triggers the feed
-        time        - The time/period specified for the condition
-        msg         - A single message (if a single one was specified)
-        msgs        - A list of messages (if multiple were specified, used randomly)
-        --------
-        last_dt     - The date-time of the last transmission
-    """
-
-    def __init__(self, spec):  # type: (dict[str,Any]) -> None
-        self._condition = None      # type: _SchedFeedProcessor._Condition|None
-        self._time = None           # type: int|None
-        self._period = None         # type: int|None
-        self._msg = None            # type: str|None
-        self._msgs = None           # type: list[str]|None
-        self._last_activity = -1    # type: int
-        self._last_dt = -1          # type: int
-        #
-        for key, value in spec.items():
-            if (key == _SchedFeedProcessor._Condition.at.name
-                or key == _SchedFeedProcessor._Condition.at_ii.name
-                or key == _SchedFeedProcessor._Condition.when_i.name
-                or key == _SchedFeedProcessor._Condition.idle.name):
-                if self._condition is not None:
-                    raise MultipleSFConditions("SchedFeed condition {} already set when condition {} was encountered in spec.".format(self._condition, value))
-                self._condition = _SchedFeedProcessor._Condition[key]
-                if self._condition == _SchedFeedProcessor._Condition.idle:
-                    try:
-                        self._period = int(value)
-                        if self._period < 1 or self._period > 2359:
-                            raise SFConditionPeriodInvalid("SchedFeed spec period value {} is not valid. Period must be 0 < p < 2400.".format(self._period))
-                    except ValueError as ex:
-                        raise SFConditionPeriodInvalid("SchedFeed spec period specified is invalid {}. Must be an integer. Error: {}".format(value, ex))
-                else:
-                    try:
-                        self._time = int(value)
-                        if self._time < 0 or self._time > 2359:
-                            raise SFConditionPeriodInvalid("SchedFeed spec time value {} is not valid. Time must be 0 <= p < 2400.".format(self._time))
-                    except ValueError as ex:
-                        raise SFConditionPeriodInvalid("SchedFeed spec time specified is invalid {}. Must be an integer. Error: {}".format(value, ex))
-            elif key == "msg":
-                if self._msg is not None or self._msgs is not None:
-                    raise SFConditionMultipleMsgMsgsEntries("Only a single 'msg' or 'msgs' entry is allowed in a SchedFeed spec.")
-                self._msg = value
-            elif key == "msgs":
-                if self._msg is not None or self._msgs is not None:
-                    raise SFConditionMultipleMsgMsgsEntries("Only a single 'msgs' or 'msg' entry is allowed in a SchedFeed spec.")
-                if not isinstance(value, list):
-                    raise SFConditionMsgsNotList("The SchedFeed spec 'msgs' value must be a list of two or more message strings.")
-                self._msgs = list()
-                for v in value:
-                    self._msgs.append(str(v))
-                pass
-            else:
-                raise SFConditionUnknown("Unknown SchedFeed condition '{}'")
-            pass
-        # Adjust the last time sent and activity
-        self._last_activity = time.time()//60
-        if self._time is not None:
-            t0 = time.localtime()
-            now_mins = t0.tm_hour*60 + t0.tm_min  # current time (min)
-            tMsg = 60*(self._time//100) + (self._time%100)  # time to send message
-            if tMsg < now_mins:
-                # Trigger time is in the past for today. Indicate that we've sent.
-                self._last_dt = now_mins
-        return
-
-    def __str__(self):
-        s = ""
-        if self._condition == _SchedFeedProcessor._Condition.idle:
-            s = "Idle for {} minutes, send: ".format(self._period)
-        elif self._condition == _SchedFeedProcessor._Condition.at:
-            s = "At {}, send: ".format(self._time)
-        elif self._condition == _SchedFeedProcessor._Condition.at_ii:
-            s = "At {}, if idle, send: ".format(self._time)
-        else:
-            s = "When idle at/after {}, send ".format(self._time)
-        if self._msg is not None:
-            s += self._msg
-        elif self._msgs is not None:
-            s += self._msgs
-        return (s)
-
-    def __repr__(self):
-        return self.__str__()
-
-    @property
-    def condition(self):  # type: () -> _SchedFeedProcessor._Condition
-        return self._condition
-
-    @property
-    def last_activity(self):  # type: () -> int
-        return self._last_activity
-    @last_activity.setter
-    def last_activity(self, t):  # type: (int) -> None
-        self._last_activity = t
-        return
-
-    @property
-    def last_dt(self):  # type: () -> int
-        return self._last_dt
-    @last_dt.setter
-    def last_dt(self, dt):  # type: (int) -> None
-        self._last_dt = dt
-        return
-
-    @property
-    def msg(self):  # type: () -> str|None
-        return self._msg
-
-    @property
-    def msgs(self):  # type: () -> list[str]|None
-        return self._msgs
-
-    @property
-    def period(self):  # type: () -> int|None
-        return self._period
-
-    @property
-    def time(self):  # type: () -> int|None
-        return self._time
-
-class _SchedFeedProcessor:
-    """
-    Loads and parses a SchedFeed Spec to create a definition of what needs
-    to be sent and what times.
-
-    Methods are provided that need to be called as activity occurs such that
-    the class knows when the wire is idle, and how long it has been idle.
-
-    A method is also provided that needs to be called regularly so the
-    current time can be checked to see if something needs to be sent.
-
-    The format of a spec is as follows (example):
-    {
-        "specs": [
-            {
-                "at":815,
-                "msg":"~ ES ON +     ~ OK ES +"
-            },
-            {
-                "at_ii":1310,
-                "msg":"~ ES CHECKING IN +     ~ OK ES +"
-            },
-            {
-                "when_i":1310,
-                "msg":"~ ES CHECKING IN +     ~ OK ES +"
-            },
-            {
-                "idle":15,
-                "msgs":[
-                    "~ «$STN_NAME» SEEING WHO IS THERE. = OK «$STN_NAME» +",
-                    "~ «$STN_NAME» INVITING YOU TO JOIN IN. = OK «$STN_NAME» +",
-                    "~ «$STN_NAME» WELCOME TO OUR WIRE. = «P3.2» WE HOPE YOU ARE ENJOYING YOURSELF. OK «$STN_NAME» +",
-                    "~ «$STN_NAME» PLEASE COME VISIT «$SITE_NAME» AND SEE US IN ACTION. = OK «$STN_NAME» +"
-                ]
-            }
-        ]
-    }
-
-    The value of specs is an array/list with a condition and a time or period and a msg with a text_string or a msgs with an array/list of text_strings.
-    condition is one of:
-    at : Sends a message at a specified time. The message will be sent no matter what (it will break in if the wire is currently active).
-    at_ii : Send a message at a specified time if the wire is idle. If the wire is active, the message will not be sent.
-    when_i : Send a message as soon as the wire is idle at, or as soon after, the specified time.
-    idle : Send a message if the wire is idle for the specified period.
-
-    time or period : 24-Hour Hour+Minute value.
-
-    msg : A single text_string containing the message to be sent.
-    msgs : Array/list of text_string values. One of the messages will be used at random when a message is to be sent.
-
-    The text_string can include plain text, or the following special characters/sequences:
-    '~' : Opens the key (same as keyboard sending)
-    '+' : Closes the key (same as keyboard sending)
-    ' «ctrl» : Control value, which is one of: ('«' is Unicode U+00AB and '»' is Unicode U+00BB)
-    $env_var : Replaced with the value of the environment variable env_var
-    Pseconds : Pause the given number of seconds (can be fractional)
-
-    """
-
-    MRT_SCHDFEED_SPEC_EXT = ".mrtsfs"
-
-    SPECS_KEY = "specs"
-    #
-    AT_KEY = "at"
-    AT_IF_IDLE_KEY = "at_ii"
-    WHEN_IDLE_KEY = "when_i"
-    IDLE_KEY = "idle"
-    #
-    MSG_KEY = "msg"
-    MSGS_KEY = "msgs"
-    #
-    CTRL_VAL_START_CHAR = '\u00AB'  # Unicode character: «
-    CTRL_VAL_END_CHAR = '\u00BB'    # Unicode character: »
-    CTRL_VAL_ENV_VAR_START = '$'    # Environment variables are specified by '$'
-    CTRL_VAL_PAUSE_VAR_START = 'P'  # Pause 4.2 seconds example: "P4.2"
-
-    @unique
-    class _Condition(IntEnum):
-        at = 1
-        at_ii = 2
-        when_i = 3
-        idle = 4
-
-
-    def add_ext_if_needed(s: str) -> str:
-        """
-        Add the MRT scheduled feed spec file extension if needed.
-
-        Adds '.mrtsfs' to the string argument if it doesn't already end with it.
-        """
-        if s and not s.endswith(_SchedFeedProcessor.MRT_SCHDFEED_SPEC_EXT):
-            return (s + _SchedFeedProcessor.MRT_SCHDFEED_SPEC_EXT)
-        return s
-
-    def __init__(self, schedfeed_spec_path, morse_sender, code_char_send_callback, shutdown_event):  # type (Path|None, Sender, Callable, Event) -> None
-        self._schedfeed_spec_path = schedfeed_spec_path
-        self._sender = morse_sender
-        self._code_char_send = code_char_send_callback
-        self._shutdown = shutdown_event
-        self._spec_ops = None  # type: list[_SFSpecOp]|None
-
-        self._load_specs()
-        return
-
-    def _load_specs(self):  # type: () -> None
-        if self._schedfeed_spec_path:
-            specs = None
-            jd = None
-            with open(self._schedfeed_spec_path, 'r', encoding="utf-8") as fp:
-                jd = json.load(fp)
-            if jd:
-                specs = jd[_SchedFeedProcessor.SPECS_KEY]
-            if specs:
-                self._spec_ops = list()
-                for spec in specs:
-                    self._spec_ops.append(_SFSpecOp(spec))
-                pass
-            pass
-        return
-
-    def _process_ctrl(self, msg, index):  # type: (str, int) -> int
-        """
-        Process a control sequence within a message. The `index` param is pointing
-        to the lead-in ctrl character.
-
-        Return the index of the beginning of the remainder of the message.
-        """
-        i = index + 1  # The first character of the control sequence
-        ctrl = ''
-        if i < len(msg):
-            ctrl = msg[i]
-            i += 1
-        if not (ctrl == _SchedFeedProcessor.CTRL_VAL_ENV_VAR_START or ctrl == _SchedFeedProcessor.CTRL_VAL_PAUSE_VAR_START):
-            raise SFControlInvalid("Unknown Control '{}' in message: '{}'".format(ctrl, msg))
-        # Read the control value
-        s = msg[i:]
-        ex = re.compile("^([^»]*)(»)")
-        m = ex.match(s)
-        if m:
-            cv = m.group(1)
-            ce = m.group(2)
-            if not cv or len(cv) == 0:
-                raise SFControlInvalid("No Control Value found for '{}' in message: '{}'".format(ctrl, msg))
-            if not ce or len(ce) == 0:
-                raise SFControlInvalid("Control close not found for '{}' in message: '{}'".format(ctrl, msg))
-            if ctrl == _SchedFeedProcessor.CTRL_VAL_ENV_VAR_START:
-                # cv is the name of an environment variable. Get the value and send it.
-                evv = os.environ.get(cv)
-                if evv is not None:
-                    self._send_message(evv)
-                pass
-            else:
-                # ctrl_val should be a float value to use as a delay
-                d = 0.0
-                try:
-                    d = float(cv)
-                except ValueError as ex:
-                    raise SFControlInvalid("Invalid Pause value '{}' in message: '{}'  Error: {}".format(cv, msg, ex))
-                self._shutdown.wait(d)
-            return (i + len(cv) + len(ce))
-        raise SFControlInvalid("Invalid Control Value for '{}' in message: '{}'".format(ctrl, msg))
-
-    def _send_msg_from_spec(self, spec):  # type: (_SFSpecOp) -> None
-        """
-        Send the message if there is a single one, or randomly send one of the
-        list of messages from the spec.
-        """
-        msg = None
-        if spec.msg is not None:
-            msg = spec.msg
-        elif spec.msgs is not None:
-            ec = len(spec.msgs)
-            rnd_indx = random.randint(0, ec-1)
-            msg = spec.msgs[rnd_indx]
-        if msg is not None and len(msg) > 0:
-            self._send_message(msg)
-        return
-
-    def _send_message(self, msg):  # type: (str) -> None
-        """
-        Send a message from the SchedFeed Spec as though it was from the keyboard.
-        """
-        try:
-            i = 0  # Use an index to allow processing parts
-            while i < len(msg):
-                ch = msg[i]
-                # Check for a Control Sequence
-                if ch == _SchedFeedProcessor.CTRL_VAL_START_CHAR:
-                    i = self._process_ctrl(msg, i)
-                else:
-                    i += 1
-                    code = self._sender.encode(ch)
-                    self._code_char_send(code, ch)
-                pass
-            pass
-        except Exception as ex:
-            print("<<< SchedFeed sender encountered an error on message: '{}'  Error: {}".format(msg, ex))
-        return
-
-    def activity(self):  # type: () -> None
-        """
-        Should be called by MRT any time characters are sent or received.
-        """
-        now_mins = time.time()//60  # Now in integer minutes
-        for spec in self._spec_ops:
-            if spec.condition == _SchedFeedProcessor._Condition.idle:
-                spec.last_activity = now_mins
-            pass
-        return
-
-    def process(self, key_closed, wire_active):  # type: (bool, bool) -> None
-        """
-        Process specs based on the current time and wire state.
-
-        This MUST BE CALLED REGULARLY by the main code flow to allow SchedFeed
-        conditions to be checked to see if any messages need to be sent.
-
-        Param key_closed indicates if the local (virtual) key is closed.
-        Param wire_active indicates if a remote station is currently active on the wire.
-        """
-        # Get current time in minutes
-        t0 = time.localtime()
-        now_mins = t0.tm_hour*60 + t0.tm_min
-        #
-        # Run through the specs and see if the condition is met.
-        for spec in self._spec_ops:
-            if spec.time is not None:   # If the spec has a time see if now is the time to do something
-                tMsg = 60*(spec.time//100) + (spec.time%100)  # time to send message
-                if now_mins < tMsg and spec.last_dt >= 0:
-                    # It is before the trigger time for today, yet the last sent time is set...
-                    # Reset the last sent time for today.
-                    self._last_dt = -1
-                    continue
-                if now_mins >= tMsg:   # Now could be the time
-                    if spec.last_dt < 0:    # The operation has not yet been performed
-                        if spec.condition == _SchedFeedProcessor._Condition.at:
-                            # 'AT' Sends now, regardless of other activity.
-                            spec.last_dt = now_mins  # Mark as done
-                            self._send_msg_from_spec(spec)
-                        elif spec.condition == _SchedFeedProcessor._Condition.at_ii:
-                            # 'AT If Idle' Sends now, if the wire is idle, otherwise it is skipped.
-                            spec.last_dt = now_mins  # Mark as done (even if we don't send)
-                            if not wire_active:
-                                self._send_msg_from_spec(spec)
-                        elif spec.condition == _SchedFeedProcessor._Condition.when_i:
-                            # 'When Idle' will send as soon as the wire is idle
-                            if not wire_active and key_closed:
-                                self._send_msg_from_spec(spec)
-                                spec.last_dt = now_mins
-                        pass
-                    pass
-                pass
-            elif spec.period is not None:  # If the spec has a period, see if it has been long enough.
-                dt = (time.time()//60) - spec.last_activity
-                if dt >= spec.period:
-                    self._send_msg_from_spec(spec)
-                pass
-            pass
-        return
-
-
 class Mrt:
     """
     Morse Receive & Transmit 'Mr T'.
@@ -693,6 +288,7 @@ class Mrt:
         self._prt_stop: Event = Event()
         self._control_c_pressed: Event = Event()
         self._kb_queue: Queue = Queue(128)
+        self._m_kb_queue_depth: Optional[metrics.Gauge] = None  # Bound to our queue while we are running
         self._closed: Event = Event()
 
         self._record_filepath = None if record_filepath is None else recorder.add_ext_if_needed(record_filepath.strip())
@@ -714,6 +310,7 @@ class Mrt:
 
         self._filesend_running: Event = Event()
         self._send_file_path = None
+        self._send_file_stream: Optional[FileCodeStream] = None
         if file_to_send:
             self._send_file_path = file_to_send.strip()
             p = Path(self._send_file_path)
@@ -722,13 +319,14 @@ class Mrt:
                 print("File to send not found. '{}'".format(self._send_file_path), flush=True)
                 self._send_file_path = None
                 raise FileNotFoundError(p)
+            self._send_file_stream = FileCodeStream(self._send_file_path)
             pass
         pass
 
         self._schedfeed_proc = None
         self._schedfeed_spec_path = None
         if schedfeed_spec:
-            self._schedfeed_spec_path = _SchedFeedProcessor.add_ext_if_needed(schedfeed_spec.strip())
+            self._schedfeed_spec_path = SchedFeedProcessor.add_ext_if_needed(schedfeed_spec.strip())
         pass
 
         self._internet: Optional[Internet] = None
@@ -736,6 +334,8 @@ class Mrt:
         self._reader: Optional[Reader] = None
         self._recorder: Optional[Recorder] = None
         self._sender: Optional[Sender] = None
+        self._shared_kob: Optional[KOB] = None  # KOB owned by someone else (a MrtSelector)
+        self._thread_fsender: Optional[Thread] = None
         self._thread_kbreader: Optional[Thread] = None
         self._thread_kbsender: Optional[Thread] = None
 
@@ -748,6 +348,14 @@ class Mrt:
 
         self._do_automated_stuff: bool = (not self._play_file_path is None or not self._send_file_path is None)
         self._automation_started: bool = False
+        self._automation_repeat_pending: bool = False
+
+        # Calls to be run by the main loop (timed by jobs on the shared scheduler).
+        self._main_calls: deque[Callable[[], None]] = deque()
+        self._automation_repeat_job: Optional[scheduler.Job] = None
+        self._schedfeed_guard: Lock = Lock()
+        self._schedfeed_job: Optional[scheduler.Job] = None
+        self._wakeup: Event = Event()  # Wakes the main loop (call posted, shutdown)
 
         self._exit_status = 1
 
@@ -758,12 +366,23 @@ class Mrt:
             self._closed.set()
             print("\nClosing...")
             self._shutdown.set()
-            sleep(0.3)
+            self._fst_stop.set()
+            self._kbt_stop.set()
+            self._wakeup.set()
+            try:
+                self._kb_queue.put_nowait(None)  # Wake up the keyboard sender
+            except Full:
+                pass
+            # Give our threads a chance to finish what they are doing.
+            t_end = time.monotonic() + EXIT_THREAD_WAIT
+            for t in (self._thread_fsender, self._thread_kbsender, self._thread_kbreader):
+                if t and t.is_alive() and not t is current_thread():
+                    t.join(max(t_end - time.monotonic(), 0.0))
             log.debug("MRT.exit - 1", 3)
             self.shutdown()
             log.debug("MRT.exit - 2", 3)
             kob_ = self._kob
-            if kob_:
+            if kob_ and not kob_ is self._shared_kob:
                 log.debug("MRT.exit - 3a", 3)
                 kob_.exit()
                 log.debug("MRT.exit - 3b", 3)
@@ -772,6 +391,11 @@ class Mrt:
                 log.debug("MRT.exit - 4a", 3)
                 inet.exit()
                 log.debug("MRT.exit - 4b", 3)
+            m_kbq = self._m_kb_queue_depth
+            if m_kbq:
+                self._m_kb_queue_depth = None
+                m_kbq.set_function(None)
+                m_kbq.set(0)
             plr = self._player
             if plr:
                 log.debug("MRT.exit - 5a", 3)
@@ -810,11 +434,15 @@ class Mrt:
             # If we have been asked to send a file, send it.
             # If we have a non-negative repeat value, repeat (with a pause if specified)
             #
+            # Everything else is done by the background threads. Wait for something
+            # to wake us up (a posted call, or shutdown).
+            #
+            self._automation_check()
+            self._schedfeed_check()
             while not self._shutdown.is_set() and not self._control_c_pressed.is_set():
-                if self._schedfeed_proc:
-                    self._schedfeed_proc.process(not self._local_loop_active, self._internet_station_active)
-                self._process_automation()
-                self._shutdown.wait(0.05)  # Loop while background threads take care of 'stuff'
+                self._wakeup.wait()
+                self._wakeup.clear()
+                self._run_main_calls()
                 if self._control_c_pressed.is_set():
                     raise KeyboardInterrupt
         except KeyboardInterrupt:
@@ -826,9 +454,29 @@ class Mrt:
     def shutdown(self):
         log.debug("MRT.shutdown - 1", 3)
         self._shutdown.set()
+        self._fst_stop.set()  # Stop sending a file
+        self._wakeup.set()
+        job = self._automation_repeat_job
+        if job:
+            job.cancel()
+        with self._schedfeed_guard:
+            if self._schedfeed_job:
+                self._schedfeed_job.cancel()
+                self._schedfeed_job = None
+        try:
+            self._kb_queue.put_nowait(None)  # Wake up the keyboard sender
+        except Full:
+            pass
         log.debug("MRT.shutdown - 2", 3)
         kob_ = self._kob
-        if kob_:
+        if kob_ and kob_ is self._shared_kob:
+            # Release it (as it was when we got it) for the next user.
+            kob_.key_callback = None
+            kob_.message_receiver = None
+            kob_.wire_connected = False
+            kob_.internet_circuit_closed = False
+            kob_.virtual_closer_is_open = False
+        elif kob_:
             log.debug("MRT.shutdown - 3a", 3)
             kob_.shutdown()
             log.debug("MRT.shutdown - 3b", 3)
@@ -859,7 +507,60 @@ class Mrt:
             log.debug("MRT.shutdown - 8b", 3)
         return
 
-    def start(self):
+    def stop(self):
+        """
+        End the main loop (which then exits this Mrt) without waiting for it.
+        Can be called from any thread.
+        """
+        self._shutdown.set()
+        self._wakeup.set()
+        return
+
+    @property
+    def cfg(self) -> Config:
+        return self._cfg
+
+    @staticmethod
+    def create_kob(cfg, key_callback=None, err_msg_hndlr=None, status_msg_hndlr=None):
+        # type: (Config, Callable|None, Callable|None, Callable|None) -> KOB
+        """
+        Create a KOB for the hardware and audio settings in a configuration.
+        """
+        return kob.KOB(
+            interfaceType=cfg.interface_type,
+            useSerial=cfg.use_serial,
+            portToUse=cfg.serial_port,
+            useGpio=cfg.use_gpio,
+            useAudio=cfg.sound,
+            audioType=cfg.audio_type,
+            useSounder=cfg.sounder,
+            invertKeyInput=cfg.invert_key_input,
+            soundLocal=cfg.local,
+            sounderPowerSaveSecs=cfg.sounder_power_save,
+            virtual_closer_in_use=True,
+            keyCallback=key_callback,
+            err_msg_hndlr=err_msg_hndlr,
+            status_msg_hndlr=status_msg_hndlr
+            )
+
+    @staticmethod
+    def kob_settings(cfg):  # type: (Config) -> tuple
+        """
+        The configuration values used by `create_kob`. A KOB can be shared by
+        configurations with the same values.
+        """
+        return (cfg.interface_type, cfg.use_serial, cfg.serial_port, cfg.use_gpio, cfg.sound,
+            cfg.audio_type, cfg.sounder, cfg.invert_key_input, cfg.local, cfg.sounder_power_save)
+
+    def start(self, shared_kob:Optional[KOB]=None):
+        """
+        Create the objects needed and start the threads.
+
+        shared_kob: A KOB (created by `create_kob` for this configuration) to use
+            rather than creating one. It isn't shut down when this Mrt exits.
+        """
+        self._m_kb_queue_depth = metrics.gauge("pykob_mrt_kb_queue_depth",
+            "Characters waiting to be sent from the keyboard.", fn=self._kb_queue.qsize)
         if self._play_file_path:
             self._player = Recorder(
                 None,
@@ -884,22 +585,13 @@ class Mrt:
                 play_station_list_callback=None,
                 play_wire_callback=None,
             )
-        self._kob = kob.KOB(
-            interfaceType=self._cfg.interface_type,
-            useSerial=self._cfg.use_serial,
-            portToUse=self._cfg.serial_port,
-            useGpio=self._cfg.use_gpio,
-            useAudio=self._cfg.sound,
-            audioType=self._cfg.audio_type,
-            useSounder=self._cfg.sounder,
-            invertKeyInput=self._cfg.invert_key_input,
-            soundLocal=self._cfg.local,
-            sounderPowerSaveSecs=self._cfg.sounder_power_save,
-            virtual_closer_in_use=True,
-            keyCallback=self._from_key,
-            err_msg_hndlr=self._err_msg_handler,
-            status_msg_hndlr=self._status_msg_handler
-            )
+        if shared_kob:
+            self._shared_kob = shared_kob
+            self._kob = shared_kob
+            shared_kob.message_receiver = self._err_msg_handler
+            shared_kob.key_callback = self._from_key
+        else:
+            self._kob = Mrt.create_kob(self._cfg, self._from_key, self._err_msg_handler, self._status_msg_handler)
         self._internet = internet.Internet(
             officeID=self._our_office_id,
             code_callback=self._from_internet,
@@ -929,7 +621,7 @@ class Mrt:
                 self._schedfeed_spec_path = None
                 raise FileNotFoundError(p)
             pass
-            self._schedfeed_proc = _SchedFeedProcessor(p, self._sender, self._from_schedfeed_processor, self._shutdown)
+            self._schedfeed_proc = SchedFeedProcessor(p, self._sender, self._from_schedfeed_processor, self._shutdown)
             print("Scheduled Feed specification to use: {}".format(p))
         if sys.stdin.isatty():
             # Threads to read characters from the keyboard to allow sending without (instead of) a physical key.
@@ -953,6 +645,77 @@ class Mrt:
         self._filesend_running.clear()
         return
 
+    def _automation_check(self):  # type: () -> None
+        """
+        Have the main loop check the automation (a recording or file finished, etc.).
+        """
+        if self._do_automated_stuff:
+            self._call_soon(self._process_automation)
+        return
+
+    def _automation_repeat(self):  # type: () -> None
+        """
+        The repeat delay has passed. Start the next pass of the recording and/or file.
+        """
+        self._automation_repeat_pending = False
+        if self._play_file_path:
+            self._playback_complete.clear()
+        if self._send_file_path:
+            self._filesend_running.clear()
+            self.__create_file_thread()
+        self._process_automation()
+        return
+
+    def _call_later(self, name, delay, fn):  # type: (str, float, Callable[[], None]) -> scheduler.Job
+        """
+        Have the main loop call `fn` after `delay` seconds. Can be called from any thread.
+
+        The shared scheduler does the timing, but the call is run by the main loop,
+        as these calls (SchedFeed messages, starting playback) can take as long as
+        the code takes to sound. Cancel the returned job to cancel the call.
+        """
+        return scheduler.shared().once(name, delay, self._call_soon, fn)
+
+    def _call_soon(self, fn):  # type: (Callable[[], None]) -> None
+        """
+        Have the main loop call `fn` as soon as it can. Can be called from any thread.
+        """
+        self._main_calls.append(fn)
+        self._wakeup.set()
+        return
+
+    def _run_main_calls(self):  # type: () -> None
+        """
+        Run the calls that have been posted to the main loop.
+        """
+        while self._main_calls and not self._shutdown.is_set():
+            fn = self._main_calls.popleft()
+            fn()
+        return
+
+    def _schedfeed_check(self, delay:float=0.0):  # type: (float) -> None
+        """
+        Have the main loop run the SchedFeed processor after `delay` seconds
+        (replacing the currently scheduled run).
+        """
+        if self._schedfeed_proc and not self._shutdown.is_set():
+            with self._schedfeed_guard:
+                if self._schedfeed_job:
+                    self._schedfeed_job.cancel()
+                self._schedfeed_job = self._call_later("MRT-SchedFeed", delay, self._schedfeed_run)
+        return
+
+    def _schedfeed_run(self):  # type: () -> None
+        """
+        Process the SchedFeed specs, then schedule the next run for when one could be due.
+        """
+        sfp = self._schedfeed_proc
+        sfp.process(not self._local_loop_active, self._internet_station_active)
+        due = sfp.next_due()
+        if due is not None:
+            self._schedfeed_check(due)
+        return
+
     def _emit_local_code(self, code, code_source, char:Optional[str]=None):
         """
         Emit local code. That involves:
@@ -1014,6 +777,7 @@ class Mrt:
 
         Called from the 'KOB-KeyRead' thread.
         """
+        trace.mark(code, trace.Stage.FROM_KEY)
         if len(code) > 0:
             if code[-1] == 1: # special code for closer/circuit closed
                 self._set_virtual_closer_closed(True)
@@ -1054,11 +818,14 @@ class Mrt:
                 self._kob.soundCode(code, kob.CodeSource.wire)
             if self._recorder:
                 self._recorder.record(code, kob.CodeSource.wire)
+            was_active = self._internet_station_active
             if len(code) > 0 and code[-1] == +1:
                 self._internet_station_active = False
             else:
                 self._internet_station_active = True
             self._kob.internet_circuit_closed = not self._internet_station_active
+            if was_active and not self._internet_station_active:
+                self._schedfeed_check()  # The wire is idle. Check for 'when idle' specs.
         if self._schedfeed_proc:
             self._schedfeed_proc.activity()  # Let the SchedFeed processor know something occurred
         return
@@ -1080,6 +847,7 @@ class Mrt:
             print("", flush=True)
         log.debug("Recording playback finished.")
         self._playback_complete.set()
+        self._automation_check()
         return
 
     def _from_schedfeed_processor(self, code, char):  # type: (list[int], str|None) -> None
@@ -1181,14 +949,14 @@ class Mrt:
             self._do_automated_stuff = False
             log.debug("Mrt._process_automation - No repeat, finished processing.", 2)
             return
+        if self._automation_repeat_pending:
+            return
         if self._repeat_delay > 0:
             print("Automation - Delaying {} seconds before repeat...".format(self._repeat_delay), flush=True)
-            self._shutdown.wait(self._repeat_delay)
-        if self._play_file_path:
-            self._playback_complete.clear()
-        if self._send_file_path:
-            self._filesend_running.clear()
-            self.__create_file_thread()
+            self._automation_repeat_pending = True
+            self._automation_repeat_job = self._call_later("MRT-Automation-Repeat", self._repeat_delay, self._automation_repeat)
+            return
+        self._automation_repeat()
         return
 
     def _reader_callback(self, char, spacing):
@@ -1214,7 +982,9 @@ class Mrt:
             print(' ', end='')
         if fullSpace:
             print(' ', end='')
+        trace.mark_latest(trace.Stage.CHAR, trace.Stage.DECODE)
         print(char, end='', flush=True)
+        trace.mark_latest(trace.Stage.DISPLAY, trace.Stage.CHAR)
         if char == '_':
             print(flush=True)
         return
@@ -1228,6 +998,8 @@ class Mrt:
         """
         self._local_loop_active = active
         self._kob.energize_sounder((not active), kob.CodeSource.local)
+        if not active:
+            self._schedfeed_check()  # The key is closed. Check for 'when idle' specs.
         return
 
     def _set_virtual_closer_closed(self, closed):
@@ -1266,53 +1038,20 @@ class Mrt:
             try:
                 self._set_virtual_closer_closed(False)
                 while not self._fst_stop.is_set() and not self._shutdown.is_set():
-                    with open(self._send_file_path, "r") as fp:
-                        last_ch_was_nl = False  # If we get two NL in a row, insert a Paragraph.
-                        inserted_para = False   # Track whether we inserted one.
-                        while not self._fst_stop.is_set() and not self._shutdown.is_set():
-                            ch = fp.read(1)
-                            if not ch:
-                                break
-                            if ch < ' ':
-                                if ch == '\r':
-                                    # Just swallow RETURNs
-                                    continue
-                                if ch == '\n':
-                                    if last_ch_was_nl:
-                                        if not inserted_para:
-                                            ch = '='
-                                            inserted_para = True
-                                        else:
-                                            # Only do a single paragraph in a row.
-                                            continue
-                                    else:
-                                        last_ch_was_nl = True
-                                        continue
-                                    pass
-                                else:
-                                    # don't send control characters
-                                    last_ch_was_nl = False
-                                    continue
-                                pass
-                            else:
-                                last_ch_was_nl = False
-                                inserted_para = False
-                            code = self._sender.encode(ch)
-                            self._from_file(code, ch)
-                            if inserted_para:
-                                self._fst_stop.wait(2.0)  # Pause 2 seconds after a paragraph
-                            pass
-                        pass
+                    cfg = self._cfg
+                    stream = self._send_file_stream.get(cfg.text_speed, cfg.min_char_speed, cfg.code_type, cfg.spacing)
+                    codestream.send(stream, self._from_file, self._fst_stop)
                     self._fst_stop.set()
             except Exception as ex:
                 print(
-                    "<<< File sender encountered an error and will stop sending. Exception: {}"
-                ).format(ex)
+                    "<<< File sender encountered an error and will stop sending. Exception: {}".format(ex)
+                )
                 log.debug(traceback.format_exc(), 3)
                 self._fst_stop.set()
             finally:
                 self._set_virtual_closer_closed(True)
         log.debug("MRT-File Sender thread done.")
+        self._automation_check()
         return
 
     def _thread_kbreader_body(self):
@@ -1324,9 +1063,13 @@ class Mrt:
                     if ch == '\x03': # They pressed ^C
                         self._shutdown.set()
                         self._control_c_pressed.set()
+                        self._wakeup.set()
                         return # We are done
                     if ch == '\x1a': # CTRL-Z, help...
-                        print("\n['~' to open the key]\n['+' to close the key]\n[^C to exit]", flush=True)
+                        print("\n['~' to open the key]\n['+' to close the key]\n[^T for latency report]\n[^C to exit]", flush=True)
+                        continue
+                    if ch == '\x14': # CTRL-T, latency trace report
+                        print("\n{}".format(trace.report()), flush=True)
                         continue
                     if not self._local_loop_active and not ch == '~':
                         # The local loop needs to be active
@@ -1347,6 +1090,10 @@ class Mrt:
                     print("<<< Keyboard reader encountered an error and will stop reading. Error: {}".format(ex))
                     log.debug(traceback.format_exc(), 3)
                     self._kbt_stop.set()
+                    try:
+                        self._kb_queue.put_nowait(None)  # Wake up the keyboard sender
+                    except Full:
+                        pass
         finally:
             rawterm.exit()
             log.debug("MRT-KB Reader thread done.")
@@ -1355,12 +1102,11 @@ class Mrt:
     def _thread_kbsender_body(self):
         while not self._kbt_stop.is_set() and not self._shutdown.is_set():
             try:
-                ch = self._kb_queue.get(block=False)
+                ch = self._kb_queue.get()  # Block until there is a character (None to check for stop)
+                if ch is None:
+                    continue
                 code = self._sender.encode(ch)
                 self._from_keyboard(code, ch)
-            except Empty:
-                # The queue was empty. Wait a bit, then try again.
-                self._shutdown.wait(0.001)
             except Exception as ex:
                 print("<<< Keyboard sender encountered an error and will stop running. Exception: {}".format(ex))
                 self._kbt_stop.set()
@@ -1385,9 +1131,75 @@ class SelectorMrtArgumentsError(SelectorMrtLoadError):
 class SelectorMrtFileNotFound(SelectorMrtLoadError):
     pass
 
+class MrtBlueprint:
+    """
+    The processed (and validated) arguments and configuration for an Mrt, so
+    that one can be created without processing the arguments again.
+    """
+    def __init__(
+        self,
+        wire: int,
+        cfg: Config,
+        sender_dt: bool,
+        repeat_delay: int = -1,
+        record_filepath: Optional[str] = None,
+        file_to_play: Optional[str] = None,
+        file_to_send: Optional[str] = None,
+        schedfeed_spec: Optional[str] = None,
+        desc: Optional[str] = None
+    ) -> None:
+        self.wire: int = wire
+        self.cfg: Config = cfg
+        self.sender_dt: bool = sender_dt
+        self.repeat_delay: int = repeat_delay
+        self.record_filepath: Optional[str] = record_filepath
+        self.file_to_play: Optional[str] = file_to_play
+        self.file_to_send: Optional[str] = file_to_send
+        self.schedfeed_spec: Optional[str] = schedfeed_spec
+        self.desc: Optional[str] = desc
+        return
+
+    def check_files(self) -> None:
+        """
+        Check that the files an Mrt created from this needs are there (the same
+        checks the Mrt makes), without creating one.
+
+        Raises FileNotFoundError if a file isn't found.
+        """
+        if self.file_to_play:
+            p = Path(recorder.add_ext_if_needed(self.file_to_play.strip()))
+            if not p.is_file():
+                raise FileNotFoundError(p)
+        if self.file_to_send:
+            p = Path(self.file_to_send.strip())
+            if not p.is_file():
+                raise FileNotFoundError(p)
+        return
+
+    def create(self) -> Mrt:
+        """
+        Create an Mrt. Raises FileNotFoundError if a file it needs isn't found.
+        """
+        return Mrt(
+            MRT_VERSION_TEXT,
+            self.wire,
+            self.cfg,
+            self.sender_dt,
+            record_filepath=self.record_filepath,
+            repeat_delay=self.repeat_delay,
+            file_to_play=self.file_to_play,
+            file_to_send=self.file_to_send,
+            schedfeed_spec=self.schedfeed_spec
+        )
+
 class MrtSelector:
     """
     Uses a pykob.Selector to run Mrt in different ways (as specified in a Selector structure).
+
+    Each selection is processed into a `MrtBlueprint` when the selector is loaded.
+    The KOB (hardware and audio) is kept and shared by selections that have the
+    same hardware settings, so changing the selection only changes the wire,
+    feed or recording.
     """
 
     def add_ext_if_needed(s: str) -> str:
@@ -1414,9 +1226,14 @@ class MrtSelector:
         self._accept_select: Event = Event()
         self._selection_changed: Event = Event()
         self._run_complete: Event = Event()
+        self._run_stop: Event = Event()
 
+        self._blueprints: list[Optional[MrtBlueprint]] = []
+        self._kob: Optional[KOB] = None  # KOB shared by the Mrt selections
+        self._kob_settings: Optional[tuple] = None
         self._mrt: Optional[Mrt] = None
-        self._new_mrt: Optional[Mrt] = None
+        self._selection_index: Optional[int] = None  # Index of the running selection
+        self._selection_requested: Optional[int] = None  # Index of the selection to switch to
         self._spec_args: Optional[list[str]] = None
         self._spec_desc: Optional[str] = None
 
@@ -1429,9 +1246,38 @@ class MrtSelector:
             self._on_selection_changed(self._selector_type.change, self._selector.selector_value)
         return
 
-    def _load_mrt_for_spec(self, spec:dict[str,Optional[list[str]]]) -> Optional[Mrt]:
+    def _create_mrt(self, index:int) -> Optional[Mrt]:
+        """
+        Create the Mrt for a selection. Returns None if a file it needs has been
+        removed since the selector was loaded.
         """
-        Create an Mrt based on the specification.
+        blueprint = self._blueprints[index]
+        try:
+            return blueprint.create()
+        except FileNotFoundError as fnf:
+            log.warn("MRT selection '{}' file not found: {}".format(blueprint.desc, fnf))
+        return None
+
+    def _get_kob(self, cfg:Config) -> KOB:
+        """
+        Get the shared KOB, replacing it if the hardware settings needed are different.
+
+        Called from `run` when the previous Mrt is finished with it.
+        """
+        settings = Mrt.kob_settings(cfg)
+        if self._kob and not settings == self._kob_settings:
+            log.debug("MrtSelector - Hardware settings changed. Replacing the KOB.", 2)
+            self._kob.exit()
+            self._kob = None
+        if not self._kob:
+            self._kob = Mrt.create_kob(cfg, status_msg_hndlr=self._status_msg_hdlr)
+            self._kob_settings = settings
+        return self._kob
+
+    def _load_blueprint_for_spec(self, spec:dict[str,Optional[list[str]]]) -> MrtBlueprint:
+        """
+        Process the arguments in the specification and check that an Mrt can
+        be created from them.
 
         Can raise:
             * SelectorMrtLoadError: General Mrt creation error.
@@ -1439,21 +1285,20 @@ class MrtSelector:
         """
         spec_args = spec[SELECTION_ARGS_KEY]
         spec_desc = spec[SELECTION_DESCRIPTION_KEY]
-        log.debug("MrtSelector._load_mrt_for_spec: '{}'  MRT {}".format(spec_desc, spec_args))
-        mrt = None
+        log.debug("MrtSelector._load_blueprint_for_spec: '{}'  MRT {}".format(spec_desc, spec_args))
         try:
-            mrt, sel_spec = mrt_from_args(spec_args, cfg=self._cfg, allow_selector=False)  # Don't allow a Selector to be specified in a selection spec.
+            # Each selection gets its own copy of the configuration to apply its options to.
+            cfg = self._cfg.copy() if self._cfg else None
+            blueprint, sel_spec = mrt_blueprint_from_args(spec_args, cfg=cfg, allow_selector=False)  # Don't allow a Selector to be specified in a selection spec.
+            blueprint.desc = spec_desc
+            blueprint.check_files()
         except FileNotFoundError as fnf:
             raise SelectorMrtFileNotFound("File not found: '{}', trying to load specification: '{}'".format(fnf, spec_desc))
         except Exception as ex:
             raise SelectorMrtLoadError(ex)
         except SystemExit as args_err:
             raise SelectorMrtArgumentsError(args_err)
-        finally:
-            if not mrt is None:
-                self._spec_desc = spec_desc
-                self._spec_args = spec_args
-        return mrt
+        return blueprint
 
     def _load_selector(self, filepath:str) -> bool:
         """
@@ -1501,13 +1346,17 @@ class MrtSelector:
                         retries_enabled=self._enable_retries
                     )
                     #
-                    # Try to load an Mrt for each spec
+                    # Process and check the spec for each selection
+                    self._blueprints = []
                     for n in range(0, len(self._selector_specs)):
                         selection_no = n - self._selector_type.index_adj
                         spec = self._selector_specs[n]
+                        if spec is None:
+                            self._blueprints.append(None)
+                            continue
                         log.log("Checking selector spec for selection {}\n".format(selection_no), dt="")
-                        test_mrt = self._load_mrt_for_spec(spec)
-                        log.debug("MrtSelector._load_selector - Test Mrt created for spec [{}] with args {}".format(spec[SELECTION_DESCRIPTION_KEY], spec[SELECTION_ARGS_KEY]), 4)
+                        self._blueprints.append(self._load_blueprint_for_spec(spec))
+                        log.debug("MrtSelector._load_selector - Mrt blueprint created for spec [{}] with args {}".format(spec[SELECTION_DESCRIPTION_KEY], spec[SELECTION_ARGS_KEY]), 4)
                     if not self._selector.start():
                         # Selector.start returns False if a switch wasn't found but
                         # is retrying to find one. If this is the case, return False
@@ -1531,32 +1380,37 @@ class MrtSelector:
 
     def _on_selection_changed(self, change:SelectorChange, value):
         """
-        The Selector changed. Get the selection number and start an Mrt with the configuration.
+        The Selector changed. Record the selection for `run` to switch to.
+
+        This is called on the shared scheduler thread, so it only records the
+        selection and ends the current Mrt's main loop. `run` exits the current
+        Mrt and creates and starts the new one.
         """
         if self._accept_select.is_set() and self._selector_type.change == change:
             selected = value
             index = selected + self._selector_type.index_adj
-            spec = self._selector_specs[index]
-            if spec is None:
+            if self._blueprints[index] is None:
                 # There wasn't a specification for this selection. ZZZ: Raise an exception?
                 return
-            new_mrt = self._load_mrt_for_spec(spec)
-            if new_mrt is None:
-                # Should we raise an exception in this case?
-                pass
-            else:
-                self._new_mrt = new_mrt
-                if self._mrt:
-                    self._mrt.exit()
-                self._selection_changed.set()
+            self._selection_requested = index
+            self._selection_changed.set()
+            mrt = self._mrt
+            if mrt:
+                mrt.stop()
         return
 
     def exit(self) -> None:
-        self._new_mrt = None
-        self._selection_changed.set()  # Wake up `run
+        self._run_stop.set()
+        self._selection_changed.set()  # Wake up `run`
+        mrt = self._mrt
+        if mrt:
+            mrt.stop()
         self._run_complete.wait()
         if self._mrt:
             self._mrt.exit()
+        if self._kob:
+            self._kob.exit()
+            self._kob = None
         if self._selector:
             self._selector.exit()
         return
@@ -1573,21 +1427,29 @@ class MrtSelector:
             while not self._run_complete.is_set():
                 if self._selection_changed.wait(0.3):
                     self._selection_changed.clear()
-                    self._accept_select.clear()
                     if self._mrt:
                         self._mrt.exit()
                         self._mrt = None
-                    if self._new_mrt:
-                        log.log("\nSwitching to MRT selection {}: {}\n\n".format(self._selector.one_of_four, self._spec_desc), dt="")
-                        self._mrt = self._new_mrt
-                        self._new_mrt = None
-                        self._mrt.start()
-                        self._accept_select.set()
-                        self._mrt.main_loop()
-                        log.debug("MrtSelector.run - Mrt returned from main_loop.")
-                    else:
+                    if self._run_stop.is_set():
                         break
-                    pass
+                    index = self._selection_requested
+                    mrt = self._create_mrt(index)
+                    if mrt is None and self._selection_index is not None and not index == self._selection_index:
+                        # Keep running the current selection
+                        index = self._selection_index
+                        mrt = self._create_mrt(index)
+                    if mrt is None:
+                        continue  # Wait for another selection
+                    self._selection_index = index
+                    self._spec_desc = self._blueprints[index].desc
+                    self._spec_args = self._selector_specs[index][SELECTION_ARGS_KEY]
+                    log.log("\nSwitching to MRT selection {}: {}\n\n".format(self._selector.one_of_four, self._spec_desc), dt="")
+                    self._mrt = mrt
+                    mrt.start(shared_kob=self._get_kob(mrt.cfg))
+                    if self._selection_changed.is_set():
+                        mrt.stop()  # The selection changed again while this one was starting
+                    mrt.main_loop()
+                    log.debug("MrtSelector.run - Mrt returned from main_loop.")
                 pass
             pass
         finally:
@@ -1601,7 +1463,12 @@ def status_msg_handler(msg):
     log.log("\n{}\n".format(msg), dt="")
     return
 
-def mrt_from_args(options: Optional[Sequence[str]] = None, cfg: Optional[Config] = None, allow_selector:bool=True) -> tuple[Mrt, Optional[MrtSelector]]:
+def mrt_from_args(options: Optional[Sequence[str]] = None, cfg: Optional[Config] = None, allow_selector:bool=True) -> tuple[Optional[Mrt], Optional[MrtSelector]]:
+    blueprint, selector = mrt_blueprint_from_args(options, cfg, allow_selector)
+    mrt = None if not selector is None else blueprint.create()
+    return (mrt, selector)
+
+def mrt_blueprint_from_args(options: Optional[Sequence[str]] = None, cfg: Optional[Config] = None, allow_selector:bool=True) -> tuple[MrtBlueprint, Optional[MrtSelector]]:
     arg_parser = argparse.ArgumentParser(description="Morse Receive & Transmit (Mr T). "
         + "Receive from wire and send from key.\nThe Global configuration is used except as overridden by options.",
         parents= [
@@ -1616,7 +1483,9 @@ def mrt_from_args(options: Optional[Sequence[str]] = None, cfg: Optional[Config]
             config2.config_file_override,
             config2.logging_level_override,
             pkappargs.record_session_override,
-            pkappargs.sender_datetime_override
+            pkappargs.sender_datetime_override,
+            pkappargs.trace_latency_override,
+            pkappargs.metrics_override
         ],
         exit_on_error=False
     )
@@ -1723,18 +1592,17 @@ def mrt_from_args(options: Optional[Sequence[str]] = None, cfg: Optional[Config]
             pass
         pass
 
-    mrt = None if not selector is None else Mrt(
-        MRT_VERSION_TEXT,
-            wire,
-            cfg,
-            sender_dt,
-            record_filepath=record_filepath,
-            repeat_delay=repeat_delay,
-            file_to_play=play_filepath,
-            file_to_send=sendtext_filepath,
-            schedfeed_spec=schedfeed_spec_path
-        )
-    return (mrt, selector)
+    blueprint = MrtBlueprint(
+        wire,
+        cfg,
+        sender_dt,
+        record_filepath=record_filepath,
+        repeat_delay=repeat_delay,
+        file_to_play=play_filepath,
+        file_to_send=sendtext_filepath,
+        schedfeed_spec=schedfeed_spec_path
+    )
+    return (blueprint, selector)
 
 """
 Main code
@@ -1752,6 +1620,11 @@ if __name__ == "__main__":
 
 
         mrt, mrt_selector = mrt_from_args(allow_selector=True)
+        # The process-wide options are handled here, once, rather than for each selection.
+        process_args, _ = argparse.ArgumentParser(add_help=False,
+            parents=[pkappargs.trace_latency_override, pkappargs.metrics_override]).parse_known_args()
+        pkappargs.trace_latency_from_args(process_args)
+        pkappargs.metrics_from_args(process_args)
 
         if mrt_selector:
             log.log("Running with a selector.\n", dt="")
@@ -1784,6 +1657,11 @@ if __name__ == "__main__":
             mrt.exit()
         if mrt_selector:
             mrt_selector.exit()
+        scheduler.exit_shared()
+        metrics.stop_exporter()
+        if trace.is_enabled():
+            print()
+            print(trace.report())
         print()
         print("~73", flush=True)
         sleep(0.5)
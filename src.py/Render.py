@@ -0,0 +1,88 @@
+"""
+MIT License
+
+Copyright (c) 2020-24 PyKOB - MorseKOB in Python
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+"""
+Render
+======
+Render text or a recording (from the `Recorder` class) to a WAV file, using
+the sounder or tone sound, much faster than playing it.
+"""
+import argparse
+import sys
+import time
+from pykob import config2, log, recorder, render
+from pykob.config2 import Config
+
+try:
+    arg_parser = argparse.ArgumentParser(description="Render text or a recording to a WAV file", parents= [
+        config2.audio_type_override,
+        config2.code_type_override,
+        config2.spacing_override,
+        config2.min_char_speed_override,
+        config2.text_speed_override,
+        config2.logging_level_override,
+        config2.config_file_override,
+      ])
+    arg_parser.add_argument('wav_file', metavar='wav_file',
+            help='WAV file to write.')
+    source = arg_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--text", metavar="text",
+            help="Text to render.", dest="text")
+    source.add_argument("--textfile", metavar="text_file",
+            help="File with the text to render.", dest="text_file")
+    source.add_argument("--recording", metavar="recording_file",
+            help="Recording file (in PyKOB Recorder format) to render.", dest="recording_file")
+    arg_parser.add_argument("--speedfactor", type=int, metavar="n", default=100,
+            help="Factor (percentage) to adjust recording speed by (Default 100).", dest="speed_factor")
+    arg_parser.add_argument("--maxsilence", type=int, metavar="n", default=5,
+            help="Longest silence in a recording to render, in seconds. A value of '0' will reproduce all silence as recorded (Default 5).", dest="max_silence")
+    arg_parser.add_argument("--frequency", type=int, metavar="hz", default=750,
+            help="Tone frequency, when rendering tone (Default 750).", dest="frequency")
+    args = arg_parser.parse_args()
+    cfg:Config = config2.process_config_args(args)
+
+    log.set_logging_level(cfg.logging_level)
+
+    t = time.perf_counter()
+    renderer = render.Renderer(args.wav_file, cfg.audio_type, args.frequency)
+    try:
+        if args.recording_file:
+            renderer.render_recording(recorder.add_ext_if_needed(args.recording_file),
+                    max_silence=args.max_silence, speed_factor=args.speed_factor)
+        else:
+            text = args.text
+            if args.text_file:
+                with open(args.text_file, "r", encoding="utf-8") as fp:
+                    text = fp.read()
+            renderer.render_text(text, cfg.text_speed, cfg.min_char_speed, cfg.code_type, cfg.spacing)
+    finally:
+        renderer.close()
+    print("Rendered {:.1f} seconds of audio to '{}' in {:.2f} seconds.".format(
+        renderer.duration, args.wav_file, time.perf_counter() - t))
+except FileNotFoundError as ex:
+    log.err("File not found: {}".format(ex.filename))
+    sys.exit(1)
+except KeyboardInterrupt:
+    print("\nEarly exit.")
+sys.exit(0)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+MIT License
+
+Copyright (c) 2020-24 PyKOB - MorseKOB in Python
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+"""
+StartupTime.py
+
+Measures the startup time of the PyKOB applications and modules, so changes
+that affect it can be compared.
+
+Each entry point is run in a new Python process a number of times, and the
+median and minimum times are reported. The applications are run with '--help'
+(timed until the usage is printed, which includes loading what they need to
+process their arguments), and
+'first sound' measures the time to import `kob` and `audio`, create a KOB, and
+sound the synth (using a headless audio sink, so no audio device is needed).
+
+Results can be saved to a JSON file and compared with a saved run, for
+example to check the timing on a Raspberry Pi before and after a change.
+"""
+
+import argparse
+import json
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+import time
+
+_FIRST_SOUND = """
+from pykob import audio, kob
+k = kob.KOB(useAudio=True, audioSink=audio.NullSink())
+k.soundCode((2, -1, 1))
+print("SOUNDED", flush=True)
+k.exit()
+"""
+
+ENTRY_POINTS = (
+    # Name, Arguments (after the Python executable), Output line that marks the end (None for exit)
+    ("import pykob", ["-c", "import pykob"], None),
+    ("import pykob.morse", ["-c", "import pykob.morse"], None),
+    ("MKOB --help", ["MKOB.py", "--help"], "usage:"),
+    ("MRT --help", ["MRT.py", "--help"], "usage:"),
+    ("Telegram --help", ["Telegram.py", "--help"], "usage:"),
+    ("first sound", ["-c", _FIRST_SOUND], "SOUNDED"),
+)
+
+def time_run(args, cwd, marker=None):  # type: (list[str], Path, str|None) -> float
+    """
+    Run Python with the arguments and return the time (seconds) until it exits,
+    or until it prints the marker line if one is given.
+    """
+    t = time.perf_counter()
+    proc = subprocess.Popen([sys.executable] + args, cwd=cwd, stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL, text=True)
+    dt = None
+    for line in proc.stdout:
+        if marker and line.startswith(marker) and dt is None:
+            dt = time.perf_counter() - t
+    proc.wait()
+    if dt is None:
+        dt = time.perf_counter() - t
+    if not proc.returncode == 0:
+        raise RuntimeError("exit status {}".format(proc.returncode))
+    return dt
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Measure the startup time of the PyKOB applications.")
+    arg_parser.add_argument("--runs", type=int, metavar="n", default=5,
+            help="Number of times to run each entry point (Default 5).", dest="runs")
+    arg_parser.add_argument("--save", metavar="json-file",
+            help="Save the results to a JSON file.", dest="save_file")
+    arg_parser.add_argument("--compare", metavar="json-file",
+            help="Compare the results to ones saved with '--save'.", dest="compare_file")
+    args = arg_parser.parse_args()
+
+    cwd = Path(__file__).parent
+    baseline = {}
+    if args.compare_file:
+        with open(args.compare_file, "r") as fp:
+            baseline = json.load(fp)
+    # Run python once to make sure the bytecode is compiled and files are cached.
+    subprocess.run([sys.executable, "-m", "compileall", "-q", "."], cwd=cwd)
+    results = {}
+    print("{:20} {:>10} {:>10} {:>10}".format("Entry point", "median ms", "min ms", "baseline"))
+    for name, eargs, marker in ENTRY_POINTS:
+        try:
+            times = [time_run(eargs, cwd, marker) for i in range(args.runs)]
+        except Exception as ex:
+            print("{:20} failed: {}".format(name, ex))
+            continue
+        median_ms = statistics.median(times) * 1000.0
+        results[name] = median_ms
+        base = ""
+        if name in baseline:
+            base = "{:.0f}%".format(100.0 * median_ms / baseline[name])
+        print("{:20} {:10.1f} {:10.1f} {:>10}".format(name, median_ms, min(times) * 1000.0, base))
+    if args.save_file:
+        with open(args.save_file, "w") as fp:
+            json.dump(results, fp, indent=2)
@@ -47,12 +47,9 @@ color, and more) it looks in the application's current directory.
 
 import argparse
 from ast import literal_eval
+from collections import OrderedDict, deque
 import json
 from json import JSONDecodeError
-import pygame
-from pygame.font import Font
-from pygame import Rect, Surface, typing
-from pygame.typing import ColorLike, RectLike
 import os
 from os import path as path_func
 import sys
@@ -60,18 +57,18 @@ from sys import path
 from sys import platform as sys_platform
 from sys import version as sys_version
 from threading import Event
-import tkinter as tk
-from tkinter import messagebox
 import time
 import traceback
+from typing import Iterator
 
-from pykob import VERSION, config2, log, kob, internet, morse
+from pykob import VERSION, config2, log, kob, internet, metrics, morse
 from pykob.kob import CodeSource
 from pykob import VERSION as PKVERSION
 from pykob.config2 import Config
 from pykob.internet import Internet
 from pykob.kob import KOB
 from pykob.morse import Reader, Sender
+import pkappargs
 
 COMPILE_INFO = globals().get("__compiled__")
 __version__ = '1.2.2'
@@ -85,6 +82,11 @@ STARTMSG = (-0x7fff, +2, -1000, +2)  # code sequence sent at start of telegram
 ENDMSG   = (-1000, +1)  # ending code sequence
 LATCH_CODE = (-0x7fff, +1)  # code sequence to force latching (close)
 UNLATCH_CODE = (-0x7fff, +2)  # code sequence to unlatch (open)
+EVENT_WAIT_MAX = 1000  # most time to wait for an event (ms) before checking for shutdown
+TIMER_SLACK = 0.05  # allowance (seconds) when checking if a timer event is due
+
+_m_glyph_hits = metrics.counter("pykob_telegram_glyph_cache_total", "Glyph cache lookups.", {"result": "hit"})
+_m_glyph_misses = metrics.counter("pykob_telegram_glyph_cache_total", "Glyph cache lookups.", {"result": "miss"})
 
 class TGDisplay:
     """
@@ -94,6 +96,8 @@ class TGDisplay:
 
     ''' Black color constant '''
     BLACK = (0,0,0)
+    MAX_FPS = 30  # Most display updates per second
+    MAX_DIRTY_RECTS = 64  # More than this and the whole display is updated
 
     def __init__(self,
                 screensize,
@@ -135,6 +139,15 @@ class TGDisplay:
         # END OF CONFIG PROPERTIES
         self._space_width = self._font.size(' ')[0]
         self._text_line_height = self._font.get_linesize()
+        #
+        # Rendered glyphs (LRU) keyed by (char, bold, italic, color, size)
+        self._glyphs = OrderedDict()  # type: OrderedDict[tuple[str,bool,bool,Any,int],Surface]
+        self._glyph_cache_size = max(tgcfg.glyph_cache_size, 0)
+        self._glyph_hits = 0
+        self._glyph_misses = 0
+        self._font_style = (False, False)  # type: tuple[bool,bool]  # The font's current (bold, italic)
+        self._font.bold = False
+        self._font.italic = False
         self._spaces = 0
         self._scroll_lines = 4
         self._x = 0
@@ -142,6 +155,10 @@ class TGDisplay:
         #
         # Masthead holder. It will be generated in `start`
         self._masthead = None  # type: Surface|None
+        # Blank forms (the page on the black background), with and without the
+        # masthead, that `new_form` blits in one operation. Generated in `start`
+        self._form_blank = None  # type: Surface|None
+        self._form_masthead = None  # type: Surface|None
         #
         # Rendered characters used for the Key Closer state on the display form.
         #  These are calculated once in the `start` method
@@ -159,24 +176,32 @@ class TGDisplay:
         self._W_state_pt = (0,0)  # type: tuple[int,int]  # Location to put the indicator
         self._K_statebg_pt = (0,0)  # type: tuple[int,int]  # Location to put the indicator background
         self._last_wire_display_connected = False  # type: bool  # Remembers the last state displayed, to use in new_form
+        # Areas of the form that have changed since the display was updated
+        self._dirty_rects = []  # type: list[Rect]
+        self._dirty_all = False  # type: bool  # The whole display needs to be updated
+        self._t_next_update = 0.0  # type: float  # Earliest (monotonic) time for the next display update
+        # Page scroll (advance) in progress. Run a step at a time by `scroll`
+        self._scroll_steps = None  # type: Iterator[float]|None
+        self._t_scroll_next = 0.0  # type: float  # Monotonic time the next scroll step is due
         # Flags/Events
         self._page_dirty = True  # type: bool  # True if text has been written on a new page/form
         self._shutdown = Event()
         return
 
-    def _output_masthead(self):
+    def _mark_dirty(self, rect):  # type: (RectLike) -> None
         """
-        Render the top section of the form.
+        Record an area of the form that has changed.
         """
-        log.debug("TGDisplay._output_masthead", 3)
-        if self._masthead is not None:
-            lf = (self._screen.width - self._masthead.width) // 2
-            if lf < 0:
-                lf = 0
-            y = self._y  # Save `y` before advance
-            self.advance_page(self._tgcfg.top_margin + self._masthead.height)
-            top = y + self._tgcfg.top_margin
-            self._screen.blit(self._masthead, (lf,top))
+        if not self._dirty_all:
+            if len(self._dirty_rects) < TGDisplay.MAX_DIRTY_RECTS:
+                self._dirty_rects.append(Rect(rect))
+            else:
+                self._mark_all_dirty()
+        return
+
+    def _mark_all_dirty(self):  # type: () -> None
+        self._dirty_all = True
+        self._dirty_rects.clear()
         return
 
     @property
@@ -187,10 +212,27 @@ class TGDisplay:
         pygame.display.set_caption(s)
         return
 
+    @property
+    def glyph_cache_stats(self):  # type: () -> tuple[int,int,int]
+        """
+        The glyph cache (hits, misses, size).
+        """
+        return (self._glyph_hits, self._glyph_misses, len(self._glyphs))
+
     @property
     def height(self):  # type: () -> int
         return self._screen.height
 
+    @property
+    def update_delay(self):  # type: () -> float|None
+        """
+        Seconds until a pending display update can be made (0 if it can be made
+        now), or None if there isn't one pending.
+        """
+        if not (self._dirty_all or self._dirty_rects):
+            return None
+        return max(self._t_next_update - time.monotonic(), 0.0)
+
     @property
     def page_color(self):  # type: () -> ColorLike
         return self._page_color
@@ -220,50 +262,86 @@ class TGDisplay:
         dy = (y + pixel_rows) - (sh - bm_add)
         if dy > 0:
             self._screen.scroll(0, -dy)
+            self._mark_all_dirty()
             self._y = sh - bm_add
             y -= dy
         self._screen.fill(TGDisplay.BLACK, pygame.Rect(0, y, sw, sh-y))
         if paint_page:
             self._screen.fill(self._page_color, pygame.Rect(self._page_left, y, self._page_width, sh-y))
+        self._mark_dirty((0, y, sw, sh-y))
         self.show_closer_state(self._last_closer_display_open)
         self.show_wire_state(self._last_wire_display_connected)
-        pygame.display.flip()
+        self.update()
         return
 
     def blit(self, sprite, topleft, update=False):  # type: (Surface, tuple[int,int], bool) -> None
         """
         Blit (draw/render) a Surface sprite onto the form.
         """
-        self._screen.blit(sprite, topleft)
+        self._mark_dirty(self._screen.blit(sprite, topleft))
         if update:
-            pygame.display.flip()
+            self.update()
         return
 
     def erase_closer_state(self, update=False):  # type: (bool) -> None
-        self._screen.blit(self._KC_state_bg, self._KC_statebg_pt)
+        self._mark_dirty(self._screen.blit(self._KC_state_bg, self._KC_statebg_pt))
         if update:
-            pygame.display.flip()
+            self.update()
         return
 
     def erase_wire_state(self, update=False):  # type: (bool) -> None
-        self._screen.blit(self._W_state_bg, self._W_statebg_pt)
+        self._mark_dirty(self._screen.blit(self._W_state_bg, self._W_statebg_pt))
         if update:
-            pygame.display.flip()
+            self.update()
         return
 
     def exit(self):  # type: () -> None
+        hits, misses, size = self.glyph_cache_stats
+        lookups = hits + misses
+        log.debug("TGDisplay glyph cache: {} lookups, {:.1f}% hits, {} of {} glyphs cached.".format(
+            lookups, (100.0 * hits / lookups) if lookups > 0 else 0.0, size, self._glyph_cache_size), 1)
         self._screen = None
+        self._glyphs.clear()
         pygame.display.quit()
         return
 
     def fill(self, color, rect):  # type: (ColorLike, RectLike) -> None
-        self._screen.fill(color, rect)
+        self._mark_dirty(self._screen.fill(color, rect))
         return
 
     def form_update(self):  # type: () -> None
-        pygame.display.flip()
+        """
+        Update the display now (regardless of the FPS limit).
+        """
+        self.update(force=True)
         return
 
+    def glyph(self, c, bold=False, italic=False):  # type: (str, bool, bool) -> Surface
+        """
+        Get the rendered glyph for a character (from the cache if it has been
+        rendered recently).
+        """
+        key = (c, bold, italic, self._text_color, self._tgcfg.text_font_size)
+        glyph = self._glyphs.get(key)
+        if glyph is not None:
+            self._glyphs.move_to_end(key)
+            self._glyph_hits += 1
+            _m_glyph_hits.inc()
+            return glyph
+        self._glyph_misses += 1
+        _m_glyph_misses.inc()
+        font = self._font
+        if not self._font_style == (bold, italic):
+            font.bold = bold
+            font.italic = italic
+            self._font_style = (bold, italic)
+        glyph = font.render(c, True, self._text_color)
+        if self._glyph_cache_size > 0:
+            self._glyphs[key] = glyph
+            if len(self._glyphs) > self._glyph_cache_size:
+                self._glyphs.popitem(last=False)
+        return glyph
+
 
     def message_box(self, message, font_size=30):  # type: (str,int) -> None
         """
@@ -284,7 +362,8 @@ class TGDisplay:
         self._screen.blit(text_surface, text_rect)
 
         # Update the display
-        pygame.display.flip()
+        self._mark_all_dirty()
+        self.update(force=True)
 
         # Wait for a key press
         wait_for_key = True
@@ -309,103 +388,146 @@ class TGDisplay:
         """
         If `fresh`, instantly create clear the screen and create a new form at the top.
         If not, scroll the current form up and start a new one below it.
+
+        The scroll is animated over the page advance time. It is started here and
+        run a step at a time by `scroll`, so the caller isn't held up.
         """
         log.debug("TGDisplay.new_form", 2)
+        self._scroll_steps = None  # Replaces a scroll in progress
         self._x = self._text_leftmost
         adv_secs = 0.0 if fresh else self._page_adv_secs
         self.erase_closer_state()
         self.erase_wire_state()
         if adv_secs == 0:
-            self._screen.fill(TGDisplay.BLACK)  # Background
-            self._screen.fill(self._page_color, self._page_rect)
-            self._y = 0
+            # Blit the pre-rendered form (background, page and masthead)
+            self._mark_all_dirty()
             if disp_masthead:
-                self._output_masthead()
-                self.new_line(2)
+                self._screen.blit(self._form_masthead, (0,0))
+                mh_height = self._masthead.height if self._masthead is not None else 0
+                self._y = self._top_margin + mh_height + (2 * self._text_line_height)
             else:
-                self.advance_page(self._top_margin)
+                self._screen.blit(self._form_blank, (0,0))
+                self._y = self._top_margin
             pass
         elif adv_secs < 0:  # A value of -1 indicates 'no new page'
             self.new_line(2)
         elif self._page_dirty and adv_secs > 0:
             self.new_line()
-            # We scroll in the:
-            #  - page bottom margin
-            #  - gap between pages
-            #  - page top margin
-            #  - masthead
-            #  - gap between masthead and first line of text
-            #
-            ## Bottom margin
-            self._y = self._screen.height
-            scroll_to_go = self._bottom_margin
-            while scroll_to_go > 0:
-                dy = min(self._scroll_lines, scroll_to_go)
-                self.advance_page(dy, add_margin=False)
-                scroll_pause = (adv_secs / (self._screen.height / dy))
-                dt = scroll_pause if scroll_to_go >= dy else (scroll_pause / (dy / scroll_to_go))
-                scroll_to_go -= dy
-                pygame.display.flip()
-                self._shutdown.wait(dt)
-            pass
-            ## Page gap
-            scroll_to_go = self._form_spacing
-            while scroll_to_go > 0:
-                dy = min(self._scroll_lines, scroll_to_go)
-                self.advance_page(dy, add_margin=False, paint_page=False)
-                scroll_pause = (adv_secs / (self._screen.height / dy))
-                dt = scroll_pause if scroll_to_go >= dy else (scroll_pause / (dy / scroll_to_go))
-                scroll_to_go -= dy
-                pygame.display.flip()
-                self._shutdown.wait(dt)
-            pass
-            ## Top margin
-            scroll_to_go = self._top_margin
-            while scroll_to_go > 0:
-                dy = min(self._scroll_lines, scroll_to_go)
-                self.advance_page(dy, add_margin=False)
-                scroll_pause = (adv_secs / (self._screen.height / dy))
-                dt = scroll_pause if scroll_to_go >= dy else (scroll_pause / (dy / scroll_to_go))
-                scroll_to_go -= dy
-                pygame.display.flip()
-                self._shutdown.wait(dt)
-            pass
-            ## Masthead
-            scroll_to_go = self._masthead.height
-            mhstart_y = 0  # Where to start in the masthead
-            mhleft_x = (self._screen.width - self._masthead.width) // 2
-            while scroll_to_go > 0:
-                dy = min(self._scroll_lines, (self._masthead.height - mhstart_y), scroll_to_go)
-                self.advance_page(dy, add_margin=False)
-                ty = self._y - dy
-                # blit a section of the masthead
-                mh_slice = Rect(0, mhstart_y, self._masthead.width, dy)
-                self._screen.blit(self._masthead, (mhleft_x,ty), mh_slice)
-                scroll_pause = (adv_secs / (self._screen.height / dy))
-                dt = scroll_pause if scroll_to_go >= dy else (scroll_pause / (dy / scroll_to_go))
-                scroll_to_go -= dy
-                mhstart_y += dy
-                pygame.display.flip()
-                self._shutdown.wait(dt)
-            pass
-            ## Two blank lines between masthead and text
-            scroll_to_go = 2 * self._text_line_height
-            while scroll_to_go > 0:
-                dy = min(self._scroll_lines, scroll_to_go)
-                self.advance_page(dy)
-                scroll_pause = (adv_secs / (self._screen.height / dy))
-                dt = scroll_pause if scroll_to_go >= dy else (scroll_pause / (dy / scroll_to_go))
-                scroll_to_go -= dy
-                pygame.display.flip()
-                self._shutdown.wait(dt)
-            pass
-        pass
+            self._scroll_steps = self._new_form_scroll_steps(adv_secs)
+            self._t_scroll_next = time.monotonic()
+            self.scroll()
+            return
+        self._new_form_done()
+        return
+
+    def _new_form_done(self):  # type: () -> None
         self.show_closer_state(self._last_closer_display_open)
         self.show_wire_state(self._last_wire_display_connected)
         self._page_dirty = False
-        pygame.display.flip()
+        self.update()
+        return
+
+    def _new_form_scroll_steps(self, adv_secs):  # type: (float) -> Iterator[float]
+        """
+        Scroll in a new form. Yields the seconds to pause after each step.
+        """
+        # We scroll in the:
+        #  - page bottom margin
+        #  - gap between pages
+        #  - page top margin
+        #  - masthead
+        #  - gap between masthead and first line of text
+        #
+        ## Bottom margin
+        self._y = self._screen.height
+        scroll_to_go = self._bottom_margin
+        while scroll_to_go > 0:
+            dy = min(self._scroll_lines, scroll_to_go)
+            self.advance_page(dy, add_margin=False)
+            scroll_pause = (adv_secs / (self._screen.height / dy))
+            dt = scroll_pause if scroll_to_go >= dy else (scroll_pause / (dy / scroll_to_go))
+            scroll_to_go -= dy
+            self.update(force=True)
+            yield dt
+        pass
+        ## Page gap
+        scroll_to_go = self._form_spacing
+        while scroll_to_go > 0:
+            dy = min(self._scroll_lines, scroll_to_go)
+            self.advance_page(dy, add_margin=False, paint_page=False)
+            scroll_pause = (adv_secs / (self._screen.height / dy))
+            dt = scroll_pause if scroll_to_go >= dy else (scroll_pause / (dy / scroll_to_go))
+            scroll_to_go -= dy
+            self.update(force=True)
+            yield dt
+        pass
+        ## Top margin
+        scroll_to_go = self._top_margin
+        while scroll_to_go > 0:
+            dy = min(self._scroll_lines, scroll_to_go)
+            self.advance_page(dy, add_margin=False)
+            scroll_pause = (adv_secs / (self._screen.height / dy))
+            dt = scroll_pause if scroll_to_go >= dy else (scroll_pause / (dy / scroll_to_go))
+            scroll_to_go -= dy
+            self.update(force=True)
+            yield dt
+        pass
+        ## Masthead
+        scroll_to_go = self._masthead.height
+        mhstart_y = 0  # Where to start in the masthead
+        mhleft_x = (self._screen.width - self._masthead.width) // 2
+        while scroll_to_go > 0:
+            dy = min(self._scroll_lines, (self._masthead.height - mhstart_y), scroll_to_go)
+            self.advance_page(dy, add_margin=False)
+            ty = self._y - dy
+            # blit a section of the masthead
+            mh_slice = Rect(0, mhstart_y, self._masthead.width, dy)
+            self._mark_dirty(self._screen.blit(self._masthead, (mhleft_x,ty), mh_slice))
+            scroll_pause = (adv_secs / (self._screen.height / dy))
+            dt = scroll_pause if scroll_to_go >= dy else (scroll_pause / (dy / scroll_to_go))
+            scroll_to_go -= dy
+            mhstart_y += dy
+            self.update(force=True)
+            yield dt
+        pass
+        ## Two blank lines between masthead and text
+        scroll_to_go = 2 * self._text_line_height
+        while scroll_to_go > 0:
+            dy = min(self._scroll_lines, scroll_to_go)
+            self.advance_page(dy)
+            scroll_pause = (adv_secs / (self._screen.height / dy))
+            dt = scroll_pause if scroll_to_go >= dy else (scroll_pause / (dy / scroll_to_go))
+            scroll_to_go -= dy
+            self.update(force=True)
+            yield dt
+        pass
         return
 
+    def scroll(self):  # type: () -> float|None
+        """
+        Run the page scroll steps that are due. Return the seconds until the next
+        step is due, or None if a scroll isn't in progress.
+        """
+        while self._scroll_steps is not None and not self._shutdown.is_set():
+            now = time.monotonic()
+            if now < self._t_scroll_next:
+                return self._t_scroll_next - now
+            try:
+                dt = next(self._scroll_steps)
+            except StopIteration:
+                self._scroll_steps = None
+                self._new_form_done()
+                return None
+            self._t_scroll_next = now + dt
+        return None
+
+    @property
+    def scrolling(self):  # type: () -> bool
+        """
+        True while a page scroll (from `new_form`) is in progress.
+        """
+        return self._scroll_steps is not None
+
     def print(self, text, bold=False, italic=False, update=True, spacing=0.0):  # type: (str, bool, bool, bool, float) -> None
         if text is None:
             return
@@ -419,23 +541,20 @@ class TGDisplay:
                 continue
             if c < ' ':
                 continue
-            font = self._font
-            font.bold = bold
-            font.italic = italic
             space = int(self._space_width * (self._spaces + spacing))
-            char_glyph = font.render(c, True, self._text_color)
+            char_glyph = self.glyph(c, bold, italic)
             glyph_width = char_glyph.width
             text_end_x = self._x + space + glyph_width
             if ((self._spaces > 0) and (text_end_x > self._text_wrap_x)) or (text_end_x > self._text_right_max):
                 space = 0
                 self.new_line()
-            self._screen.blit(char_glyph, (self._x + space, self._y-char_glyph.height))
+            self._mark_dirty(self._screen.blit(char_glyph, (self._x + space, self._y-char_glyph.height)))
             self._x += space + glyph_width
             self._spaces = 0
             screen_output = True
             self._page_dirty = True
         if update and screen_output:
-            pygame.display.flip()
+            self.update()
         return
 
     def show_closer_state(self, open, update=False):  # type: (bool,bool) -> None
@@ -447,11 +566,11 @@ class TGDisplay:
         self.erase_closer_state(update=False)
         self._last_closer_display_open = open
         if open:
-            self._screen.blit(self._KC_open_sprite, self._KC_state_pt)
+            self._mark_dirty(self._screen.blit(self._KC_open_sprite, self._KC_state_pt))
         else:
-            self._screen.blit(self._KC_closed_sprite, self._KC_state_pt)
+            self._mark_dirty(self._screen.blit(self._KC_closed_sprite, self._KC_state_pt))
         if update:
-            pygame.display.flip()
+            self.update()
         return
 
     def show_wire_state(self, connected, update=False):  # type: (bool,bool) -> None
@@ -463,17 +582,40 @@ class TGDisplay:
         self.erase_wire_state(update=False)
         self._last_wire_display_connected = connected
         if connected:
-            self._screen.blit(self._WC_sprite, self._W_state_pt)
+            self._mark_dirty(self._screen.blit(self._WC_sprite, self._W_state_pt))
         else:
-            self._screen.blit(self._WD_sprite, self._W_state_pt)
+            self._mark_dirty(self._screen.blit(self._WD_sprite, self._W_state_pt))
         if update:
-            pygame.display.flip()
+            self.update()
         return
 
     def shutdown(self):  # type: () -> None
         self._shutdown.set()
         return
 
+    def update(self, force=False):  # type: (bool) -> None
+        """
+        Update the display with the areas of the form that have changed.
+
+        Updates are limited to MAX_FPS, so changes made in quick succession
+        (fast incoming code) are combined. If an update is too soon it is left
+        pending, and must be made later by calling `update` again (see
+        `update_delay`). Use `force` to update now.
+        """
+        if not (self._dirty_all or self._dirty_rects):
+            return
+        now = time.monotonic()
+        if not force and now < self._t_next_update:
+            return
+        if self._dirty_all:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self._dirty_rects)
+        self._dirty_rects = []
+        self._dirty_all = False
+        self._t_next_update = now + (1.0 / TGDisplay.MAX_FPS)
+        return
+
     def start(self):  # type: () -> None
         #
         # Check the page size value and see if it's less than 101. If so,
@@ -582,12 +724,21 @@ class TGDisplay:
         self._W_statebg_pt = (ws_l, ws_t)
         self._W_state_pt = (ws_l + 2, ws_t + 2)
         #
+        # Pre-render the blank forms
+        self._form_blank = Surface(self._window_size).convert()  # Black
+        self._form_blank.fill(self._page_color, self._page_rect)
+        self._form_masthead = self._form_blank.copy()
+        if self._masthead is not None:
+            lf = max((self._window_size[0] - self._masthead.width) // 2, 0)
+            self._form_masthead.blit(self._masthead, (lf, self._top_margin))
+        #
         # Calculate scroll_lines such that each scroll is 1/10 second
         if self._page_adv_secs > 0:
             lines_per_sec = self._window_size[1] / self._page_adv_secs
             self._scroll_lines = int((lines_per_sec / 10) + 0.5)
         #
-        pygame.display.flip()
+        self._mark_all_dirty()
+        self.update(force=True)
         return
 
 class ConfigLoadError(Exception):
@@ -618,6 +769,7 @@ class TelegramConfig:
     SIDE_MARGIN_KEY = "side_margin"
     TOP_MARGIN_KEY = "top_margin"
     FORM_SPACING_KEY = "form_spacing"
+    GLYPH_CACHE_SIZE_KEY = "glyph_cache_size"
     WELCOME_MESSAGE_KEY = "welcome_msg"
     WRAP_COLUMNS_KEY = "wrap_columns"
 
@@ -648,6 +800,7 @@ class TelegramConfig:
         self._wrap_columns = 8  # type:int  # Number of spaces before right margin to wrap to next line
         self._welcome_msg = None  # type:str|None  # Printed at the top of the form ^X or idle timeout
         self._list_sender = False  # type:bool  # True to list the sender on change+receive
+        self._glyph_cache_size = 512  # type:int  # Number of rendered characters to keep
         # Read the Config values from JSON file if a path was provided
         if self._cfg_filep is not None:
             self.load()
@@ -701,6 +854,14 @@ class TelegramConfig:
         self._form_spacing = spacing
         return
 
+    @property
+    def glyph_cache_size(self):  # type: () -> int
+        return self._glyph_cache_size
+    @glyph_cache_size.setter
+    def glyph_cache_size(self, size):  # type: (int) -> None
+        self._glyph_cache_size = size
+        return
+
     @property
     def fullscreen(self):  # type: () -> bool
         return self._fullscreen
@@ -914,6 +1075,8 @@ class TelegramConfig:
                                 self._top_margin = int(value)
                             case self.FORM_SPACING_KEY:
                                 self._form_spacing = int(value)
+                            case self.GLYPH_CACHE_SIZE_KEY:
+                                self._glyph_cache_size = int(value)
                             case self.WELCOME_MESSAGE_KEY:
                                 s = value
                                 if s is not None:
@@ -984,6 +1147,36 @@ class Telegram:
         self._local_loop_active = False  # type: bool #True if sending on key or keyboard
         self._our_office_id = cfg.station if not cfg.station is None else ""  # type: str
         self._sender_current = ""  # type: str
+        #
+        # PyGame event types used to run the main loop (allocated in `start`)
+        self._evt_closer = None  # type: int|None  # Key closer opened/closed (from the key thread)
+        self._evt_display = None  # type: int|None  # A display update held back by the FPS limit, or a page scroll step, is due
+        self._evt_flush = None  # type: int|None  # The reader flush time has passed
+        self._evt_msg_start = None  # type: int|None  # Start of message received from the wire
+        self._evt_page_clear = None  # type: int|None  # The page clear idle time has passed
+        self._evt_reader = None  # type: int|None  # Character decoded by the reader
+        self._evt_sender = None  # type: int|None  # A different sender is active
+        self._evt_wake = None  # type: int|None  # Wake the main loop (to check for shutdown)
+        self._events_held = deque()  # type: deque[pygame.event.Event]  # Held until a page scroll is finished
+        return
+
+    def _clear_page_if_idle(self):  # type: () -> None
+        """
+        Display a new form if nothing has been displayed for the page clear idle time.
+        """
+        if time.time() < self._last_display_t + self._tgcfg.page_clear_idle_time - TIMER_SLACK:
+            return  # Something has been displayed since the timer was set
+        ignoring_inet = self._ignore_internet.is_set()
+        self._ignore_internet.set()
+        self._form.new_form(fresh=True)
+        if self._tgcfg.welcome_msg is not None:
+            self._form.print(self._tgcfg.welcome_msg)
+            self._form.new_line(2)
+        self._form.show_closer_state(self._kob.virtual_closer_is_open)
+        self._form.show_wire_state(self._connected, update=True)
+        if not ignoring_inet:
+            self._ignore_internet.clear()
+        self._last_display_t = sys.float_info.max
         return
 
     def _connect_to_wire(self, connect, wire=None):  # type: (bool, int|None) -> None
@@ -1019,6 +1212,7 @@ class Telegram:
         """
         self._form.print(char, self._tgcfg.text_font_bold, self._tgcfg.text_font_italic, update, spacing)
         self._last_display_t = time.time()
+        self._set_timer(self._evt_page_clear, self._tgcfg.page_clear_idle_time)
         return
 
     def _emit_local_code(self, code, code_source, char=None):  # type: (tuple[int,...], kob.CodeSource, str|None) -> None
@@ -1041,10 +1235,18 @@ class Telegram:
             self._last_decode_t = sys.float_info.max
             rdr.decode(code)
             self._last_decode_t = time.time()
+            self._set_timer(self._evt_flush, self._flush_t)
         if self._connected and self._cfg.remote:
             self._internet.write(code)
         return
 
+    # flush last characters from decode buffer, if nothing has been decoded for the flush time
+    def _flush_reader_if_idle(self):
+        if time.time() - self._flush_t < self._last_decode_t - TIMER_SLACK:
+            return  # Something has been decoded since the timer was set
+        self._flush_reader()
+        return
+
     # flush last characters from decode buffer
     def _flush_reader(self):
         self._last_decode_t = sys.float_info.max
@@ -1063,10 +1265,10 @@ class Telegram:
         """
         if len(code) > 0:
             if code[-1] == 1: # special code for closer/circuit closed
-                self._set_virtual_closer_closed(True)
+                self._post_event(self._evt_closer, close=True)
                 return
             elif code[-1] == 2: # special code for closer/circuit open
-                self._set_virtual_closer_closed(False)
+                self._post_event(self._evt_closer, close=False)
                 return
         # if not self._internet_station_active and self._local_loop_active:
         if self._local_loop_active:
@@ -1081,9 +1283,7 @@ class Telegram:
             if not self._sender_current == self._our_office_id:
                 self._kob.soundCode(code, kob.CodeSource.wire)
                 if code == STARTMSG:
-                    self._form.new_form()
-                    self._form.show_closer_state(self._kob.virtual_closer_is_open)
-                    self._form.show_wire_state(self._connected, update=True)
+                    self._post_event(self._evt_msg_start)
                 elif code == ENDMSG:
                     # Don't do anything at end. Timeout or new message (STARTMSG)
                     # will display a new form.
@@ -1126,6 +1326,16 @@ class Telegram:
         return
 
     def _from_reader(self, char, spacing):
+        """
+        Handle a character decoded by the reader.
+
+        Called from the reader (or the thread decoding code), so the character
+        is passed to the main loop to be displayed.
+        """
+        self._post_event(self._evt_reader, char=char, spacing=spacing)
+        return
+
+    def _display_decoded(self, char, spacing):  # type: (str, float) -> None
         if not char == '=':
             if self._last_received_para:
                 self._form.new_line()
@@ -1164,9 +1374,99 @@ class Telegram:
             print()
             print(f"<<{self._sender_current}>>", flush=True)
             if self._tgcfg.list_sender:
-                self._form.new_form()
-                self._form.print(sender)
-                self._form.new_line()
+                self._post_event(self._evt_sender, sender=sender)
+        return
+
+    def _handle_event(self, event):  # type: (pygame.event.Event) -> None
+        """
+        Handle an event in the main loop.
+        """
+        if event.type == pygame.QUIT:  # stop if window closed
+            self._shutdown.set()
+        elif event.type == pygame.KEYDOWN:
+            self._handle_keydown(event)
+        elif event.type == self._evt_reader:
+            self._display_decoded(event.char, event.spacing)
+        elif event.type == self._evt_flush:
+            self._flush_reader_if_idle()
+        elif event.type == self._evt_page_clear:
+            self._clear_page_if_idle()
+        elif event.type == self._evt_msg_start:
+            self._form.new_form()
+            self._form.show_closer_state(self._kob.virtual_closer_is_open)
+            self._form.show_wire_state(self._connected, update=True)
+        elif event.type == self._evt_sender:
+            self._form.new_form()
+            self._form.print(event.sender)
+            self._form.new_line()
+        elif event.type == self._evt_closer:
+            self._set_virtual_closer_closed(event.close)
+        # self._evt_display and self._evt_wake only need to wake the loop
+        return
+
+    def _hold_event(self, event):  # type: (pygame.event.Event) -> bool
+        """
+        True if the event has to wait for a page scroll to finish (it would
+        display something, or depends on something that does).
+        """
+        if event.type in (pygame.QUIT, self._evt_display, self._evt_wake):
+            return False
+        if event.type == pygame.KEYDOWN and event.unicode in ('\x11', '\x03'):
+            return False  # Quit right away
+        return True
+
+    def _handle_keydown(self, event):  # type: (pygame.event.Event) -> None
+        c = event.unicode
+        k = event.key
+        if c == '\x11':  # quit on ^Q
+            self._shutdown.set()
+        elif c == '\x03':  # quit on ^C
+            self._shutdown.set()
+            self._control_c_pressed.set()
+        elif c == '\x01':  # advance the form on ^A
+            ignoring_inet = self._ignore_internet.is_set()
+            self._ignore_internet.set()
+            self._form.new_form()
+            self._last_display_t = sys.float_info.max
+            if not ignoring_inet:
+                self._ignore_internet.clear()
+        elif c == '\x18':  # display a new form on ^X
+            ignoring_inet = self._ignore_internet.is_set()
+            self._ignore_internet.set()
+            self._form.new_form(fresh=True)
+            if self._tgcfg.welcome_msg is not None:
+                self._form.print(self._tgcfg.welcome_msg)
+                self._form.new_line(2)
+            self._last_display_t = sys.float_info.max
+            if not ignoring_inet:
+                self._ignore_internet.clear()
+        else:
+            if c == '\x1B':  # Escape toggles the virtual closer
+                open_vcloser = not self._kob.virtual_closer_is_open
+                if open_vcloser:
+                    c = '~'
+                else:
+                    c = '+'
+            if k == pygame.K_F8:
+                # Toggle the connected state
+                self.toggle_connection()
+                return
+            if k == pygame.K_F11:
+                # Clear the page, but don't print a masthead
+                ignoring_inet = self._ignore_internet.is_set()
+                self._ignore_internet.set()
+                self._form.new_form(fresh=True, disp_masthead=False)
+                self._form.new_line(1)
+                self._last_display_t = sys.float_info.max
+                if not ignoring_inet:
+                    self._ignore_internet.clear()
+                return
+            if c < '\x20':  # Ignore other control chars
+                return
+            vcloser_is_open = self._kob.virtual_closer_is_open
+            if (c == '~' and vcloser_is_open) or (c == '+' and not vcloser_is_open):
+                return  # Don't repeat open when open or close when closed
+            self._from_keyboard(c)
         return
 
     def _new_Reader(self):  # type: () -> None
@@ -1201,6 +1501,29 @@ class Telegram:
                 "To enable/disable this setting use `Configure --iki`.")
         return
 
+    def _post_event(self, event_type, **attrs):  # type: (int|None, ...) -> None
+        """
+        Post an event to the main loop. This can be called from any thread.
+        """
+        if event_type is None or self._closed.is_set():
+            return  # Not started, or PyGame might already be shut down
+        try:
+            pygame.event.post(pygame.event.Event(event_type, attrs))
+        except pygame.error as ex:
+            log.debug("Telegram._post_event: {}".format(ex), 2)
+        return
+
+    def _set_timer(self, event_type, secs):  # type: (int|None, float|None) -> None
+        """
+        (Re)start a one-shot timer that posts `event_type` to the main loop
+        after `secs` seconds, or cancel it if `secs` is None.
+        """
+        if event_type is None or self._closed.is_set():
+            return
+        ms = 0 if secs is None else int(secs * 1000) + 1
+        pygame.time.set_timer(event_type, ms, loops=1)
+        return
+
     def _set_local_loop_active(self, active):
         """
         Set local_loop_active state
@@ -1306,88 +1629,44 @@ class Telegram:
         return
 
     def main_loop(self):
+        """
+        Handle events until Telegram is shut down.
+
+        Keyboard and window events come from PyGame. The reader, wire, key, and
+        timers post their own events, so the loop is idle until something
+        happens.
+        """
         self._print_start_info()
         if not self._wire == 0:
             self._connect_to_wire(True, self._wire)
         self._shutdown.wait(0.5)
+        self._post_event(self._evt_page_clear)  # Show the welcome form
         try:
             while not self._shutdown.is_set():
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:  # stop if window closed
-                        self._shutdown.set()
+                # Wait (with a limit, so a ^C in the console is seen) then take
+                # anything else queued so it shares the display update.
+                events = [pygame.event.wait(EVENT_WAIT_MAX)]
+                events.extend(pygame.event.get())
+                for event in events:
+                    if (self._events_held or self._form.scrolling) and self._hold_event(event):
+                        self._events_held.append(event)  # Keep them in order
+                        continue
+                    self._handle_event(event)
+                    if self._shutdown.is_set():
                         break
-                    elif event.type == pygame.KEYDOWN:
-                        c = event.unicode
-                        k = event.key
-                        if c == '\x11':  # quit on ^Q
-                            self._shutdown.set()
-                            break
-                        elif c == '\x03':  # quit on ^C
-                            self._shutdown.set()
-                            self._control_c_pressed.set()
-                            break
-                        elif c == '\x01':  # advance the form on ^A
-                            ignoring_inet = self._ignore_internet.is_set()
-                            self._ignore_internet.set()
-                            self._form.new_form()
-                            self._last_display_t = sys.float_info.max
-                            if not ignoring_inet:
-                                self._ignore_internet.clear()
-                        elif c == '\x18':  # display a new form on ^X
-                            ignoring_inet = self._ignore_internet.is_set()
-                            self._ignore_internet.set()
-                            self._form.new_form(fresh=True)
-                            if self._tgcfg.welcome_msg is not None:
-                                self._form.print(self._tgcfg.welcome_msg)
-                                self._form.new_line(2)
-                            self._last_display_t = sys.float_info.max
-                            if not ignoring_inet:
-                                self._ignore_internet.clear()
-                        else:
-                            if c == '\x1B':  # Escape toggles the virtual closer
-                                open_vcloser = not self._kob.virtual_closer_is_open
-                                if open_vcloser:
-                                    c = '~'
-                                else:
-                                    c = '+'
-                            if k == pygame.K_F8:
-                                # Toggle the connected state
-                                self.toggle_connection()
-                                continue
-                            if k == pygame.K_F11:
-                                # Clear the page, but don't print a masthead
-                                ignoring_inet = self._ignore_internet.is_set()
-                                self._ignore_internet.set()
-                                self._form.new_form(fresh=True, disp_masthead=False)
-                                self._form.new_line(1)
-                                self._last_display_t = sys.float_info.max
-                                if not ignoring_inet:
-                                    self._ignore_internet.clear()
-                                continue
-                            if c < '\x20':  # Ignore other control chars
-                                continue
-                            vcloser_is_open = self._kob.virtual_closer_is_open
-                            if (c == '~' and vcloser_is_open) or (c == '+' and not vcloser_is_open):
-                                continue  # Don't repeat open when open or close when closed
-                            self._from_keyboard(c)
-                if time.time() - self._flush_t > self._last_decode_t:
-                    self._flush_reader()
-                if time.time() > self._last_display_t + self._tgcfg.page_clear_idle_time:
-                    ignoring_inet = self._ignore_internet.is_set()
-                    self._ignore_internet.set()
-                    self._form.new_form(fresh=True)
-                    if self._tgcfg.welcome_msg is not None:
-                        self._form.print(self._tgcfg.welcome_msg)
-                        self._form.new_line(2)
-                    self._form.show_closer_state(self._kob.virtual_closer_is_open)
-                    self._form.show_wire_state(self._connected, update=True)
-                    if not ignoring_inet:
-                        self._ignore_internet.clear()
-                    self._last_display_t = sys.float_info.max
-                self._shutdown.wait(0.010)  # wait a bit before getting the next event
+                # Run the page scroll steps that are due. Once the scroll is
+                # done, handle the events held back while it ran.
+                delay = self._form.scroll()
+                while delay is None and self._events_held and not self._shutdown.is_set():
+                    self._handle_event(self._events_held.popleft())
+                    delay = self._form.scroll()
+                self._form.update()
+                update_delay = self._form.update_delay
+                if update_delay is not None and (delay is None or update_delay < delay):
+                    delay = update_delay
+                self._set_timer(self._evt_display, delay)
                 if self._control_c_pressed.is_set():
                     raise KeyboardInterrupt
-                self._shutdown.wait(0.02)
             pass
         except KeyboardInterrupt:
             raise KeyboardInterrupt
@@ -1401,6 +1680,7 @@ class Telegram:
         self._shutdown_started.set()
         log.debug("Telegram.shutdown - 1", 3)
         self._shutdown.set()
+        self._post_event(self._evt_wake)  # Wake the main loop
         log.debug("Telegram.shutdown - 2", 3)
         kob_ = self._kob
         if kob_:
@@ -1433,6 +1713,14 @@ class Telegram:
         """
         Start everything up.
         """
+        self._evt_closer = pygame.event.custom_type()
+        self._evt_display = pygame.event.custom_type()
+        self._evt_flush = pygame.event.custom_type()
+        self._evt_msg_start = pygame.event.custom_type()
+        self._evt_page_clear = pygame.event.custom_type()
+        self._evt_reader = pygame.event.custom_type()
+        self._evt_sender = pygame.event.custom_type()
+        self._evt_wake = pygame.event.custom_type()
         self._kob = KOB(
             interfaceType=self._cfg.interface_type,
             useSerial=self._cfg.use_serial,
@@ -1490,19 +1778,11 @@ if __name__ == "__main__":
     exit_status = 0
 
     try:
-        # Init Tk so we can use messagebox if needed.
-        root = tk.Tk(className="Telegram")
-        root.withdraw()
         script_dir = path[0]
         script_dir = script_dir + "/" if ((not script_dir is None) and (not script_dir == "")) else ""
         log.debug(" Running from: {}".format(script_dir), 2, dt="")
         icon_file = script_dir + "resources/Telegram-Logo.png"
-        icon_file_exists = False
-        if (path_func.isfile(icon_file)):
-            icon = tk.PhotoImage(file=icon_file)
-            root.iconphoto(True, icon)
-            icon_file_exists = True
-        else:
+        if not path_func.isfile(icon_file):
             icon_file = None
         # Process command option arguments
         tgcfg_override = argparse.ArgumentParser(add_help=False)
@@ -1526,6 +1806,7 @@ if __name__ == "__main__":
                 config2.text_speed_override,
                 config2.config_file_override,
                 config2.logging_level_override,
+                pkappargs.metrics_override,
             ],
             exit_on_error=False
         )
@@ -1540,11 +1821,16 @@ if __name__ == "__main__":
         #print(" Pygame: " + pygame.system.)
         print(" pykob: " + PKVERSION)
         # pygame setup
+        #  PyGame is imported here (rather than at the top) so that it isn't loaded
+        #  unless the arguments are good and the display is going to be used.
+        import pygame
+        from pygame import Rect, Surface
         pygame.init()  # This is required, plus it prints the PyGame-CE version
 
 
         cfg = config2.process_config_args(args)
         log.set_logging_level(cfg.logging_level)
+        pkappargs.metrics_from_args(args)
         # Use the wire from the command line if one was specified, else use the one configured.
         wire = args.wire if args.wire else cfg.wire
         tgcfg_path = args.tgcfg_filepath if args.tgcfg_filepath else TELEGRAM_CFG_FILE_NAME
@@ -1556,7 +1842,15 @@ if __name__ == "__main__":
         else:
             log.warn("Telegram configuration file '{}' not found. Using default values.".format(TELEGRAM_CFG_FILE_NAME), dt="")
             msg = "Unable to find Telegram configuration file: \n'{}'.\nUsing default values.\n\nAre you running from a different location or forget to use the\n`--tgconfig` option?".format(TELEGRAM_CFG_FILE_NAME)
+            # Tk is only needed for this message box, so only load it now.
+            import tkinter as tk
+            from tkinter import messagebox
+            root = tk.Tk(className="Telegram")
+            root.withdraw()
+            if icon_file:
+                root.iconphoto(True, tk.PhotoImage(file=icon_file))
             messagebox.showwarning(TELEGRAM_VERSION_TEXT, msg)
+            root.destroy()
             tg_config = TelegramConfig(None)
         telegram = Telegram(TELEGRAM_VERSION_TEXT, wire, cfg, tg_config, icon_file)
         telegram.start()
@@ -1573,4 +1867,5 @@ if __name__ == "__main__":
             telegram.shutdown()
             telegram.exit()
             telegram = None
+        metrics.stop_exporter()
     sys.exit(exit_status)
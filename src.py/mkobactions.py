@@ -149,6 +149,10 @@ class MKOBActions():
         self._km.show_key_graph()
         return
 
+    def doLatencyReport(self):
+        self._km.show_latency_report()
+        return
+
     # Help menu
 
     def doHelpAbout(self):
@@ -335,7 +339,7 @@ class MKOBActions():
 
         event_data contains a string version of the wire number
         """
-        self._krdr.handle_append_text("\n\n<<{}>>\n".format(event_data))
+        self._krdr.append_text("\n\n<<{}>>\n".format(event_data))
         return
 
     def handle_reader_clear(self, event=None):
@@ -357,14 +361,14 @@ class MKOBActions():
         self._krdr.handle_clear()
         return "break"
 
-    def handle_reader_append_text(self, event_data):
+    def handle_reader_flush(self, event=None):
         """
-        Handle a <<Reader_Append_Text>> message by:
-        1. Telling the reader window to append the text in the event_data
+        Handle a <<Reader_Flush>> message by:
+        1. Telling the reader window to schedule writing its pending text
 
-        event_data is the text to append
+        event has no meaningful information
         """
-        self._krdr.handle_append_text(event_data)
+        self._krdr.handle_flush_request()
         return
 
     def handle_sender_clear_fk(self, event=None):
@@ -497,9 +501,10 @@ class MKOBActions():
 
     def trigger_reader_append_text(self, text: str):
         """
-        Generate an event to add text to the reader window.
+        Add text to the reader window. The text is buffered and written to the
+        window (with any other pending text) on the GUI thread.
         """
-        self._kw.event_generate(mkobevents.EVENT_READER_APPEND_TEXT, when='tail', data=text)
+        self._krdr.append_text(text)
         return
 
     def trigger_reader_clear(self):
@@ -41,8 +41,8 @@ EVENT_EMIT_KEY_CODE = "<<Emit_Key_Code>>" # Emit a code sequence originating fro
 EVENT_EMIT_KB_CODE = "<<Emit_KB_Code>>" # Emit a code sequence originating from the keyboard
 EVENT_KB_PROCESS_SEND = "<<KB_Process_Send>>" # Process text from the keyboard window
 EVENT_PLAYER_WIRE_CHANGE = "<<Player_Wire_Change>>" # The player detected a wire change
-EVENT_READER_APPEND_TEXT = "<<Reader_Append_Text>>" # Append text to the reader window
 EVENT_READER_CLEAR = "<<Clear_Reader>>" # Clear the reader window
+EVENT_READER_FLUSH = "<<Reader_Flush>>" # Write the pending text to the reader window
 EVENT_STATION_ACTIVE = "<<Station_Active>>" # A station has indicated that it is still listening
 EVENT_STATIONS_CLEAR = "<<Clear_Stations>>" # Clear the station window and station list
 EVENT_STATUS_MSG_CLEAR = "<<Clear_Status_Msg>>" # Clear the status message in the main window
@@ -28,16 +28,23 @@ mkobkeytimewin.py
 Child windows that contains a running timing graph of the key. This can
 optionally show the local key and/or the remote (wire) key.
 
-The graph looks like this:
+The graph looks like this (the bars are drawn, rather than characters):
  >15 (80) -  612       ^ |------------------------------------------------------------!
  >15 (80)    256   20% - |################################
  >15 (80) -   75 -  6%   |---------
  >15 (80)     83    4% . |##########
 
+The graph is drawn on a Canvas. The elements are kept in a fixed size ring
+buffer (the oldest are dropped), and code can be added from any thread. The
+graph is redrawn by an 'after' tick (every REDRAW_INTERVAL) that draws the
+elements added since the last one, so a busy wire costs one redraw per tick
+rather than several widget inserts per element.
 """
 
+from collections import deque
+from threading import Lock
 import tkinter as tk
-import tkinter.scrolledtext as tkst
+from tkinter import font
 from tkinter import ttk
 from tkinter import N, S, W, E
 
@@ -56,8 +63,26 @@ TAG_MARK = "mark"
 TAG_WARN_N = "warn_n"
 TAG_WARN_P = "warn_p"
 
-GRAPH_UPPER_BOUND = 800.0
-GRAPH_LINES_TO_DEL = "100.end"
+TAG_COLORS = {
+    TAG_NORMAL: "black",
+    TAG_ERROR: "#EE0000",  # Medium red
+    TAG_MARK: "#1C86EE",  # Dodger blue
+    TAG_WARN_P: "#CD6600",  # Dark orange 3
+    TAG_WARN_N: "#EE7600",  # Dark orange 2
+}
+
+GRAPH_MAX_ROWS = 800  # Rows kept in the graph (ring buffer)
+REDRAW_INTERVAL = 100  # Time (ms) between redraws of the graph
+BAR_UNITS_PER_DOT = 12  # Length of the bar for a dot
+BAR_UNITS_MAX = 120  # Bars longer than this are cut off (and flagged as an error)
+BAR_UNIT_PX = 3  # Pixels per bar unit
+MARGIN_PX = 4
+
+# Row types. A row is a tuple starting with the type:
+#  (ROW_TEXT, text, tag)
+#  (ROW_ELEMENT, label, bar_units, overflow, is_space, tag)
+ROW_TEXT = 0
+ROW_ELEMENT = 1
 
 class MKOBKeyTimeWin(tk.Toplevel):
     # Class attribute that indicates whether this child window
@@ -81,13 +106,15 @@ class MKOBKeyTimeWin(tk.Toplevel):
         self._fb.columnconfigure(0, weight=1)
         self._fb.rowconfigure(0, weight=1)
         # graph
-        self._txtGraph = tkst.ScrolledText(self._fb, wrap='none', font='TkFixedFont')
-        self._txtGraph.grid(row=0, column=0, padx=2, pady=2, sticky=tk.E+tk.W+tk.N+tk.S)
-        self._txtGraph.tag_config(TAG_NORMAL)
-        self._txtGraph.tag_config(TAG_ERROR, foreground="#EE0000") # Medium red
-        self._txtGraph.tag_config(TAG_MARK, foreground="#1C86EE")  # Dodger blue
-        self._txtGraph.tag_config(TAG_WARN_P, foreground="#CD6600")  # Dark orange 3
-        self._txtGraph.tag_config(TAG_WARN_N, foreground="#EE7600")  # Dark orange 2
+        self._font = font.nametofont("TkFixedFont")
+        self._row_height = self._font.metrics("linespace")
+        self._bar_x = MARGIN_PX + self._font.measure(self._gen_line_text("\u25BA ", 9999, 9999, -9.999, "\u25AC") + " ")
+        self._graph_width = self._bar_x + ((BAR_UNITS_MAX + 2) * BAR_UNIT_PX) + MARGIN_PX
+        self._cnvGraph = tk.Canvas(self._fb, background="white", highlightthickness=0)
+        self._cnvGraph.grid(row=0, column=0, padx=2, pady=2, sticky=tk.E+tk.W+tk.N+tk.S)
+        self._sbGraph = ttk.Scrollbar(self._fb, orient=tk.VERTICAL, command=self._cnvGraph.yview)
+        self._sbGraph.grid(row=0, column=1, sticky=(N,S))
+        self._cnvGraph.config(yscrollcommand=self._sbGraph.set)
         # options
         self._varLocalOn = tk.BooleanVar()
         self._varLocalOn.set(local_enable)
@@ -105,10 +132,22 @@ class MKOBKeyTimeWin(tk.Toplevel):
         self._entMarkTxt.bind("<Return>", self.do_mark_text_enter)
         self._entMarkTxt.grid(row=0, column=4, columnspan=3, padx=2, pady=2, sticky=(W,E))
         #
+        # The rows (ring buffer) and the count of all rows added. Row number 'n'
+        # (counting from the first added) is drawn at y = n * row_height.
+        self._rows_guard = Lock()
+        self._rows = deque(maxlen=GRAPH_MAX_ROWS)  # type: deque[tuple]
+        self._rows_added = 0  # type: int
+        # The rows drawn on the canvas, and the canvas item IDs for each one
+        self._rows_drawn = 0  # type: int
+        self._row_items = deque()  # type: deque[tuple[int,...]]
+        self._first_row_drawn = 0  # type: int
+        self._after_redraw = self.after(REDRAW_INTERVAL, self._redraw)
+        #
         self.__class__.active = True  # Indicate that the window is 'active'
         #
         self._morse_reader = Reader(self._wpm, self._codetype)
         self._morse_sender = Sender(self._wpm, self._codetype)
+        self._set_thresholds()
 
     @property
     def local_enabled(self):
@@ -135,10 +174,14 @@ class MKOBKeyTimeWin(tk.Toplevel):
         self._wpm = wpm
         self._morse_reader.setWPM(wpm)
         self._morse_sender.setWPM(wpm)
+        self._set_thresholds()
 
     def destroy(self):
         # Restore the attribute on close.
-        self._txtGraph = None
+        if self._after_redraw:
+            self.after_cancel(self._after_redraw)
+            self._after_redraw = None
+        self._cnvGraph = None
         self.__class__.active = False
         return super().destroy()
 
@@ -146,9 +189,14 @@ class MKOBKeyTimeWin(tk.Toplevel):
         """
         Clear the contents of the graph.
         """
-        if self._txtGraph:
-            self._txtGraph.delete("1.0", "end")
-            self._txtGraph.see("end")
+        with self._rows_guard:
+            self._rows.clear()
+            self._rows_drawn = self._rows_added
+        self._first_row_drawn = self._rows_drawn
+        self._row_items.clear()
+        if self._cnvGraph:
+            self._cnvGraph.delete("all")
+            self._cnvGraph.config(scrollregion=(0, 0, self._graph_width, 0))
 
     def do_mark_text_enter(self, event):
         """
@@ -156,27 +204,103 @@ class MKOBKeyTimeWin(tk.Toplevel):
         text entered into the graph.
         """
         txt = self._varMarkTxt.get()
-        self.append(txt+'\n', tag="mark")
+        self.append(txt, tag=TAG_MARK)
 
-    def append(self, text, tag="normal"):
+    def append(self, text, tag=TAG_NORMAL):
         """
         Append a line of text to the graph.
         """
-        self._check_graph_full()
-        if self._txtGraph:
-            self._txtGraph.insert("end", text, tag)
-            self._txtGraph.see("end")
-
-    def _check_graph_full(self):
-        if self._txtGraph:
-            index = float(self._txtGraph.index("end"))
-            if index >= GRAPH_UPPER_BOUND:
-                self._txtGraph.delete("0.0", GRAPH_LINES_TO_DEL)
-
-    def _gen_line_graph(self, fc, fl, tc='', lc='|'):
-        # Generate a string of fill characters (fc) that is fill length (fl) long.
-        bar = fc * fl
-        return "{0}{1}{2}".format(lc, bar, tc)
+        self._add_rows([(ROW_TEXT, text, tag)])
+
+    def _add_rows(self, rows):
+        """
+        Add rows to the graph. They are drawn on the next redraw.
+        This can be called from any thread.
+        """
+        with self._rows_guard:
+            self._rows.extend(rows)
+            self._rows_added += len(rows)
+
+    def _draw_row(self, n, row):
+        """
+        Draw row number 'n' on the canvas. Returns the canvas item IDs.
+        """
+        cnv = self._cnvGraph
+        y = n * self._row_height
+        if row[0] == ROW_TEXT:
+            _, text, tag = row
+            return (cnv.create_text(MARGIN_PX, y, text=text, anchor=tk.NW, font=self._font, fill=TAG_COLORS[tag]),)
+        _, label, bar_units, overflow, is_space, tag = row
+        color = TAG_COLORS[tag]
+        ids = [cnv.create_text(MARGIN_PX, y, text=label, anchor=tk.NW, font=self._font, fill=TAG_COLORS[TAG_NORMAL])]
+        x1 = self._bar_x + bar_units * BAR_UNIT_PX
+        if is_space:
+            # Key up: a thin bar
+            ym = y + self._row_height // 2
+            ids.append(cnv.create_rectangle(self._bar_x, ym - 1, x1, ym + 1, fill=color, outline=color))
+        else:
+            # Key down: a full bar
+            ids.append(cnv.create_rectangle(self._bar_x, y + 2, x1, y + self._row_height - 2, fill=color, outline=color))
+        if overflow:
+            ids.append(cnv.create_text(x1 + 1, y, text='!', anchor=tk.NW, font=self._font, fill=color))
+        return tuple(ids)
+
+    def _redraw(self):
+        """
+        Draw the rows added since the last redraw (and remove those that have
+        dropped out of the ring buffer). Called by an 'after' tick.
+        """
+        self._after_redraw = None
+        cnv = self._cnvGraph
+        if not cnv:
+            return
+        with self._rows_guard:
+            added = self._rows_added
+            new = added - self._rows_drawn
+            if new > 0:
+                rows = list(self._rows)[-new:] if new < len(self._rows) else list(self._rows)
+            else:
+                rows = []
+            self._rows_drawn = added
+        if rows:
+            # Remove the rows that are no longer in the ring buffer
+            first = max(added - GRAPH_MAX_ROWS, self._first_row_drawn)
+            while self._first_row_drawn < first and self._row_items:
+                cnv.delete(*self._row_items.popleft())
+                self._first_row_drawn += 1
+            if not self._row_items:
+                self._first_row_drawn = added - len(rows)
+            n = added - len(rows)
+            for row in rows:
+                self._row_items.append(self._draw_row(n, row))
+                n += 1
+            cnv.config(scrollregion=(0, self._first_row_drawn * self._row_height,
+                self._graph_width, added * self._row_height))
+            cnv.yview_moveto(1.0)
+        self._after_redraw = self.after(REDRAW_INTERVAL, self._redraw)
+
+    def _set_thresholds(self):
+        """
+        Get the expected element lengths and the reader's thresholds for the
+        current WPM, so they aren't looked up for each element.
+        """
+        sndr = self._morse_sender
+        rdr = self._morse_reader
+        self._dot_len = int(sndr.dot_len)
+        self._dash_len = int(sndr.dash_len)
+        self._ldash_len = int(sndr.long_dash_len)
+        self._xldash_len = int(sndr.xl_dash_len)
+        self._icspace_len = int(sndr.intra_char_space_len)
+        self._mspace_len = int(sndr.dot_len)
+        self._cspace_len = int(sndr.char_space_len)
+        self._wspace_len = int(sndr.word_space_len)
+        self._bar_div = float(BAR_UNITS_PER_DOT) / self._dot_len
+        self._intra_char_space_min = rdr.intra_char_space_min
+        self._intra_char_space_max = rdr.intra_char_space_max
+        self._char_space_max = rdr.char_space_max
+        self._dot_len_max = rdr.dot_len_max
+        self._dash_len_max = rdr.dash_len_max
+        self._dashlong_len_max = rdr.dashlong_len_max
 
     def _gen_line_text(self, indicator, val, expected, err, like):
         sign = '\u2191' if val < 0 else '\u2193'
@@ -191,14 +315,14 @@ class MKOBKeyTimeWin(tk.Toplevel):
         Call when the key is closed to cause a marker to be put in the graph.
         """
         if self._varLocalOn.get():
-            self.append("\u25BA{}\n".format('\u21A7' * 100)) # 100 Down Arrows
+            self.append("\u25BA{}".format('\u21A7' * 100)) # 100 Down Arrows
 
     def key_opened(self):
         """
         Call when the key is opened to cause a marker to be put in the graph.
         """
         if self._varLocalOn.get():
-            self.append("\u25BA{}\n".format('\u21A5' * 100)) # 100 Up Arrows
+            self.append("\u25BA{}".format('\u21A5' * 100)) # 100 Up Arrows
 
     def key_code(self, code):
         """
@@ -215,55 +339,46 @@ class MKOBKeyTimeWin(tk.Toplevel):
             self.output_code_lines(code, '\u25C4 ') # '<'
 
     def output_code_lines(self, code, indicator):
-        wpm = self._wpm
-        dot_len = int(self._morse_sender.dot_len)
-        dash_len = int(self._morse_sender.dash_len)
-        ldash_len = int(self._morse_sender.long_dash_len)
-        xldash_len = int(self._morse_sender.xl_dash_len)
-        icspace_len = int(self._morse_sender.intra_char_space_len)
-        mspace_len = int(self._morse_sender.dot_len)
-        cspace_len = int(self._morse_sender.char_space_len)
-        wspace_len = int(self._morse_sender.word_space_len)
-        bar_div = 12.0 / dot_len
+        rows = []
         for i in code:
             i_abs = abs(i)
-            bar_value = int(i_abs * bar_div)
-            bar_end = ''
+            bar_value = int(i_abs * self._bar_div)
+            overflow = False
             # Figure out what would be expected given this duration
             like = "?"
             expected_len = 0
             if i < 0:
                 # Some type of space (key up)
-                if i_abs < self._morse_reader.intra_char_space_min:
+                if i_abs < self._intra_char_space_min:
                     like = '\u25CB' # open circle
-                    expected_len = mspace_len
-                elif i_abs <= self._morse_reader.intra_char_space_max:
+                    expected_len = self._mspace_len
+                elif i_abs <= self._intra_char_space_max:
                     like = '\u25AD' # open rectangle
-                    expected_len = icspace_len
-                elif i_abs <= self._morse_reader.char_space_max:
+                    expected_len = self._icspace_len
+                elif i_abs <= self._char_space_max:
                     like = '\u2192' # right arrow (->)
-                    expected_len = cspace_len
+                    expected_len = self._cspace_len
                 else:
                     like = ' '
-                    expected_len = wspace_len
+                    expected_len = self._wspace_len
             else:
                 # Some type of dot/dash (key down)
-                if i <= self._morse_reader.dot_len_max:
+                if i <= self._dot_len_max:
                     like = '\u25CF' # Black dot (circle)
-                    expected_len = dot_len
-                elif i <= self._morse_reader.dash_len_max:
+                    expected_len = self._dot_len
+                elif i <= self._dash_len_max:
                     like = '\u25AC' # Black rectangle
-                    expected_len = dash_len
-                elif i > self._morse_reader.dash_len_max and self._codetype == config.CodeType.american:
-                    if i <= self._morse_reader.dashlong_len_max:
+                    expected_len = self._dash_len
+                elif i > self._dash_len_max and self._codetype == config.CodeType.american:
+                    if i <= self._dashlong_len_max:
                         like = 'L'
-                        expected_len = ldash_len
+                        expected_len = self._ldash_len
                     else:
                         like = '0'
-                        expected_len = xldash_len
+                        expected_len = self._xldash_len
                 else:
                     like = '\u25AC' # Black rectangle
-                    expected_len = dash_len
+                    expected_len = self._dash_len
             # Calculate the error from what was expected
             error = (i_abs - expected_len)/expected_len
             err_abs = abs(error)
@@ -275,14 +390,12 @@ class MKOBKeyTimeWin(tk.Toplevel):
                     tag = TAG_WARN_N
                 else:
                     tag = TAG_WARN_P
-            if bar_value > 120:
-                bar_value = 119
-                bar_end = '!'
+            if bar_value > BAR_UNITS_MAX:
+                bar_value = BAR_UNITS_MAX - 1
+                overflow = True
                 tag = TAG_ERROR
-            bar_char = '\u25AC' if i < 0 else '\u2593' # line or dark block
             if i_abs >= 10000:
                 i = 9999 * (-1 if i < 0 else 1)
-            s1 = self._gen_line_text(indicator, i, expected_len, error, like)
-            s2 = self._gen_line_graph(bar_char, bar_value, bar_end)
-            self.append(s1, TAG_NORMAL)
-            self.append(" {}\n".format(s2), tag)
+            label = self._gen_line_text(indicator, i, expected_len, error, like)
+            rows.append((ROW_ELEMENT, label, bar_value, overflow, i < 0, tag))
+        self._add_rows(rows)
@@ -37,7 +37,7 @@ import tkinter.filedialog as filedlg
 import tkinter.messagebox as msgbox
 from typing import Optional
 
-from pykob import config, config2, kob, morse, internet, recorder, log
+from pykob import config, config2, kob, morse, internet, metrics, recorder, log, scheduler, trace
 from pykob.preferencesWindow import PreferencesWindow
 from pykob.recorder import PlaybackState, Recorder
 from pykob.config2 import Config, ConfigLoadError
@@ -82,13 +82,17 @@ class MKOBMain:
 
         # For emitting code
         self._emit_code_queue = Queue()
+        metrics.gauge("pykob_mkob_emit_code_queue_depth", "Code sequences waiting to be emitted.",
+            fn=self._emit_code_queue.qsize)
         self._shutdown: Event = Event()
         self._thread_emit_code = Thread(name="MKMain-EmitCode", target=self._thread_emit_code_body)
 
         # The Class Instances (Objects) we rely on...
         self._internet: Optional[internet.Internet] = None
         self._internet_guard: RLock = RLock()
-        self._after_iac = None  # Internet available check - after ID
+        self._job_iac: Optional[scheduler.Job] = None  # Internet available check - scheduled job
+        self._thread_iac: Optional[Thread] = None  # Internet available check - started by the job
+        self._inet_available: bool = False  # Result of the last check by the thread
         self._inet_was_availabe: bool = False
         self._kob: Optional[kob.KOB] = None
         self._kob_guard: RLock = RLock()
@@ -144,6 +148,7 @@ class MKOBMain:
                 useGpio=cfg.use_gpio,
                 useAudio=cfg.sound,
                 audioType=cfg.audio_type,
+                audioPrewarm=True,
                 useSounder=cfg.sounder,
                 invertKeyInput=cfg.invert_key_input,
                 noKeyCloser=cfg.no_key_closer,
@@ -208,6 +213,7 @@ class MKOBMain:
             #
             code = emit_code_packet[0]
             code_source = emit_code_packet[1]
+            trace.mark(code, trace.Stage.EMIT_DEQUEUED)
             sound_it = emit_code_packet[2]
             closer_open = emit_code_packet[3]
             done_callback = emit_code_packet[4]
@@ -245,35 +251,57 @@ class MKOBMain:
         Use the internet object to check if internet is available.
         Update the status bar message and return the availability.
 
+        This is run periodically by the shared scheduler (every 2 seconds while
+        the internet isn't available, otherwise every 5 seconds), so the
+        (possibly slow) check isn't made on the GUI thread. The scheduled runs
+        use the result of the last check, and start the next check on a thread
+        of its own, so the shared scheduler isn't held up either.
+
         realtime: True will get realtime status from Internet, else use cached value.
         """
-        hi:bool
-        if self._after_iac:
-            self._kw.tkroot.after_cancel(self._after_iac)
-            self._after_iac = None
+        hi:bool = False
         inet = self.Internet
         if realtime:
             if inet:
                 hi = inet.check_internet_available()
+            self._inet_available = hi
             if not hi:
                 self._ka.trigger_status_msg_set("Internet not available")
             else:
                 self._ka.trigger_status_msg_clear()
         else:
-            if inet:
-                hi = inet.internet_available
+            hi = self._inet_available
+            self._check_internet_in_background()
             if not hi and self._inet_was_availabe:
                 self._ka.trigger_status_msg_set("Internet not available")
             if hi and not self._inet_was_availabe:
                 self._ka.trigger_status_msg_clear()
 
-        if not hi:
-            self._after_iac = self._kw.tkroot.after(2000, self._check_internet_available)
-        else:
-            self._after_iac = self._kw.tkroot.after(5000, self._check_internet_available)
+        period = 5.0 if hi else 2.0
+        if self._job_iac:
+            self._job_iac.period = period
+        elif not self._shutdown.is_set():
+            self._job_iac = scheduler.shared().every("MKOB-InetCheck", period, self._check_internet_available)
         self._inet_was_availabe = hi
         return hi
 
+    def _check_internet_in_background(self) -> None:
+        """
+        Start a check of the internet availability, if one isn't running.
+        """
+        t = self._thread_iac
+        if self._shutdown.is_set() or (t and t.is_alive()):
+            return
+        self._thread_iac = Thread(name="MKMain-InetCheck", daemon=True, target=self._thread_iac_body)
+        self._thread_iac.start()
+        return
+
+    def _thread_iac_body(self) -> None:
+        inet = self.Internet
+        if inet and not self._shutdown.is_set():
+            self._inet_available = inet.check_internet_available()
+        return
+
     def _kob_err_msg_hndlr(self, msg:str) -> None:
         log.warn(msg)
         msgbox.showwarning(title=self.app_ver, message=msg)
@@ -350,6 +378,8 @@ class MKOBMain:
         """
         log.debug("mkmain.shutdown - 1", 3)
         self._shutdown.set()
+        if self._job_iac:
+            self._job_iac.cancel()
         log.debug("mkmain.shutdown - 2", 3)
         with self._internet_guard:
             log.debug("mkmain.shutdown - 3", 3)
@@ -534,6 +564,7 @@ class MKOBMain:
         if self._shutdown.is_set():
             return
         emit_code_packet = [code, code_source, sound_it, closer_open, done_callback]
+        trace.mark(code, trace.Stage.EMIT_QUEUED)
         self._emit_code_queue.put(emit_code_packet)
         return
 
@@ -550,6 +581,7 @@ class MKOBMain:
         if self._shutdown.is_set():
             return
         log.debug("MKOBMain.from_key: {}".format(code), 3)
+        trace.mark(code, trace.Stage.FROM_KEY)
         if len(code) > 0:
             if code[-1] == 1:  # special code for 'LATCH' (key/circuit closed)
                 self._ka.trigger_circuit_close()
@@ -915,6 +947,7 @@ class MKOBMain:
                 txt += "\n"
             self._last_char_was_para = False
         txt += char
+        trace.mark_latest(trace.Stage.CHAR, trace.Stage.DECODE)
         self._ka.trigger_reader_append_text(txt)
         return
 
@@ -1195,6 +1228,13 @@ class MKOBMain:
         self._key_graph_win.focus()
         return
 
+    def show_latency_report(self):
+        """
+        Display the latency trace report in the reader window.
+        """
+        self._ka.trigger_reader_append_text("\n{}\n".format(trace.report()))
+        return
+
     def update_sender(self, id):
         """display station ID in reader window when there's a new sender"""
         if self._shutdown.is_set():
@@ -29,9 +29,95 @@ Manage the reader window.
 
 Calls to the 'handle_' methods should be made on the main GUI thread as a result of the GUI handling
 message events.
+
+Text to display is added with `append_text`, which can be called from any thread. The text is
+buffered and written to the window by a single `after` tick, at most every FLUSH_INTERVAL, so a
+fast stream of characters (or packets) becomes one insert rather than one per character.
+
+The window keeps a limited number of lines (its scrollback). When it has grown a chunk (a tenth
+of the scrollback, but at most SCROLLBACK_TRIM_CHUNK lines) past that, the oldest lines are
+removed, so the cost of the window stays constant. The removed text can be written to a
+(rotating) transcript file so nothing is lost.
 """
-from pykob import log
-from threading import Event
+from pykob import log, metrics, trace
+import os
+from threading import Event, Lock
+import time
+from typing import Optional
+
+import mkobevents
+
+FLUSH_INTERVAL = 40  # Time (ms) between writes of buffered text to the window
+BEHIND_SECS = 0.5  # Text waiting longer than this means the window is falling behind
+
+SCROLLBACK_DEFAULT = 5000  # Lines kept in the window if a scrollback isn't specified
+SCROLLBACK_TRIM_CHUNK = 500  # Lines past the scrollback before lines are removed (at most)
+TRANSCRIPT_MAX_BYTES = 10 * 1024 * 1024  # Size at which the transcript file is rotated
+TRANSCRIPT_BACKUPS = 5  # Number of previous transcript files kept
+
+_m_chars = metrics.counter("pykob_mkob_reader_chars_total", "Characters appended to the reader window.")
+_m_flushes = metrics.counter("pykob_mkob_reader_flushes_total", "Writes of buffered text to the reader window.")
+_m_behind = metrics.counter("pykob_mkob_reader_behind_total",
+    "Writes to the reader window that were made after text waited more than BEHIND_SECS.")
+_m_wait = metrics.histogram("pykob_mkob_reader_wait_seconds",
+    "Time text waited in the buffer before it was written to the reader window.")
+_m_trimmed = metrics.counter("pykob_mkob_reader_lines_trimmed_total", "Lines removed from the reader window.")
+
+
+class ReaderTranscript():
+    """
+    A file that text removed from the reader window is appended to. When the
+    file reaches `max_bytes` it is renamed to 'filepath.1' (and any previous
+    ones to 'filepath.2', etc., keeping `backups` of them) and a new file is
+    started.
+    """
+
+    def __init__(self, filepath: str, max_bytes: int=TRANSCRIPT_MAX_BYTES, backups: int=TRANSCRIPT_BACKUPS) -> None:
+        self._filepath = filepath
+        self._max_bytes = max_bytes
+        self._backups = backups
+        self._file = None
+        self._failed = False  # Writing failed, so stop trying
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        for i in range(self._backups - 1, 0, -1):
+            src = "{}.{}".format(self._filepath, i)
+            if os.path.exists(src):
+                os.replace(src, "{}.{}".format(self._filepath, i + 1))
+        if self._backups > 0:
+            os.replace(self._filepath, self._filepath + ".1")
+        else:
+            os.remove(self._filepath)
+        return
+
+    @property
+    def filepath(self) -> str:
+        return self._filepath
+
+    def close(self):
+        f = self._file
+        self._file = None
+        if f:
+            f.close()
+        return
+
+    def write(self, text: str):
+        if self._failed or not text:
+            return
+        try:
+            data = text.encode("utf-8")
+            if self._file and self._file.tell() > 0 and self._file.tell() + len(data) > self._max_bytes:
+                self._rotate()
+            if not self._file:
+                self._file = open(self._filepath, "ab")
+            self._file.write(data)
+            self._file.flush()
+        except OSError as ex:
+            self._failed = True
+            log.err("Unable to write the reader transcript '{}': {}".format(self._filepath, ex))
+        return
 
 class MKOBReader():
     """
@@ -41,24 +127,125 @@ class MKOBReader():
     It is also used to display various other content (messages to the user).
     """
 
-    def __init__(self, mkwindow) -> None:
+    def __init__(self, mkwindow, scrollback: Optional[int]=None, transcript_filepath: Optional[str]=None) -> None:
         self.kw = mkwindow
         self._shutdown: Event = Event()
+        # Lines kept in the window (0 for no limit)
+        self._scrollback: int = max(scrollback, 0) if scrollback is not None else SCROLLBACK_DEFAULT
+        self._trim_chunk: int = min(max(self._scrollback // 10, 1), SCROLLBACK_TRIM_CHUNK)
+        self._transcript: Optional[ReaderTranscript] = \
+            ReaderTranscript(transcript_filepath) if transcript_filepath else None
+        # Text waiting to be written to the window
+        self._pending_guard: Lock = Lock()
+        self._pending: list[str] = []
+        self._pending_chars: int = 0
+        self._t_pending: float = 0.0  # When the oldest pending text was added
+        self._flush_requested: bool = False  # A flush has been requested (or scheduled)
+        self._flush_after = None  # The scheduled 'after' for the flush
+        self._behind: bool = False  # The last flush found the window falling behind
+        metrics.gauge("pykob_mkob_reader_pending_chars", "Characters waiting to be written to the reader window.",
+            fn=lambda: self._pending_chars)
 
-    def exit(self):
-        self.shutdown()
-        return
-
-    def handle_append_text(self, event_data):
+    def _flush(self):
         """
-        Event handler to append text to the window.
+        Write the pending text to the window. Called from the 'after' tick.
         """
-        if self._shutdown.is_set():
+        self._flush_after = None
+        with self._pending_guard:
+            text = "".join(self._pending)
+            t_pending = self._t_pending
+            self._pending.clear()
+            self._pending_chars = 0
+            self._flush_requested = False
+        if self._shutdown.is_set() or not text:
             return
-        text = event_data
-        log.debug("mkrdr.handle_append_text - [{}]".format(text), 5)
+        waited = time.monotonic() - t_pending
+        _m_flushes.inc()
+        _m_wait.observe(waited)
+        behind = waited > BEHIND_SECS
+        if behind:
+            _m_behind.inc()
+            if not self._behind:
+                log.debug("mkrdr - Reader window is falling behind (text waited {:.2f}s)".format(waited), 2)
+        elif self._behind:
+            log.debug("mkrdr - Reader window has caught up", 2)
+        self._behind = behind
+        log.debug("mkrdr._flush - [{}]".format(text), 5)
         self.kw.reader_win.insert('end', text)
+        self._trim()
         self.kw.reader_win.see('end')
+        trace.mark_latest(trace.Stage.DISPLAY, trace.Stage.CHAR)
+        return
+
+    def _trim(self):
+        """
+        Remove the oldest lines from the window if it has a chunk more than
+        the scrollback, writing them to the transcript.
+        """
+        if self._scrollback == 0:
+            return
+        rw = self.kw.reader_win
+        lines = int(rw.index('end-1c').split('.')[0])
+        excess = lines - self._scrollback
+        if excess < self._trim_chunk:
+            return
+        end = "{}.0".format(excess + 1)
+        if self._transcript:
+            self._transcript.write(rw.get('1.0', end))
+        rw.delete('1.0', end)
+        _m_trimmed.inc(excess)
+        log.debug("mkrdr._trim - Removed {} lines".format(excess), 4)
+        return
+
+    @property
+    def pending_chars(self) -> int:
+        """
+        The number of characters waiting to be written to the window.
+        """
+        return self._pending_chars
+
+    def append_text(self, text: str):
+        """
+        Add text to be written to the window. This can be called from any thread.
+
+        The first text added after a flush requests another flush (by event, so
+        it is scheduled on the GUI thread). Text added before that flush is made
+        is combined with it.
+        """
+        if self._shutdown.is_set() or not text:
+            return
+        _m_chars.inc(len(text))
+        with self._pending_guard:
+            self._pending.append(text)
+            self._pending_chars += len(text)
+            request_flush = not self._flush_requested
+            if request_flush:
+                self._flush_requested = True
+                self._t_pending = time.monotonic()
+        if request_flush:
+            self.kw.event_generate(mkobevents.EVENT_READER_FLUSH, when='tail')
+        return
+
+    def exit(self):
+        self.shutdown()
+        fa = self._flush_after
+        self._flush_after = None
+        if fa:
+            try:
+                self.kw.tkroot.after_cancel(fa)
+            except Exception:
+                pass  # The window may already be destroyed
+        ts = self._transcript
+        self._transcript = None
+        if ts:
+            # Save what is in the window and anything waiting to be added to it
+            try:
+                ts.write(self.kw.reader_win.get('1.0', 'end-1c'))
+            except Exception as ex:
+                log.debug("mkrdr.exit - Unable to get the reader window text: {}".format(ex), 2)
+            with self._pending_guard:
+                ts.write("".join(self._pending))
+            ts.close()
         return
 
     def handle_clear(self, event_data=None):
@@ -68,9 +255,23 @@ class MKOBReader():
         if self._shutdown.is_set():
             return
         log.debug("mkrdr.handle_clear", 5)
+        with self._pending_guard:
+            self._pending.clear()
+            self._pending_chars = 0
+        if self._transcript:
+            self._transcript.write(self.kw.reader_win.get('1.0', 'end-1c'))
         self.kw.reader_win.delete('1.0', 'end')
         return
 
+    def handle_flush_request(self, event_data=None):
+        """
+        Event handler to schedule writing the pending text to the window.
+        """
+        if self._shutdown.is_set() or self._flush_after:
+            return
+        self._flush_after = self.kw.tkroot.after(FLUSH_INTERVAL, self._flush)
+        return
+
     def shutdown(self):
         """
         Initiate shutdown of our operations (and don't start anything new),
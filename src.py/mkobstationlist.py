@@ -33,8 +33,9 @@ message events.
 
 from re import L
 from threading import Event
-import time
 import mkobevents as ke
+from pykob import stations
+from pykob.stations import StationPresence
 
 class MKOBStationList:
     """
@@ -47,63 +48,50 @@ class MKOBStationList:
     stations that have not sent (as seen by this station) are indented at,
     the top, then from the station that least recently sent to the station
     that most recently sent.
+
+    The stations are tracked by a `pykob.stations.StationPresence`, and only
+    the rows that it reports as changed are updated in the window.
     """
 
     def __init__(self, kw) -> None:
-        ## Station Info:
-        #  0: Station name
-        #  1: Time initially connected
-        #  2: Time received from
-        #  3: Last PING time
-        self._active_stations = [] # List of lists with [station ID, time initially connected, time received from, ping time]
-        self._last_sender = "" # Keep last sender to know when a sender changes
+        self._presence = StationPresence()
+        self._header = [] # The lines displayed above the other stations (current sender and divider)
         self.kw = kw
         self._shutdown: Event = Event()
         return
 
-
-    def _trim_station_list(self) -> bool:
+    def _header_lines(self) -> list:
+        sender = self._presence.current_sender
+        if not sender:
+            return []
+        lines = ["{}\n".format(sender)]
+        if len(self._presence) > 1:
+            # A line of dashes (-----------------)
+            lines.append("------------------------\n")
+        return lines
+
+    def _update_display(self, changes):
         """
-        Check the timestamp of the stations and remove old ones.
-
-        Return: True is a station was removed from the list
+        Apply the changes to the station list window, then update the current
+        sender (and divider) above the list if they have changed.
         """
         if self._shutdown.is_set():
             return
-        now = time.time()
-        # find and purge inactive stations
-        ## keep stations with ping time (element 3) within the last 2/3rds a minute
-        new_station_list = [row for row in self._active_stations if row[3] > now - 40]
-        station_removed = len(new_station_list) < len(self._active_stations)
-        if station_removed:
-            last_sender_found = False
-            # If the last sender was removed, clear __last_sender
-            for station_info in new_station_list:
-                if station_info[0] == self._last_sender:
-                    last_sender_found = True
-                    break
-                if not last_sender_found:
-                    self._last_sender = ''
-        self._active_stations = new_station_list
-        return station_removed
-
-    def _display_station_list(self):
-        """
-        Display the updated station list
-        ordered by last send time (new sender at the top, then most recent at the bottom).
-        For stations that have only connected and not sent, order them by time connected.
-        """
-        if self._shutdown.is_set():
-            return
-        # Delete the current window contents
-        self.kw.station_list_win.delete('1.0', 'end')
-        for i in range(0, len(self._active_stations)):
-            station_info = self._active_stations[i]
-            indent = "    " if station_info[2] < 0 else ""
-            self.kw.station_list_win.insert('end', "{}{}\n".format(indent, station_info[0]))
-            if i == 0 and len(self._active_stations) > 1 and self._last_sender:
-                # Insert a line of dashes (-----------------)
-                self.kw.station_list_win.insert('end', "------------------------\n")
+        win = self.kw.station_list_win
+        first_line = len(self._header) + 1
+        for change, i, name in changes:
+            line = first_line + i
+            if change == stations.REMOVED:
+                win.delete("{}.0".format(line), "{}.0".format(line + 1))
+            else:
+                info = self._presence.get(name)
+                indent = "    " if info and not info.has_sent else ""
+                win.insert("{}.0".format(line), "{}{}\n".format(indent, name))
+        header = self._header_lines()
+        if not header == self._header:
+            win.delete("1.0", "{}.0".format(first_line))
+            win.insert("1.0", "".join(header))
+            self._header = header
         return
 
     def exit(self):
@@ -116,17 +104,15 @@ class MKOBStationList:
         """
         if self._shutdown.is_set():
             return
-        self._active_stations = []
-        self._last_sender = ""
+        self._presence.clear()
+        self._header = []
         self.kw.station_list_win.delete('1.0', 'end')
         return
 
     def handle_update_current_sender(self, station_name: str):
         """
-        Update the station's last send time.
-        Add the [station_name,connected_time,received_time,ping_time] if it doesn't exist.
-        If it is a different sender from the last, put it at the beginning and put the current
-        sender at the end.
+        Update the station's last send time, adding the station if it doesn't exist.
+        It becomes the current sender, and the previous sender moves to the end.
 
         This is intended to order the list as:
         Current Sender
@@ -134,65 +120,24 @@ class MKOBStationList:
         Next-oldest sender
         Next-next-oldest sender
         etc.
-        Most recent sender -or- new station
+        Most recent sender
         """
         if self._shutdown.is_set():
             return
-        now = time.time()
-        existing_entry_updated = False
-        sender_changed = False
-        for i in range(0, len(self._active_stations)): # better way to do this?
-            station_info = self._active_stations[i]
-            if (station_info[0] == station_name):
-                # update the last received from time for this station
-                station_info[2] = now
-                if not station_name == self._last_sender:
-                    self._active_stations.pop(i)
-                    # find the entry for the last (current) sender
-                    for j in range(0, len(self._active_stations)):
-                        si = self._active_stations[j]
-                        if (si[0] == self._last_sender):
-                            # move this entry to the end
-                            self._active_stations.pop(j)
-                            self._active_stations.append(si)
-                    self._active_stations.insert(0, station_info)
-                    sender_changed = True
-                existing_entry_updated = True
-                break
-        if not existing_entry_updated:
-            # add an entry
-            self._active_stations.append([station_name, now, now, now])
-        if self._trim_station_list() or (not existing_entry_updated) or sender_changed:
-            self._last_sender = station_name
-            self._display_station_list()
+        changes = self._presence.expire()
+        changes += self._presence.sender(station_name)
+        self._update_display(changes)
         return
 
     def handle_update_station_active(self, station_name: str):
         """
-        Update the station's ping time.
-        Add the [station_name,connected_time,received_time,ping_time] if it doesn't exist
-        (connected_time is now).
+        Update the station's ping time, adding the station if it doesn't exist.
         """
         if self._shutdown.is_set():
             return
-        now = time.time()
-        existing_entry_updated = False
-        for i in range(0, len(self._active_stations)): # is there a better way to do this?
-            station_info = self._active_stations[i]
-            if (station_info[0] == station_name):
-                # update the ping time for this station
-                station_info[3] = now
-                existing_entry_updated = True
-                break
-        if not existing_entry_updated:
-            # new station, add an entry
-            station_info = [station_name, now, -1, now]
-            if self._last_sender: # if there is a sender add this just before it
-                self._active_stations.insert(-1,station_info)
-            else:
-                self._active_stations.append(station_info)
-        if  self._trim_station_list() or not existing_entry_updated:
-            self._display_station_list()
+        changes = self._presence.expire()
+        changes += self._presence.active(station_name)
+        self._update_display(changes)
         return
 
     def shutdown(self):
@@ -202,4 +147,3 @@ class MKOBStationList:
         """
         self._shutdown.set()
         return
-
@@ -35,7 +35,7 @@ from mkobkeyboard import MKOBKeyboard
 from mkobmain import MKOBMain
 from mkobreader import MKOBReader
 from mkobstationlist import MKOBStationList
-from pykob import config, config2, log, util
+from pykob import config, config2, log, scheduler, util
 from pykob import VERSION as PKVERSION
 from pykob.config2 import Config
 from pykob.internet import PORT_DEFAULT
@@ -379,6 +379,8 @@ class StatusBar:
         self._tkroot = self._mkwin.tkroot
         self._shutdown: Event = Event()
         self._sndr_pwr_save_last: bool = False
+        self._job_update: Optional[scheduler.Job] = None
+        self._values_last: Optional[tuple[str,str,bool]] = None
 
         self.window = ttk.Frame(
             parent, width=width, height=height, borderwidth=borderwidth, relief=relief
@@ -393,17 +395,21 @@ class StatusBar:
         self._sep2 = ttk.Separator(self.window, orient=VERTICAL)
         return
 
-    def _update_values(self) -> None:
+    def _job_update_body(self) -> None:
+        """
+        Called periodically by the shared scheduler to collect the status values.
+        The window is only updated (on the GUI thread) if they have changed.
+        """
         if self._shutdown.is_set():
             return
+        dspeed = ""
+        server = ""
+        sndr_pwr_save = self._sndr_pwr_save_last
         mkm = self._mkm
         if not mkm is None:
             reader = mkm.Reader
             if not reader is None:
-                dspeed = reader.detected_wpm
-                self._d_speed[TEXT] = str(dspeed)
-            else:
-                self._d_speed[TEXT] = ""
+                dspeed = str(reader.detected_wpm)
             inet = mkm.Internet
             if not inet is None:
                 host = inet.host
@@ -411,29 +417,30 @@ class StatusBar:
                 server = host
                 if not port == PORT_DEFAULT:
                     server += ":{}".format(port)
-                self._server[TEXT] = server
-            else:
-                self._server[TEXT] = ""
             kob_ = mkm.Kob
             if not kob_ is None:
                 sndr_pwr_save = kob_.sounder_is_power_saving
-                if not sndr_pwr_save == self._sndr_pwr_save_last:
-                    self._sndr_pwr_save_last = sndr_pwr_save
-                    msg = "Sounder power save is on"
-                    if sndr_pwr_save:
-                        self._status_msg[TEXT] = msg
-                    elif self._status_msg[TEXT] == msg:
-                        # Clear our message, but not others
-                        self._status_msg[TEXT] = ""
-                    pass
-                pass
+        values = (dspeed, server, sndr_pwr_save)
+        if not values == self._values_last:
+            self._values_last = values
+            self._tkroot.after_idle(self._update_values, values)
+        return
+
+    def _update_values(self, values) -> None:  # type: (tuple[str,str,bool]) -> None
+        if self._shutdown.is_set():
+            return
+        dspeed, server, sndr_pwr_save = values
+        self._d_speed[TEXT] = dspeed
+        self._server[TEXT] = server
+        if not sndr_pwr_save == self._sndr_pwr_save_last:
+            self._sndr_pwr_save_last = sndr_pwr_save
+            msg = "Sounder power save is on"
+            if sndr_pwr_save:
+                self._status_msg[TEXT] = msg
+            elif self._status_msg[TEXT] == msg:
+                # Clear our message, but not others
+                self._status_msg[TEXT] = ""
             pass
-        else:
-            self._d_speed[TEXT] = ""
-            self._server[TEXT] = ""
-        #
-        # Schedule an update
-        self._tkroot.after(1000, self._update_values)
         return
 
     @property
@@ -496,6 +503,8 @@ class StatusBar:
         but DO NOT BLOCK.
         """
         self._shutdown.set()
+        if self._job_update:
+            self._job_update.cancel()
         return
 
     def start(self, mkmain:MKOBMain) -> None:
@@ -505,11 +514,12 @@ class StatusBar:
         if not mkmain is None:
             if not mkmain.Kob is None:
                 self._sndr_pwr_save_last = mkmain.Kob.sounder_is_power_saving
-        self._tkroot.after(1000, self._update_values)
+        self._job_update = scheduler.shared().every("MKOB-StatusBar", 1.0, self._job_update_body)
         return
 
 class MKOBWindow:
-    def __init__(self, root, mkob_version_text, cfg: Config, mkenv: MKOBEnv, sender_dt: bool, record_filepath: Optional[str]=None) -> None:
+    def __init__(self, root, mkob_version_text, cfg: Config, mkenv: MKOBEnv, sender_dt: bool, record_filepath: Optional[str]=None,
+            reader_scrollback: Optional[int]=None, reader_transcript: Optional[str]=None) -> None:
 
         self._app_started: bool = False  # Flag that will be set True when MKOB triggers on_app_started
         self._root = root
@@ -560,7 +570,7 @@ class MKOBWindow:
 
         # Pointers for other modules
         self._km = None
-        self._krdr = MKOBReader(self)
+        self._krdr = MKOBReader(self, reader_scrollback, reader_transcript)
         self._ksl = MKOBStationList(self)
         self._ka = MKOBActions(mkob_version_text, self, self._ksl, self._krdr, self._cfg)
         self._kkb = MKOBKeyboard(self._ka, self)
@@ -661,6 +671,9 @@ class MKOBWindow:
         self._toolsMenu.add_command(
             label="Key Timing Graph...", command=self._ka.doKeyGraphShow
         )
+        self._toolsMenu.add_command(
+            label="Latency Trace Report", command=self._ka.doLatencyReport
+        )
 
         # Help menu
         self._helpMenu = tk.Menu(self._menu)
@@ -928,9 +941,7 @@ class MKOBWindow:
 
         #### Reader
         self._root.bind(mkobevents.EVENT_READER_CLEAR, self._ka.handle_reader_clear)
-        ### self._root.bind(mkobevents.EVENT_APPEND_TEXT, krdr.handle_append_text)
-        cmd = self._root.register(self._ka.handle_reader_append_text)
-        self._root.tk.call("bind", root, mkobevents.EVENT_READER_APPEND_TEXT, cmd + " %d")
+        self._root.bind(mkobevents.EVENT_READER_FLUSH, self._ka.handle_reader_flush)
 
         #### Status Bar Message
         self._root.bind(mkobevents.EVENT_STATUS_MSG_CLEAR, self._ka.handle_status_msg_clear)
@@ -947,7 +958,7 @@ class MKOBWindow:
         self.set_app_title()
         self._root.update()
         self._cfg.register_listener(
-            self._config_changed_listener, config2.ChangeType.ANY
+            self._config_changed_listener, config2.ChangeType.ANY, self._root.after_idle
         )
 
         #### Keyboard event for the code send window (this must go after the 'root.update')
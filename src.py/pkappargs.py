@@ -31,7 +31,7 @@ Helpers for adding and handling PyKOB application common commandline arguments.
 import argparse
 from typing import Optional
 
-from pykob import recorder
+from pykob import metrics, recorder, trace
 
 record_session_override = argparse.ArgumentParser(add_help=False)
 record_session_override.add_argument("--record", metavar="filepath|['A'|'AUTO']", dest="record_filepath",
@@ -45,6 +45,53 @@ sender_datetime_override.add_argument(
     help="Add a date-time stamp to the current sender printed when the sender changes."
 )
 
+trace_latency_override = argparse.ArgumentParser(add_help=False)
+trace_latency_override.add_argument(
+    "--trace",
+    dest="trace_latency",
+    action='store_true',
+    help="Trace the latency of code from the key through to the wire, decoder and display. "
+        + "The per-stage latency report can be displayed while running and is printed on exit."
+)
+
+reader_scrollback_override = argparse.ArgumentParser(add_help=False)
+reader_scrollback_override.add_argument(
+    "--scrollback",
+    metavar="lines",
+    dest="reader_scrollback",
+    type=int,
+    help="Limit the reader window to about this many lines. The oldest lines are removed (in chunks) "
+        + "as new text is added. Use 0 for no limit. The default is 5000."
+)
+
+reader_transcript_override = argparse.ArgumentParser(add_help=False)
+reader_transcript_override.add_argument(
+    "--transcript",
+    metavar="filepath",
+    dest="reader_transcript",
+    help="Write the text removed from the reader window (and the text left in it on exit) to a "
+        + "transcript file. The file is rotated when it reaches 10MB, keeping 5 previous files "
+        + "('filepath.1' to 'filepath.5')."
+)
+
+metrics_override = argparse.ArgumentParser(add_help=False)
+metrics_override.add_argument(
+    "--metrics",
+    metavar="port|socket-path",
+    dest="metrics_endpoint",
+    help="Serve runtime metrics (Prometheus text format) on a localhost HTTP port, "
+        + "or to connections to a Unix socket at 'socket-path'."
+)
+
+def metrics_from_args(args) -> Optional[str]:
+    """
+    Start the metrics exporter if requested. Returns the endpoint, or None.
+    """
+    endpoint = args.metrics_endpoint if hasattr(args, "metrics_endpoint") and args.metrics_endpoint else None
+    if endpoint:
+        metrics.start_exporter(endpoint)
+    return endpoint
+
 def record_filepath_from_args(args) -> Optional[str]:
     record_filepath = None
     if hasattr(args, "record_filepath"):
@@ -56,3 +103,12 @@ def record_filepath_from_args(args) -> Optional[str]:
             else:
                 record_filepath = recorder.add_ext_if_needed(record_filepath)
     return record_filepath
+
+def trace_latency_from_args(args) -> bool:
+    """
+    Enable latency tracing if requested. Returns True if enabled.
+    """
+    enable = hasattr(args, "trace_latency") and args.trace_latency
+    if enable:
+        trace.enable()
+    return enable
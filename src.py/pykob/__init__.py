@@ -24,3 +24,21 @@ SOFTWARE.
 """
 
 VERSION = '1.4.10'
+
+# The submodules are imported when they are first used (`import pykob` doesn't
+# import them). `from pykob import kob` works as usual, and `pykob.kob` works
+# after just `import pykob`.
+_SUBMODULES = frozenset((
+    "audio", "codestream", "config", "config2", "internet", "kob", "log", "metrics",
+    "morse", "newsreader", "preferencesWindow", "recorder", "render", "scheduler",
+    "schedfeed", "selector", "serial", "stations", "trace", "util", "virtualhw",
+))
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        import importlib
+        return importlib.import_module("." + name, __name__)
+    raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+
+def __dir__():
+    return sorted(set(globals()) | _SUBMODULES)
@@ -26,111 +26,793 @@ SOFTWARE.
 audio module
 
 Provides audio for simulated sounder or tone.
+
+Sounds are played through a mixer with a number of voices. Each voice plays
+one sound at a time, with its own gain and pan, and the active voices are
+summed in the audio callback. This allows a new sound to start without cutting
+off one that is still playing on a different voice (for example, the clack of
+the sounder isn't cut off by the next click), and allows separate sources
+(local and wire) to be heard together.
+
+Tone is synthesized from a wavetable for the requested frequency, rather than
+played from a recording, so it starts and stops exactly when keyed. The start
+and end are shaped (rise/fall) so they don't click. Wavetables are built when
+first needed and kept in a small LRU cache.
+
+Normally the output goes to the default device using PyAudio. For servers and
+test runs a headless sink (`NullSink` or `FileSink`) can be used instead. They
+call the same audio callback, from their own thread, paced by a simulated
+output clock.
+
+NumPy is used for the mixing if it is available.
 """
 
+from array import array
+from collections import OrderedDict
+import ctypes
+import math
 import wave
 from pathlib import Path
 from pykob import log
 from pykob.config import AudioType
-from threading import Event, Thread
+from pykob.trace import Histogram
+from threading import Event, Lock, Thread
+import time
 from time import sleep
-from typing import List
+from typing import Any, List, Optional
+
+NUMPY_AVAILABLE = False
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+    log.debug("Audio mixing using NumPy: {}".format(np.__version__), 2)
+except:
+    np = None
+    log.debug("NumPy module could not be loaded. Audio mixing will use Python.", 2)
+
+FRAMES_PER_BUFFER = 16  # Default. Small to keep the latency low.
+MIXER_FRAME_RATE = 48000
+MIXER_MAX_FRAMES = 4096  # Largest callback request supported (when PortAudio chooses the buffer size)
+MIXER_VOICES = 2
+
+# PortAudio callback return values and status flags (the same values as PyAudio)
+PA_CONTINUE = 0
+PA_ABORT = 2
+PA_OUTPUT_UNDERFLOW = 0x00000004
+
+SINK_DEFAULT_FRAMES = 256  # Frames per callback for a sink if the Audio doesn't specify
+
+SOUND_CLACK = 0  # Sounder de-energized (or tone off)
+SOUND_CLICK = 1  # Sounder energized (or tone on)
+
+TONE_FREQUENCY = 750  # Hz
+TONE_RISE_MS = 5.0    # Rise and fall time of the tone envelope
+TONE_AMPLITUDE = 0.8  # Of full scale
+WAVETABLE_CACHE_SIZE = 8
+
+class Wavetable:
+    """
+    Samples for a tone of a given frequency, sample rate, and rise/fall time.
+
+    The table holds a whole number of cycles that exactly fill an integer number
+    of samples (so it loops without a discontinuity), extended by MIXER_MAX_FRAMES
+    so that any callback's worth of samples can be taken from any phase without
+    wrapping. The envelope is a raised cosine, `env_up` for the rise and `env_down`
+    (its reverse) for the fall.
+    """
+    def __init__(self, frequency, frame_rate, rise_ms):  # type: (int, int, float) -> None
+        self.frequency = frequency      # type: int
+        self.frame_rate = frame_rate    # type: int
+        self.rise_ms = rise_ms          # type: float
+        self.period_len = frame_rate // math.gcd(frame_rate, frequency)  # type: int
+        n = self.period_len + MIXER_MAX_FRAMES
+        amp = 32767 * TONE_AMPLITUDE
+        w = 2.0 * math.pi * frequency / frame_rate
+        samples = array('h', [int(amp * math.sin(w * (i % self.period_len))) for i in range(n)])
+        self.ramp_len = max(int(frame_rate * rise_ms / 1000.0), 1)  # type: int
+        up = [0.5 - 0.5 * math.cos(math.pi * (i + 1) / self.ramp_len) for i in range(self.ramp_len)]
+        if NUMPY_AVAILABLE:
+            self.samples = np.frombuffer(samples.tobytes(), dtype=np.int16)
+            self.env_up = np.array(up, dtype=np.float32)
+            self.env_down = np.array(up[::-1], dtype=np.float32)
+        else:
+            self.samples = samples
+            self.env_up = array('f', up)
+            self.env_down = array('f', up[::-1])
+        return
+
+_wavetable_cache = OrderedDict()  # type: OrderedDict[tuple[int,int,float],Wavetable]
+_wavetable_cache_guard = Lock()
+
+def get_wavetable(frequency, frame_rate=MIXER_FRAME_RATE, rise_ms=TONE_RISE_MS):
+    # type: (float, int, float) -> Wavetable
+    """
+    Get the wavetable for a tone (frequency is rounded to 1Hz), building it if
+    it isn't in the cache. The cache keeps the most recently used tables.
+    """
+    key = (max(int(round(frequency)), 1), frame_rate, rise_ms)
+    with _wavetable_cache_guard:
+        wt = _wavetable_cache.get(key)
+        if wt:
+            _wavetable_cache.move_to_end(key)
+            return wt
+    wt = Wavetable(*key)
+    with _wavetable_cache_guard:
+        _wavetable_cache[key] = wt
+        while len(_wavetable_cache) > WAVETABLE_CACHE_SIZE:
+            _wavetable_cache.popitem(last=False)
+    return wt
+
+class _Voice:
+    """
+    State of one mixer voice.
+    """
+    # Tone states
+    IDLE = 0
+    RISE = 1
+    ON = 2
+    FALL = 3
+
+    def __init__(self):
+        self.sound = -1         # type: int  # Sound being played, -1 if idle
+        self.pos = 0            # type: int  # Next frame to play (or position in the envelope for tone)
+        self.tone = None        # type: Wavetable|None  # Tone being played
+        self.tone_state = _Voice.IDLE  # type: int
+        self.phase = 0          # type: int  # Tone phase (index into the wavetable)
+        self.gain = 1.0         # type: float
+        self.pan = 0.0          # type: float
+        self.gain_l = 1.0       # type: float
+        self.gain_r = 1.0       # type: float
+        return
+
+class Mixer:
+    """
+    Mixes sounds playing on a number of voices into a stereo, 16 bit, output buffer.
+
+    Sounds are converted to mono 16 bit samples at the mixer frame rate when they
+    are added, so no conversion is needed when mixing. The output buffer and
+    work buffers are allocated up front, so `mix` doesn't allocate sample data.
+    """
+    def __init__(self, voices=MIXER_VOICES, frame_rate=MIXER_FRAME_RATE, max_frames=MIXER_MAX_FRAMES):
+        # type: (int, int, int) -> None
+        self._frame_rate = frame_rate       # type: int
+        self._max_frames = max_frames       # type: int
+        self._voices = [_Voice() for i in range(max(voices, 1))]  # type: list[_Voice]
+        self._sounds = []                   # type: list[Any]
+        self._guard = Lock()                # type: Lock  # Guards the voice state
+        self._out = bytearray(max_frames * 4)  # Interleaved stereo 16 bit samples
+        self._out_view = memoryview(self._out)
+        if NUMPY_AVAILABLE:
+            self._out_np = np.frombuffer(self._out, dtype=np.int16).reshape(max_frames, 2)
+            self._acc = np.zeros((max_frames, 2), dtype=np.float32)
+            self._tmp = np.zeros(max_frames, dtype=np.float32)
+            self._tmp2 = np.zeros(max_frames, dtype=np.float32)
+        else:
+            self._out_a = array('h', bytes(max_frames * 4))
+            self._out_a_view = memoryview(self._out_a).cast('B')
+        return
+
+    @property
+    def active(self):  # type: () -> bool
+        """
+        True if any voice is playing a sound or tone.
+        """
+        with self._guard:
+            return any(v.sound >= 0 or not v.tone_state == _Voice.IDLE for v in self._voices)
+
+    @property
+    def frame_rate(self):  # type: () -> int
+        return self._frame_rate
+
+    @property
+    def max_frames(self):  # type: () -> int
+        return self._max_frames
+
+    @property
+    def voices(self):  # type: () -> int
+        return len(self._voices)
+
+    def add_sound(self, frames, frame_rate, channels=1, sample_width=2):
+        # type: (bytes, int, int, int) -> int
+        """
+        Add a sound from 16 bit PCM frames. It is converted to mono at the mixer
+        frame rate. Returns the sound ID to use with `play`.
+        """
+        if not sample_width == 2:
+            raise ValueError("Only 16 bit audio is supported. Sample width: {}".format(sample_width))
+        samples = array('h', frames)
+        if channels > 1:
+            samples = array('h', [
+                sum(samples[i:i + channels]) // channels for i in range(0, len(samples), channels)])
+        if not frame_rate == self._frame_rate:
+            # Linear interpolation to the mixer frame rate
+            n_in = len(samples)
+            n_out = (n_in * self._frame_rate) // frame_rate
+            step = frame_rate / self._frame_rate
+            resampled = array('h', bytes(2 * n_out))
+            for i in range(n_out):
+                x = i * step
+                j = int(x)
+                f = x - j
+                s0 = samples[j]
+                s1 = samples[j + 1] if j + 1 < n_in else s0
+                resampled[i] = int(s0 + (s1 - s0) * f)
+            samples = resampled
+        snd = np.frombuffer(samples.tobytes(), dtype=np.int16) if NUMPY_AVAILABLE else samples
+        with self._guard:
+            self._sounds.append(snd)
+            return len(self._sounds) - 1
+
+    def add_wav(self, path):  # type: (str|Path) -> int
+        """
+        Add a sound from a WAV file. Returns the sound ID.
+        """
+        log.debug("Load audio file: {}".format(path), 8)
+        with wave.open(str(path), mode='rb') as f:
+            return self.add_sound(
+                f.readframes(f.getnframes()), f.getframerate(), f.getnchannels(), f.getsampwidth())
+
+    def _mix_tone_np(self, v, acc, n):  # type: (_Voice, Any, int) -> None
+        wt = v.tone
+        tmp = self._tmp
+        filled = 0
+        while filled < n and not v.tone_state == _Voice.IDLE:
+            m = n - filled
+            seg = wt.samples[v.phase:v.phase + m]
+            if v.tone_state == _Voice.ON:
+                np.multiply(seg, 1.0, out=tmp[:m])
+            else:
+                m = min(m, wt.ramp_len - v.pos)
+                env = wt.env_up if v.tone_state == _Voice.RISE else wt.env_down
+                np.multiply(seg[:m], env[v.pos:v.pos + m], out=tmp[:m])
+                v.pos += m
+                if v.pos >= wt.ramp_len:
+                    v.tone_state = _Voice.ON if v.tone_state == _Voice.RISE else _Voice.IDLE
+            a = acc[filled:filled + m]
+            np.multiply(tmp[:m], v.gain_l, out=self._tmp2[:m])
+            np.add(a[:, 0], self._tmp2[:m], out=a[:, 0])
+            np.multiply(tmp[:m], v.gain_r, out=self._tmp2[:m])
+            np.add(a[:, 1], self._tmp2[:m], out=a[:, 1])
+            v.phase = (v.phase + m) % wt.period_len
+            filled += m
+        return
+
+    def _mix_tone_py(self, v, out, n, only):  # type: (_Voice, array, int, bool) -> None
+        wt = v.tone
+        samples = wt.samples
+        gl = v.gain_l
+        gr = v.gain_r
+        filled = 0
+        while filled < n and not v.tone_state == _Voice.IDLE:
+            m = n - filled
+            env = None
+            if not v.tone_state == _Voice.ON:
+                m = min(m, wt.ramp_len - v.pos)
+                env = wt.env_up if v.tone_state == _Voice.RISE else wt.env_down
+            p = v.phase
+            e = v.pos
+            if env is None and only and gl == 1.0 and gr == 1.0:
+                # The only voice, at unity gain - copy the samples
+                out[2 * filled:2 * (filled + m):2] = samples[p:p + m]
+                out[2 * filled + 1:2 * (filled + m):2] = samples[p:p + m]
+            else:
+                for i in range(m):
+                    x = samples[p + i] if env is None else samples[p + i] * env[e + i]
+                    j = 2 * (filled + i)
+                    l = out[j] + int(x * gl)
+                    r = out[j + 1] + int(x * gr)
+                    out[j] = 32767 if l > 32767 else (-32768 if l < -32768 else l)
+                    out[j + 1] = 32767 if r > 32767 else (-32768 if r < -32768 else r)
+            if env is not None:
+                v.pos += m
+                if v.pos >= wt.ramp_len:
+                    v.tone_state = _Voice.ON if v.tone_state == _Voice.RISE else _Voice.IDLE
+            v.phase = (v.phase + m) % wt.period_len
+            filled += m
+        return
+
+    def mix(self, frame_count):  # type: (int) -> memoryview
+        """
+        Mix the active voices for the next `frame_count` frames (<= max_frames).
+        Returns a view of the output buffer (interleaved stereo 16 bit samples),
+        which is only valid until the next call.
+        """
+        n = frame_count
+        if NUMPY_AVAILABLE:
+            acc = self._acc[:n]
+            acc.fill(0.0)
+            tmp = self._tmp
+            with self._guard:
+                for v in self._voices:
+                    if not v.tone_state == _Voice.IDLE:
+                        self._mix_tone_np(v, acc, n)
+                        continue
+                    if v.sound < 0:
+                        continue
+                    snd = self._sounds[v.sound]
+                    seg = snd[v.pos:v.pos + n]
+                    m = len(seg)
+                    np.multiply(seg, v.gain_l, out=tmp[:m])
+                    np.add(acc[:m, 0], tmp[:m], out=acc[:m, 0])
+                    np.multiply(seg, v.gain_r, out=tmp[:m])
+                    np.add(acc[:m, 1], tmp[:m], out=acc[:m, 1])
+                    v.pos += m
+                    if v.pos >= len(snd):
+                        v.sound = -1
+            np.clip(acc, -32768.0, 32767.0, out=acc)
+            np.copyto(self._out_np[:n], acc, casting='unsafe')
+            return self._out_view[:n * 4]
+        out = self._out_a
+        for i in range(2 * n):
+            out[i] = 0
+        with self._guard:
+            active = [v for v in self._voices if v.sound >= 0 or not v.tone_state == _Voice.IDLE]
+            if len(active) == 1 and active[0].sound >= 0 and active[0].gain_l == 1.0 and active[0].gain_r == 1.0:
+                # Common case, a single voice at unity gain - no need to scale or clip
+                v = active[0]
+                snd = self._sounds[v.sound]
+                m = min(n, len(snd) - v.pos)
+                out[0:2 * m:2] = snd[v.pos:v.pos + m]
+                out[1:2 * m:2] = snd[v.pos:v.pos + m]
+                v.pos += m
+                if v.pos >= len(snd):
+                    v.sound = -1
+            else:
+                for v in active:
+                    if not v.tone_state == _Voice.IDLE:
+                        self._mix_tone_py(v, out, n, len(active) == 1)
+                        continue
+                    snd = self._sounds[v.sound]
+                    m = min(n, len(snd) - v.pos)
+                    gl = v.gain_l
+                    gr = v.gain_r
+                    p = v.pos
+                    for i in range(m):
+                        x = snd[p + i]
+                        l = out[2 * i] + int(x * gl)
+                        r = out[2 * i + 1] + int(x * gr)
+                        out[2 * i] = 32767 if l > 32767 else (-32768 if l < -32768 else l)
+                        out[2 * i + 1] = 32767 if r > 32767 else (-32768 if r < -32768 else r)
+                    v.pos += m
+                    if v.pos >= len(snd):
+                        v.sound = -1
+        return self._out_a_view[:n * 4]
+
+    def play(self, voice, sound):  # type: (int, int) -> None
+        """
+        Start playing a sound on a voice (from the start). Any sound already
+        playing on that voice is stopped. Other voices are not affected.
+        """
+        with self._guard:
+            v = self._voices[voice]
+            v.tone_state = _Voice.IDLE
+            v.sound = sound
+            v.pos = 0
+        return
+
+    def set_voice(self, voice, gain=None, pan=None):
+        # type: (int, float|None, float|None) -> None
+        """
+        Set the gain (0.0 to 1.0+) and/or pan (-1.0 left to 1.0 right) of a voice.
+        """
+        with self._guard:
+            v = self._voices[voice]
+            if gain is not None:
+                v.gain = max(gain, 0.0)
+            if pan is not None:
+                v.pan = min(max(pan, -1.0), 1.0)
+            # Balance law: centered is full level on both channels
+            v.gain_l = v.gain * min(1.0, 1.0 - v.pan)
+            v.gain_r = v.gain * min(1.0, 1.0 + v.pan)
+        return
+
+    def stop(self, voice=None):  # type: (int|None) -> None
+        """
+        Stop a voice, or all voices if `voice` is None.
+        """
+        with self._guard:
+            for i, v in enumerate(self._voices):
+                if voice is None or i == voice:
+                    v.sound = -1
+                    v.tone_state = _Voice.IDLE
+        return
+
+    def tone_off(self, voice):  # type: (int) -> None
+        """
+        End the tone on a voice (it falls to silence over the envelope fall time).
+        """
+        with self._guard:
+            v = self._voices[voice]
+            if v.tone_state == _Voice.ON:
+                v.tone_state = _Voice.FALL
+                v.pos = 0
+            elif v.tone_state == _Voice.RISE:
+                # Fall from the current level
+                v.tone_state = _Voice.FALL
+                v.pos = v.tone.ramp_len - v.pos
+        return
+
+    def tone_on(self, voice, wavetable):  # type: (int, Wavetable) -> None
+        """
+        Start a tone on a voice. It continues until `tone_off` is called.
+        """
+        with self._guard:
+            v = self._voices[voice]
+            v.sound = -1
+            if v.tone_state == _Voice.FALL and v.tone is wavetable:
+                # Rise from the current level (and phase)
+                v.tone_state = _Voice.RISE
+                v.pos = wavetable.ramp_len - v.pos
+            elif not (v.tone_state in (_Voice.RISE, _Voice.ON) and v.tone is wavetable):
+                v.tone = wavetable
+                v.tone_state = _Voice.RISE
+                v.pos = 0
+                v.phase = 0
+        return
+
+class NullSink:
+    """
+    Headless audio output that consumes (and discards) the frames.
+
+    It calls the stream callback from its own thread, in the same way PortAudio
+    does, on a simulated output clock. If `realtime` is True, each callback is
+    made when the output would need the buffer, and the callback times and
+    underflows are real. If False, it runs as fast as the callback allows
+    (the clock is purely simulated).
+    """
+    def __init__(self, realtime=True):  # type: (bool) -> None
+        self._realtime = realtime       # type: bool
+        self._callback = None           # type: Any
+        self._frame_rate = MIXER_FRAME_RATE  # type: int
+        self._frames_per_buffer = SINK_DEFAULT_FRAMES  # type: int
+        self._frames = 0                # type: int  # Frames consumed
+        self._shutdown = Event()        # type: Event
+        self._thread = None             # type: Thread|None
+        return
+
+    @property
+    def clock(self):  # type: () -> float
+        """
+        The simulated output clock (seconds of audio consumed).
+        """
+        return self._frames / self._frame_rate
+
+    @property
+    def frames(self):  # type: () -> int
+        return self._frames
+
+    def _thread_sink_body(self):
+        """
+        Call the callback for each buffer, paced by the output clock.
+        """
+        n = self._frames_per_buffer
+        buffer_time = n / self._frame_rate
+        t_start = time.perf_counter()
+        status = 0
+        while not self._shutdown.is_set():
+            t_buffer = self._frames / self._frame_rate  # Output clock time the buffer starts
+            if self._realtime:
+                dt = t_buffer - (time.perf_counter() - t_start)
+                if dt > 0:
+                    self._shutdown.wait(dt)
+                now = time.perf_counter() - t_start
+            else:
+                now = t_buffer
+            time_info = {
+                "current_time": now,
+                "output_buffer_dac_time": t_buffer + buffer_time,
+            }
+            data, retval = self._callback(None, n, time_info, status)
+            if not isinstance(data, (bytes, ctypes.Array)):
+                # Accept only what PyAudio's "z#" accepts: a read-only bytes-like object
+                # whose buffer doesn't need releasing (bytes, or a ctypes array over one).
+                raise TypeError("audio callback returned {}, not a read-only bytes-like object".format(type(data).__name__))
+            self._write(data)
+            self._frames += n
+            status = 0
+            if self._realtime and (time.perf_counter() - t_start) > (t_buffer + buffer_time):
+                # The buffer wasn't ready by the time it needed to be played
+                status = PA_OUTPUT_UNDERFLOW
+            if not retval == PA_CONTINUE:
+                break
+        return
+
+    def _write(self, data):  # type: (Any) -> None
+        return
+
+    def exit(self):
+        """
+        Stop the output and wait for the thread to end.
+        """
+        self.shutdown()
+        thread = self._thread
+        if thread and thread.is_alive():
+            thread.join()
+        return
+
+    def get_output_latency(self):  # type: () -> float
+        return self._frames_per_buffer / self._frame_rate
+
+    def shutdown(self):
+        """
+        Initiate shutdown of our operations (and don't start anything new), 
+        but DO NOT BLOCK.
+        """
+        self._shutdown.set()
+        return
+
+    def start(self, frame_rate, frames_per_buffer, callback):  # type: (int, int, Any) -> None
+        """
+        Start calling the callback (the same signature as a PyAudio stream callback).
+        """
+        self._frame_rate = frame_rate
+        self._frames_per_buffer = frames_per_buffer if frames_per_buffer > 0 else SINK_DEFAULT_FRAMES
+        self._callback = callback
+        self._frames = 0
+        self._shutdown.clear()
+        self._thread = Thread(name="Audio-Sink", daemon=True, target=self._thread_sink_body)
+        self._thread.start()
+        return
+
+class FileSink(NullSink):
+    """
+    Headless audio output that writes every frame the mixer produces to a WAV
+    file (stereo, 16 bit). The file is closed by `exit`.
+    """
+    def __init__(self, path, realtime=True):  # type: (str|Path, bool) -> None
+        super().__init__(realtime)
+        self._path = path               # type: str|Path
+        self._wav = None                # type: wave.Wave_write|None
+        return
+
+    def _write(self, data):  # type: (Any) -> None
+        self._wav.writeframesraw(data)
+        return
+
+    def exit(self):
+        super().exit()
+        if self._wav:
+            self._wav.close()
+            self._wav = None
+        return
+
+    def start(self, frame_rate, frames_per_buffer, callback):  # type: (int, int, Any) -> None
+        self._wav = wave.open(str(self._path), "wb")
+        self._wav.setnchannels(2)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(frame_rate)
+        super().start(frame_rate, frames_per_buffer, callback)
+        return
 
 class Audio:
-    FRAMES_PER_BUFFER = 16
+    FRAMES_PER_BUFFER = FRAMES_PER_BUFFER
 
-    def __init__(self, audio_type: AudioType = AudioType.SOUNDER):
+    def __init__(self, audio_type: AudioType = AudioType.SOUNDER, frames_per_buffer: int = FRAMES_PER_BUFFER,
+            voices: int = MIXER_VOICES, tone_frequency: int = TONE_FREQUENCY, sink: Optional[NullSink] = None):
+        """
+        audio_type: Sounder (click/clack) or Tone
+        frames_per_buffer: Number of frames PortAudio requests in each callback.
+            Smaller values lower the latency, larger values reduce the chance
+            of underruns (dropouts) on slower machines. 0 lets PortAudio choose.
+        voices: Number of mixer voices.
+        tone_frequency: Frequency (Hz) of the tone (for Tone).
+        sink: A headless sink (NullSink or FileSink) to use in place of the audio device.
+        """
         self._audio_type = audio_type
+        self._tone = None  # type: Wavetable|None
+        self._frames_per_buffer = frames_per_buffer if frames_per_buffer >= 0 else FRAMES_PER_BUFFER
         self._audio_available = False
         self._pa = None
-        self._callback_retval = None
-        try:
-            import pyaudio
-            self._pyaudio = pyaudio
-            self._callback_retval = pyaudio.paContinue
+        self._pyaudio = None
+        self._callback_retval = PA_CONTINUE
+        self._sink = sink
+        self._shutdown = Event()
+        if sink:
             self._audio_available = True
-        except:
-            log.warn("Audio: PyAudio can't be loaded. Audio will not be available.")
-
-        self._nChannels = [0, 0]
-        self._frameRate = [0, 0]
-        self._nFrames = [0, 0]
-        self._frames = [None, None]
-        self._nullFrames = None
-        self._iFrame = [0, 0]
-        self._sampleFormat = [0, 0]
-        self._sampleWidth = [0, 0]
-        self._sound = 0
-        self._frameWidth = [0, 0]
+        else:
+            try:
+                import pyaudio
+                self._pyaudio = pyaudio
+                self._audio_available = True
+            except:
+                log.warn("Audio: PyAudio can't be loaded. Audio will not be available.")
+
+        max_frames = self._frames_per_buffer if self._frames_per_buffer > 0 else MIXER_MAX_FRAMES
+        self._mixer = Mixer(voices, MIXER_FRAME_RATE, max_frames)
+        self._sound_ids = [-1, -1]
         self._strm = None
+        if self._audio_type == AudioType.TONE:
+            self._tone = get_wavetable(tone_frequency, MIXER_FRAME_RATE)
+        # Callback statistics
+        self._callbacks = 0
+        self._underruns = 0
+        self._late_callbacks = 0
+        self._frame_count_errors = 0
+        self._callback_time = Histogram()       # Time spent in the callback
+        self._callback_interval = Histogram()   # Time between callbacks
+        self._t_last_callback = 0.0
 
         if not self._audio_available:
             return
-        self._pa = pyaudio.PyAudio()
         # Resource folder
         self._root_folder = Path(__file__).parent
         self._resource_folder = self._root_folder / "resources"
-        # Audio files
-        self._audio_files = (
-            ["clack48.wav", "click48.wav"]
-            if self._audio_type == AudioType.SOUNDER
-            else ["tone0.wav", "tone750.wav"]
-        )
-        for i in range(len(self._audio_files)):
-            fn = self._resource_folder / self._audio_files[i]
-            log.debug("Load audio file: {}".format(fn), 8)
-            f = wave.open(str(fn), mode='rb')
-            self._nChannels[i] = f.getnchannels()
-            self._sampleWidth[i] = f.getsampwidth()
-            self._sampleFormat[i] = self._pa.get_format_from_width(self._sampleWidth[i])
-            self._frameWidth[i] = self._nChannels[i] * self._sampleWidth[i]
-            self._frameRate[i] = f.getframerate()
-            self._nFrames[i] = f.getnframes()
-            self._frames[i] = f.readframes(self._nFrames[i])
-            self._iFrame[i] = self._nFrames[i]
-            f.close()
-        self._nullFrames = bytes(self._frameWidth[0] * Audio.FRAMES_PER_BUFFER)
+        # Audio files (tone is synthesized)
+        if self._audio_type == AudioType.SOUNDER:
+            self._audio_files = ["clack48.wav", "click48.wav"]
+            for i in range(len(self._audio_files)):
+                self._sound_ids[i] = self._mixer.add_wav(self._resource_folder / self._audio_files[i])
         #
+        if sink:
+            self._strm = sink
+            sink.start(self._mixer.frame_rate, self._frames_per_buffer, self._audio_callback)
+            log.debug("Audio: using {} sink. frames per buffer: {}".format(
+                type(sink).__name__, self._frames_per_buffer), 2)
+            return
+        self._pa = self._pyaudio.PyAudio()
         self._apiInfo = self._pa.get_default_host_api_info()
         self._apiName = self._apiInfo["name"]
         self._devIdx = self._apiInfo["defaultOutputDevice"]
         self._devInfo = self._pa.get_device_info_by_index(self._devIdx)
         self._devName = self._devInfo["name"]
         self._strm = self._pa.open(
-            rate=self._frameRate[0],
-            channels=self._nChannels[0],
-            format=self._sampleFormat[0],
+            rate=self._mixer.frame_rate,
+            channels=2,
+            format=self._pyaudio.paInt16,
             output=True,
             output_device_index=self._devIdx,
-            frames_per_buffer=Audio.FRAMES_PER_BUFFER,
+            frames_per_buffer=self._frames_per_buffer,
             stream_callback=self._audio_callback
         )
+        log.debug("Audio: frames per buffer: {} output latency: {:.1f}ms".format(
+            self._frames_per_buffer, self.output_latency * 1000.0), 2)
 
     def _audio_callback(self, in_data, frame_count, time_info, status_flags):
-        if frame_count != Audio.FRAMES_PER_BUFFER:
+        t = time.perf_counter()
+        if self._callbacks > 0:
+            self._callback_interval.add(t - self._t_last_callback)
+        self._t_last_callback = t
+        self._callbacks += 1
+        if status_flags & PA_OUTPUT_UNDERFLOW:
+            self._underruns += 1
+        dac_time = time_info.get("output_buffer_dac_time", 0)
+        if dac_time and dac_time < time_info.get("current_time", 0):
+            # The buffer being requested should already be playing
+            self._late_callbacks += 1
+        if frame_count > self._mixer.max_frames:
+            self._frame_count_errors += 1
             log.err("audio: Unexpected frame count request from PyAudio: {}".format(frame_count))
-            return (self._nullFrames, 0)
-        if self._iFrame[self._sound] + frame_count < self._nFrames[self._sound]:
-            startByte = self._iFrame[self._sound] * self._frameWidth[self._sound]
-            endByte = (self._iFrame[self._sound] + frame_count) * self._frameWidth[self._sound]
-            outData = self._frames[self._sound][startByte:endByte]
-            self._iFrame[self._sound] += frame_count
-            return (outData, self._callback_retval)
-        else:
-            return (self._nullFrames, self._callback_retval)
+            return (bytes(frame_count * 4), self._callback_retval)
+        # PyAudio parses the result with "z#", which rejects a memoryview (even a
+        # read-only one), as its buffer has to be released. A ctypes array over the
+        # mixer's output buffer is accepted, and passes the samples without a copy.
+        # PortAudio copies them out before the buffer is mixed into again.
+        view = self._mixer.mix(frame_count)
+        data = (ctypes.c_char * len(view)).from_buffer(view)
+        self._callback_time.add(time.perf_counter() - t)
+        return (data, self._callback_retval)
+
+    @property
+    def callback_interval(self) -> Histogram:
+        """
+        Histogram of the time between callbacks.
+        """
+        return self._callback_interval
+
+    @property
+    def callback_time(self) -> Histogram:
+        """
+        Histogram of the time spent in the callback (mixing).
+        """
+        return self._callback_time
+
+    @property
+    def callbacks(self) -> int:
+        """
+        Number of audio callbacks made.
+        """
+        return self._callbacks
+
+    @property
+    def frames_per_buffer(self) -> int:
+        return self._frames_per_buffer
+
+    @property
+    def late_callbacks(self) -> int:
+        """
+        Number of callbacks that were made after the time the buffer should have started playing.
+        """
+        return self._late_callbacks
+
+    @property
+    def mixer(self) -> Mixer:
+        return self._mixer
+
+    @property
+    def output_latency(self) -> float:
+        """
+        The output latency (seconds) reported for the stream.
+        """
+        strm = self._strm
+        return strm.get_output_latency() if strm else 0.0
+
+    @property
+    def tone_frequency(self) -> int:
+        """
+        Frequency (Hz) of the tone, 0 if not a Tone.
+        """
+        tone = self._tone
+        return tone.frequency if tone else 0
+
+    @property
+    def underruns(self) -> int:
+        """
+        Number of callbacks that reported an output underflow (a dropout).
+        """
+        return self._underruns
 
     def audio_available(self):
         return self._audio_available
 
     def exit(self):
-        self._callback_retval = None if not self._pyaudio else self._pyaudio.paAbort
-        self._iFrame[0] = self._nFrames[0]
-        self._iFrame[1] = self._nFrames[1]
+        self.shutdown()
+        self._callback_retval = PA_ABORT
+        self._mixer.stop()
+        if self._sink:
+            self._sink.exit()
+        if self._callbacks > 0:
+            log.debug("Audio: callbacks: {} underruns: {} late: {} frame count errors: {}".format(
+                self._callbacks, self._underruns, self._late_callbacks, self._frame_count_errors), 2)
+            log.debug("Audio: callback time (ms) mean: {:.3f} p99: {:.3f} max: {:.3f}  interval (ms) mean: {:.3f} max: {:.3f}".format(
+                self._callback_time.mean, self._callback_time.percentile(99), self._callback_time.max,
+                self._callback_interval.mean, self._callback_interval.max), 2)
 
-    def play(self, snd:int):
-        if self._audio_available:
-            self._iFrame[snd] = 0
-            self._sound = snd
+    def play(self, snd:int, voice:Optional[int]=None):
+        """
+        Play the clack/tone-off (0) or click/tone-on (1) sound.
+
+        voice: The mixer voice to play it on. By default, for the sounder the
+            click and clack use their own voices (so one doesn't cut off the other)
+            and for tone both use voice 0 (so tone-off stops the tone).
+        """
+        if self._audio_available and not self._shutdown.is_set():
+            if voice is None:
+                voice = snd if self._audio_type == AudioType.SOUNDER else 0
+            voice = voice % self._mixer.voices
+            if self._tone:
+                if snd == SOUND_CLICK:
+                    self._mixer.tone_on(voice, self._tone)
+                else:
+                    self._mixer.tone_off(voice)
+            else:
+                self._mixer.play(voice, self._sound_ids[snd])
+
+    def reset_counters(self):
+        """
+        Reset the callback statistics.
+        """
+        self._callbacks = 0
+        self._underruns = 0
+        self._late_callbacks = 0
+        self._frame_count_errors = 0
+        self._callback_time = Histogram()
+        self._callback_interval = Histogram()
+        return
+
+    def set_tone_frequency(self, frequency:int):
+        """
+        Change the frequency of the tone (for Tone). Takes effect on the next tone-on.
+        """
+        if self._tone:
+            self._tone = get_wavetable(frequency, MIXER_FRAME_RATE)
+        return
+
+    def set_voice(self, voice:int, gain:Optional[float]=None, pan:Optional[float]=None):
+        """
+        Set the gain and/or pan of a mixer voice.
+        """
+        self._mixer.set_voice(voice, gain, pan)
+        return
 
     def shutdown(self):
         """
@@ -202,4 +884,61 @@ class Audio2:
         """
         self._shutdown.set()
         return
-'''
\ No newline at end of file
+'''
+"""
+Test code
+"""
+if __name__ == "__main__":
+    # Self-test
+    resource_folder = Path(__file__).parent / "resources"
+    mixer = Mixer(voices=2, max_frames=FRAMES_PER_BUFFER)
+    clack = mixer.add_wav(resource_folder / "clack48.wav")
+    click = mixer.add_wav(resource_folder / "click48.wav")
+    mixer.set_voice(1, gain=0.5, pan=-1.0)
+    mixer.play(0, clack)
+    mixer.play(1, click)
+    peak_l = 0
+    peak_r = 0
+    n = 0
+    while True:
+        out = array('h', mixer.mix(FRAMES_PER_BUFFER).tobytes())
+        if not any(out) and n > 0:
+            break
+        peak_l = max(peak_l, max(abs(x) for x in out[0::2]))
+        peak_r = max(peak_r, max(abs(x) for x in out[1::2]))
+        n += 1
+    print("Mixed {} buffers (NumPy: {}). Peak L: {} R: {}".format(n, NUMPY_AVAILABLE, peak_l, peak_r))
+    # Tone: 60ms on, then off. Check that the level steps between buffers stay small (no clicks).
+    tone = get_wavetable(TONE_FREQUENCY)
+    mixer.set_voice(0)
+    mixer.tone_on(0, tone)
+    samples = array('h')
+    for i in range(int(0.060 * MIXER_FRAME_RATE / FRAMES_PER_BUFFER)):
+        samples.extend(array('h', mixer.mix(FRAMES_PER_BUFFER).tobytes())[0::2])
+    mixer.tone_off(0)
+    for i in range(int(0.020 * MIXER_FRAME_RATE / FRAMES_PER_BUFFER)):
+        samples.extend(array('h', mixer.mix(FRAMES_PER_BUFFER).tobytes())[0::2])
+    max_step = max(abs(samples[i + 1] - samples[i]) for i in range(len(samples) - 1))
+    print("Tone {}Hz: table {} frames, {} samples, peak: {} max step: {} first: {} last: {}".format(
+        tone.frequency, tone.period_len, len(samples), max(abs(x) for x in samples), max_step,
+        samples[0], samples[-1]))
+    # Headless sinks, through the Audio callback path
+    import os
+    import tempfile
+    fd, path = tempfile.mkstemp(suffix=".wav")
+    os.close(fd)
+    for audio_type, sink in ((AudioType.SOUNDER, NullSink()), (AudioType.TONE, FileSink(path))):
+        aud = Audio(audio_type, frames_per_buffer=256, sink=sink)
+        for i in range(5):
+            aud.play(SOUND_CLICK)
+            sleep(0.060)
+            aud.play(SOUND_CLACK)
+            sleep(0.060)
+        aud.exit()
+        ct = aud.callback_time
+        print("{} {}: {} callbacks ({:.3f}s of audio) underruns: {} late: {} callback (ms) mean: {:.3f} p99: {:.3f} max: {:.3f}".format(
+            type(sink).__name__, audio_type.name, aud.callbacks, sink.clock, aud.underruns, aud.late_callbacks,
+            ct.mean, ct.percentile(99), ct.max))
+    with wave.open(path, "rb") as w:
+        print("File sink wrote {} frames.".format(w.getnframes()))
+    os.remove(path)
@@ -0,0 +1,232 @@
+"""
+MIT License
+
+Copyright (c) 2020-24 PyKOB - MorseKOB in Python
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+"""
+codestream module
+
+Compiles text files and recordings into code streams, so that sending the same
+content again doesn't re-read and re-encode it. Used by MRT and the FeedServer.
+
+A code stream is a list of (code, char, secs) entries. `secs` is the time the
+entry takes to send. An entry with a code of None is a pause. Recordings don't
+have characters, so their entries have a char of None.
+"""
+import os
+from threading import Event, Lock
+import time
+from typing import Callable
+
+from pykob import config, log, morse, recorder
+
+PARAGRAPH_PAUSE = 2.0  # Seconds to pause after a paragraph
+
+_senders = {}           # type: dict[tuple, morse.Sender]
+_senders_guard = Lock()
+
+def code_secs(code):  # type: (tuple[int,...]|list[int]) -> float
+    """
+    The time (seconds) to sound a code sequence (the same way `KOB.soundCode` does).
+    """
+    ms = 0
+    for c in code:
+        ms += 1 if c < -3000 else abs(c)
+    return ms / 1000.0
+
+def encode_text(text, wpm, cwpm=0, code_type=config.CodeType.american, spacing=config.Spacing.char):
+    # type: (str, int, int, config.CodeType, config.Spacing) -> list[tuple[tuple[int,...]|None,str|None,float]]
+    """
+    Encode text into a code stream.
+
+    Single line ends are ignored, a blank line becomes a paragraph ('=')
+    followed by a pause, and other control characters are not sent.
+    """
+    key = (wpm, cwpm, code_type, spacing)
+    stream = []
+    with _senders_guard:
+        # Senders are shared by everything encoding with the same settings.
+        sender = _senders.get(key)
+        if sender is None:
+            sender = morse.Sender(wpm=wpm, cwpm=cwpm, codeType=code_type, spacing=spacing)
+            _senders[key] = sender
+        sender.reset()
+        last_ch_was_nl = False  # If we get two NL in a row, insert a Paragraph.
+        inserted_para = False   # Track whether we inserted one.
+        for ch in text:
+            if ch < ' ':
+                if ch == '\r':
+                    # Just swallow RETURNs
+                    continue
+                if ch == '\n':
+                    if last_ch_was_nl:
+                        if not inserted_para:
+                            ch = '='
+                            inserted_para = True
+                        else:
+                            # Only do a single paragraph in a row.
+                            continue
+                    else:
+                        last_ch_was_nl = True
+                        continue
+                    pass
+                else:
+                    # don't send control characters
+                    last_ch_was_nl = False
+                    continue
+                pass
+            else:
+                last_ch_was_nl = False
+                inserted_para = False
+            code = sender.encode(ch)
+            stream.append((code, ch, code_secs(code)))
+            if inserted_para:
+                stream.append((None, None, PARAGRAPH_PAUSE))
+            pass
+    return stream
+
+def send(stream, emit, stop):
+    # type: (list[tuple[tuple[int,...]|None,str|None,float]], Callable[[tuple[int,...],str|None],None], Event) -> bool
+    """
+    Send a code stream by calling `emit(code, char)` for each code entry. Blocks
+    until the stream has been sent or `stop` is set.
+
+    Each entry is paced from the start time (so it doesn't drift) rather than
+    from when the previous one was sent. If an entry is late (the wire or
+    sounder was busy), don't try to catch up.
+
+    Return: True if the whole stream was sent.
+    """
+    t_due = time.monotonic()
+    for code, ch, secs in stream:
+        dt = t_due - time.monotonic()
+        if dt > 0 and stop.wait(dt):
+            return False
+        if stop.is_set():
+            return False
+        if code is not None:
+            emit(code, ch)
+        t_due = max(t_due + secs, time.monotonic())
+        pass
+    return True
+
+
+class FileCodeStream:
+    """
+    The code stream for a text file.
+
+    The compiled stream is kept until the file (modification time or size) or
+    the code settings (speed, spacing or code type) change.
+    """
+
+    def __init__(self, path):  # type: (str) -> None
+        self._path = path
+        self._key = None        # type: tuple|None
+        self._stream = []       # type: list[tuple[tuple[int,...]|None,str|None,float]]
+        return
+
+    @property
+    def path(self):  # type: () -> str
+        return self._path
+
+    def get(self, wpm, cwpm=0, code_type=config.CodeType.american, spacing=config.Spacing.char):
+        # type: (int, int, config.CodeType, config.Spacing) -> list[tuple[tuple[int,...]|None,str|None,float]]
+        """
+        Get the code stream for the file, compiling it if the file or the code
+        settings have changed.
+        """
+        st = os.stat(self._path)
+        key = (st.st_mtime_ns, st.st_size, wpm, cwpm, code_type, spacing)
+        if not key == self._key:
+            t_start = time.perf_counter()
+            with open(self._path, "r") as fp:
+                text = fp.read()
+            self._stream = encode_text(text, wpm, cwpm, code_type, spacing)
+            self._key = key
+            log.debugf("File '{}' compiled to {} entries in {:.1f}ms",
+                self._path, len(self._stream), (time.perf_counter() - t_start) * 1000.0, level=2)
+        return self._stream
+
+
+class RecordingCodeStream:
+    """
+    The code stream for a recording. Long pauses and sender changes are timed
+    from the recorded timestamps (the same way `Recorder` plays them back),
+    limited to `max_silence` seconds if it is greater than 0.
+
+    The compiled stream is kept until the file (modification time or size) changes.
+    """
+
+    def __init__(self, path, max_silence=0):  # type: (str, float) -> None
+        self._path = path
+        self._max_silence = max_silence
+        self._key = None        # type: tuple|None
+        self._stream = []       # type: list[tuple[tuple[int,...]|None,str|None,float]]
+        return
+
+    @property
+    def path(self):  # type: () -> str
+        return self._path
+
+    def _compile(self):  # type: () -> list[tuple[tuple[int,...]|None,str|None,float]]
+        stream = []
+        station = None
+        pblts = -1
+        for data in recorder.read_packets(self._path):
+            code = data['c']        # Code sequence
+            ts = data['ts']         # Timestamp
+            pts = pblts if pblts >= 0 else ts
+            pblts = ts
+            if code == []:  # Ignore empty code packets
+                continue
+            codePause = -code[0] / 1000.0
+            pause = 0
+            if codePause == 32.767 and len(code) > 1 and code[1] == 2:
+                # Probable sender change. See if it is...
+                if not data['s'] == station:
+                    pause = round((ts - pts) / 1000, 4)
+            elif codePause > 2.0 and codePause < 32.767:
+                # Long pause in sent code. Leave 2 seconds in the code.
+                pause = round((((ts - pts) / 1000) - 2.0), 4)
+                code[0] = -2000
+            station = data['s']
+            if pause > 0:
+                if self._max_silence > 0 and pause > self._max_silence:
+                    pause = self._max_silence
+                stream.append((None, None, pause))
+            code = tuple(code)
+            stream.append((code, None, code_secs(code)))
+        return stream
+
+    def get(self):  # type: () -> list[tuple[tuple[int,...]|None,str|None,float]]
+        """
+        Get the code stream for the recording, compiling it if the file has changed.
+        """
+        st = os.stat(self._path)
+        key = (st.st_mtime_ns, st.st_size)
+        if not key == self._key:
+            t_start = time.perf_counter()
+            self._stream = self._compile()
+            self._key = key
+            log.debugf("Recording '{}' compiled to {} entries in {:.1f}ms",
+                self._path, len(self._stream), (time.perf_counter() - t_start) * 1000.0, level=2)
+        return self._stream
@@ -40,16 +40,18 @@ Configuration/preference values are read/written to:
 
 The files are INI format with the values in a section named "PYKOB".
 
+The configuration is read when one of its values is first used (not when the
+module is imported), so modules that only need the types defined here (and
+tools that never use the configuration) don't pay for reading it. The command
+line override parsers are created when they are first used, and the version
+and host information is only gathered when system information is printed.
 """
-import argparse
 import configparser
-import getpass
 import os
-import platform
 import pykob
-import socket
 import sys
 from pykob.util import strtobool
+from threading import RLock
 from enum import IntEnum, unique
 from pykob import log, util
 
@@ -108,51 +110,66 @@ _WIRE_KEY = "WIRE"
 
 # Paths and Configurations
 app_config_dir = None
-app_config_file_path = None
-app_config = None
 user_config_dir = None
-user_config_file_path = None
-user_config = None
-
-# System information
-hostname = None
-os_name = None
-platform_name = None
-pyaudio_version = None
-pyserial_version = None
-python_version = None
-pykob_version = None
-system_name = None
-system_version = None
-user_home = None
-user_name = None
-
-# Machine/System Settings
-use_serial = True   # Indicates if serial should be used (prior only used None port value)
-serial_port = None
-use_gpio = False
-
-# User Settings
-audio_type = AudioType.SOUNDER
-auto_connect = False
-code_type = CodeType.american
-decode_at_detected = False
-logging_level = log.INFO_LEVEL
-interface_type = InterfaceType.loop
-invert_key_input = False
-local = True
-no_key_closer = False
-open_check_extend = False
-remote = True
-server_url = None
-sound = True
-sounder = False
-sounder_power_save = 0
-spacing = Spacing.none
-station = None
-wire = 0
-min_char_speed = 18
-text_speed = 18
+
+# Values that are set by `read_config` (when first used)
+_CONFIG_VALUES = frozenset((
+    "app_config_file_path", "app_config", "user_config_file_path", "user_config",
+    # System information
+    "os_name", "platform_name", "python_version", "pykob_version", "user_home", "user_name",
+    # Machine/System Settings
+    "use_serial", "serial_port", "use_gpio",
+    # User Settings
+    "audio_type", "auto_connect", "code_type", "decode_at_detected", "logging_level",
+    "interface_type", "invert_key_input", "local", "no_key_closer", "open_check_extend",
+    "remote", "server_url", "sound", "sounder", "sounder_power_save", "spacing", "station",
+    "wire", "min_char_speed", "text_speed",
+))
+# System information that is only gathered when needed (see `probe_system_info`)
+_SYSTEM_INFO = {
+    "hostname": "_probe_host",
+    "pyaudio_version": "_probe_pyaudio_version",
+    "pyserial_version": "_probe_pyserial_version",
+    "system_name": "_probe_host",
+    "system_version": "_probe_host",
+}
+# Command line override parsers (created by `_create_overrides`)
+_OVERRIDES = frozenset((
+    "audio_type_override", "auto_connect_override", "code_type_override", "decode_at_detected_override",
+    "interface_type_override", "invert_key_input_override", "local_override", "logging_level_override",
+    "min_char_speed_override", "no_key_closer_override", "open_check_extend_override", "remote_override",
+    "server_url_override", "use_serial_override", "serial_port_override", "use_gpio_override",
+    "sound_override", "sounder_override", "sounder_pwrsv_override", "spacing_override",
+    "station_override", "text_speed_override", "wire_override",
+))
+
+_config_read = False
+_config_reading = False  # True while read_config is running (on the thread holding the guard)
+_config_read_guard = RLock()
+
+def __getattr__(name):
+    """
+    Read the configuration (or gather the system information, or create the
+    override parsers) the first time one of the values is used.
+    """
+    if name in _CONFIG_VALUES:
+        _ensure_config_read()
+    elif name in _SYSTEM_INFO:
+        globals()[_SYSTEM_INFO[name]]()
+    elif name in _OVERRIDES:
+        _create_overrides()
+    else:
+        raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+    return globals()[name]
+
+def _ensure_config_read():
+    if not _config_read:
+        with _config_read_guard:
+            # Another thread may have completed the read while we waited. A call
+            # made from within read_config itself must not start a second read.
+            if not (_config_read or _config_reading):
+                read_config()
+    return
 
 def codeTypeFromString(s):
     """Return the CodeType for a string (A:AMERICAN|I:INTERNATIONAL). Raises a ValueError if not valid"""
@@ -168,6 +185,7 @@ def create_config_files_if_needed():
     global app_config_file_path
     global user_config_dir
     global user_config_file_path
+    _ensure_config_read()
 
     # Create the files if they don't exist
     if not os.path.isfile(user_config_file_path):
@@ -218,6 +236,7 @@ def set_audio_type(s):
         The value `T|TONE` will set the audio type to 'TONE'.
     """
     global audio_type
+    _ensure_config_read()
     audio_type = audio_type_from_str(s)
     user_config.set(_CONFIG_SECTION, _AUDIO_TYPE_KEY, audio_type.name.upper())
 
@@ -239,6 +258,7 @@ def set_auto_connect(s):
     """
 
     global auto_connect
+    _ensure_config_read()
     try:
         auto_connect = strtobool(str(s))
         user_config.set(_CONFIG_SECTION, _AUTO_CONNECT_KEY, util.on_off_from_bool(auto_connect))
@@ -277,6 +297,7 @@ def set_code_type(s):
         The value `I|INTERNATIONAL` will set the code type to 'International'.
     """
     global code_type
+    _ensure_config_read()
     code_type = code_type_from_str(s)
     user_config.set(_CONFIG_SECTION, _CODE_TYPE_KEY, code_type.name.upper())
 
@@ -288,6 +309,7 @@ def set_logging_level(s: str):
     s : str
         The debug level
     """
+    _ensure_config_read()
 
     try:
         _l = int(s)
@@ -301,6 +323,7 @@ def set_logging_level(s: str):
 
 def set_logging_level_int(level: int):
     global logging_level
+    _ensure_config_read()
     logging_level = level if level >=log.LOGGING_MIN_LEVEL else log.LOGGING_MIN_LEVEL
     user_config.set(_CONFIG_SECTION, _LOGGING_LEVEL_KEY, str(logging_level))
 
@@ -344,6 +367,7 @@ def set_decode_at_detected(b):
         will decode at the configured character speed.
     """
     global decode_at_detected
+    _ensure_config_read()
     try:
         decode_at_detected = strtobool(str(b))
         user_config.set(_CONFIG_SECTION, _DECODE_AT_DETECTED_KEY, util.on_off_from_bool(decode_at_detected))
@@ -363,6 +387,7 @@ def set_interface_type(s):
         The value `K|KEYER` will set the interface type to 'InterfaceType.keyer'.
     """
     global interface_type
+    _ensure_config_read()
     interface_type = interface_type_from_str(s)
     user_config.set(_CONFIG_SECTION, _INTERFACE_TYPE_KEY, interface_type.name.upper())
 
@@ -382,6 +407,7 @@ def set_invert_key_input(b):
         will enable key invert. Values of `NO`|`OFF`|`FALSE` will disable key invert.
     """
     global invert_key_input
+    _ensure_config_read()
     try:
         invert_key_input = strtobool(str(b))
         user_config.set(_CONFIG_SECTION, _INVERT_KEY_INPUT_KEY, util.on_off_from_bool(invert_key_input))
@@ -403,6 +429,7 @@ def set_local(l):
     """
 
     global local
+    _ensure_config_read()
     try:
         local = strtobool(str(l))
         user_config.set(_CONFIG_SECTION, _LOCAL_KEY, util.on_off_from_bool(local))
@@ -425,6 +452,7 @@ def set_min_char_speed(s: str):
     s : str
         The speed in words-per-minute as an interger string value
     """
+    _ensure_config_read()
 
     try:
         _speed = int(s)
@@ -435,6 +463,7 @@ def set_min_char_speed(s: str):
 
 def set_min_char_speed_int(si: int):
     global min_char_speed
+    _ensure_config_read()
     min_char_speed = si
     user_config.set(_CONFIG_SECTION, _MIN_CHAR_SPEED_KEY, str(min_char_speed))
 
@@ -451,6 +480,7 @@ def set_no_key_closer(b):
         will indicate the key has no closer. Values of `NO`|`OFF`|`FALSE` indicate a key with a closer.
     """
     global no_key_closer
+    _ensure_config_read()
     try:
         no_key_closer = strtobool(str(b))
         user_config.set(_CONFIG_SECTION, _NO_KEY_CLOSER_KEY, util.on_off_from_bool(no_key_closer))
@@ -473,6 +503,7 @@ def set_open_check_extend(b):
         will indicate the open time should be extended. Values of `NO`|`OFF`|`FALSE` indicate a normal test duration.
     """
     global open_check_extend
+    _ensure_config_read()
     try:
         open_check_extend = strtobool(str(b))
         user_config.set(_CONFIG_SECTION, _OPEN_CHECK_EXTEND_KEY, util.on_off_from_bool(open_check_extend))
@@ -494,6 +525,7 @@ def set_remote(r):
         will enable remote send. Values of `NO`|`OFF`|`FALSE` will disable remote send.
     """
     global remote
+    _ensure_config_read()
     try:
         remote = strtobool(str(r))
         user_config.set(_CONFIG_SECTION, _REMOTE_KEY, util.on_off_from_bool(remote))
@@ -517,6 +549,7 @@ def set_use_serial(s):
     """
 
     global use_serial
+    _ensure_config_read()
     try:
         use_serial = strtobool(str(s))
         if use_serial:
@@ -538,6 +571,7 @@ def set_serial_port(p):
     """
 
     global serial_port
+    _ensure_config_read()
     serial_port = util.str_none_or_value(p)
     if serial_port is None:
         set_use_serial(False)
@@ -559,6 +593,7 @@ def set_use_gpio(s):
     """
 
     global use_gpio
+    _ensure_config_read()
     try:
         use_gpio = strtobool(str(s))
         if use_gpio:
@@ -578,6 +613,7 @@ def set_server_url(s):
     """
 
     global server_url
+    _ensure_config_read()
     server_url = util.str_none_or_value(s)
     if server_url and server_url.upper() == 'DEFAULT':
         server_url = None
@@ -597,6 +633,7 @@ def set_sound(s):
     """
 
     global sound
+    _ensure_config_read()
     try:
         sound = strtobool(str(s))
         user_config.set(_CONFIG_SECTION, _SOUND_KEY, util.on_off_from_bool(sound))
@@ -619,6 +656,7 @@ def set_sounder(s):
     """
 
     global sounder
+    _ensure_config_read()
     try:
         sounder = strtobool(str(s))
         user_config.set(_CONFIG_SECTION, _SOUNDER_KEY, util.on_off_from_bool(sounder))
@@ -639,6 +677,7 @@ def set_sounder_power_save(s):
     """
 
     global sounder_power_save
+    _ensure_config_read()
     try:
         _seconds = int(s)
         sounder_power_save = _seconds if _seconds >= 0 else 0
@@ -690,6 +729,7 @@ def set_spacing(s):
         The value `W|WORD` will set the spacing to `Spacing.word`.
     """
     global spacing
+    _ensure_config_read()
     spacing = spacing_from_str(s)
     user_config.set(_CONFIG_SECTION, _SPACING_KEY, spacing.name.upper())
 
@@ -704,6 +744,7 @@ def set_station(s):
     """
 
     global station
+    _ensure_config_read()
     station = util.str_none_or_value(s)
     user_config.set(_CONFIG_SECTION, _STATION_KEY, station)
 
@@ -715,6 +756,7 @@ def set_wire(w: str):
     w : str
         The Wire number
     """
+    _ensure_config_read()
 
     try:
         _wire = int(w)
@@ -725,6 +767,7 @@ def set_wire(w: str):
 
 def set_wire_int(w: int):
     global wire
+    _ensure_config_read()
     wire = w
     user_config.set(_CONFIG_SECTION, _WIRE_KEY, str(w))
 
@@ -736,6 +779,7 @@ def set_text_speed(s: str):
     s : str
         The text speed in words-per-minute as an interger string value
     """
+    _ensure_config_read()
     try:
         _speed = int(s)
         set_text_speed_int(_speed)
@@ -745,6 +789,7 @@ def set_text_speed(s: str):
 
 def set_text_speed_int(s: int):
     global text_speed
+    _ensure_config_read()
     text_speed = s
     user_config.set(_CONFIG_SECTION, _TEXT_SPEED_KEY, str(text_speed))
 
@@ -755,9 +800,46 @@ def print_info():
     print_system_info()
     print_config()
 
+def _probe_host():
+    global hostname
+    global system_name
+    global system_version
+
+    import platform
+    import socket
+    system_name = platform.system()
+    system_version = platform.release()
+    hostname = socket.gethostname()
+
+def _probe_pyaudio_version():
+    global pyaudio_version
+    try:
+        import pyaudio
+        pyaudio_version = pyaudio.__version__ # NOTE: Using '__" property - not recommended, but only way to get version
+    except:
+        pyaudio_version = "PyAudio is not installed or the version information is not available (check installation)"
+
+def _probe_pyserial_version():
+    global pyserial_version
+    try:
+        import serial
+        pyserial_version = serial.VERSION
+    except:
+        pyserial_version = "PySerial is not installed or the version information is not available (check installation)"
+
+def probe_system_info():
+    """Gather the host, system, and PyAudio/PySerial version information
+    (only done when needed, as loading the modules to get the versions is slow)
+    """
+    _probe_host()
+    _probe_pyaudio_version()
+    _probe_pyserial_version()
+
 def print_system_info():
     """Print system information
     """
+    _ensure_config_read()
+    probe_system_info()
 
     print("User:", user_name)
     print("User Home Path:", user_home)
@@ -776,6 +858,7 @@ def print_system_info():
 def print_config():
     """Print the PyKOB configuration
     """
+    _ensure_config_read()
     url = util.str_none_or_value(server_url)
     url = url if url else ''
     print("======================================")
@@ -809,6 +892,7 @@ def save_config():
     """Save (write) the configuration values out to the user and
     system/machine config files.
     """
+    _ensure_config_read()
 
     create_config_files_if_needed()
     with open(user_config_file_path, 'w') as configfile:
@@ -818,17 +902,26 @@ def save_config():
 
 def read_config():
     """Read the configuration values from the user and machine config files.
+
+    The values are only marked as read once the read completes successfully.
     """
+    global _config_read
+    global _config_reading
 
-    global hostname
+    with _config_read_guard:
+        _config_reading = True
+        try:
+            _read_config()
+            _config_read = True
+        finally:
+            _config_reading = False
+    return
+
+def _read_config():
     global platform_name
     global os_name
     global pykob_version
     global python_version
-    global pyaudio_version
-    global pyserial_version
-    global system_name
-    global system_version
     global app_config
     global app_config_dir
     global app_config_file_path
@@ -863,6 +956,7 @@ def read_config():
     global wire
     global text_speed
 
+    import getpass
     # Get the system data
     try:
         try:
@@ -876,22 +970,9 @@ def read_config():
                 user_name = "root"
         user_home = os.path.expanduser('~')
         os_name = os.name
-        system_name = platform.system()
-        system_version = platform.release()
         platform_name = sys.platform
         pykob_version = pykob.VERSION
         python_version = "{}.{}.{}".format(sys.version_info.major, sys.version_info.minor, sys.version_info.micro)
-        try:
-            import pyaudio
-            pyaudio_version = pyaudio.__version__ # NOTE: Using '__" property - not recommended, but only way to get version
-        except:
-            pyaudio_version = "PyAudio is not installed or the version information is not available (check installation)"
-        try:
-            import serial
-            pyserial_version = serial.VERSION
-        except:
-            pyserial_version = "PySerial is not installed or the version information is not available (check installation)"
-        hostname = socket.gethostname()
 
         # User configuration file name
         userConfigFileName = "config2-{}.ini".format(user_name)
@@ -959,6 +1040,9 @@ def read_config():
     user_config.read(user_config_file_path)
     app_config.read(app_config_file_path)
 
+    server_url = None
+    station = None
+    wire = 0
     try:
         ###
         # Get the System (App) config values
@@ -1088,176 +1172,233 @@ def read_config():
         log.err("{} option value '{}' is not a valid value. INI file key: {}.".format(__option, ex.args[0], __key))
         raise
 
-# ### Mainline
-read_config()
-
-audio_type_override = argparse.ArgumentParser(add_help=False)
-audio_type_override.add_argument(
-    "-Z",
-    "--audiotype",
-    default=audio_type.name.upper(),
-    help="The audio type (SOUNDER|TONE) to use.",
-    metavar="audio-type",
-    dest="audio_type",
-)
-
-auto_connect_override = argparse.ArgumentParser(add_help=False)
-auto_connect_override.add_argument("-C", "--autoconnect", default="ON" if auto_connect else "OFF",
-choices=["ON", "On", "on", "YES", "Yes", "yes", "OFF", "Off", "off", "NO", "No", "no"],
-help="'ON' or 'OFF' to indicate whether an application should automatically connect to a configured wire.",
-metavar="auto-connect", dest="auto_connect")
-
-code_type_override = argparse.ArgumentParser(add_help=False)
-code_type_override.add_argument("-T", "--type", default=code_type.name.upper(),
-help="The code type (AMERICAN|INTERNATIONAL) to use.", metavar="code-type", dest="code_type")
-
-decode_at_detected_override = argparse.ArgumentParser(add_help=False)
-decode_at_detected_override.add_argument("-D", "--decode-at-detected", default=decode_at_detected,
-help="True/False to Enable/Disable decoding Morse at the detected speed.", metavar="use-detected-speed", dest="decode_at_detected")
-
-interface_type_override = argparse.ArgumentParser(add_help=False)
-interface_type_override.add_argument("-I", "--interface", default=interface_type.name.upper(),
-help="The interface type (KEY_SOUNDER|LOOP|KEYER) to use.", metavar="interface-type", dest="interface_type")
-
-invert_key_input_override = argparse.ArgumentParser(add_help=False)
-invert_key_input_override.add_argument("-M", "--iki", default=invert_key_input,
-help="True/False to Enable/Disable inverting the key input signal (used for dial-up/modem connections).", metavar="invert-key-input", dest="invert_key_input")
-
-local_override = argparse.ArgumentParser(add_help=False)
-local_override.add_argument(
-    "-L",
-    "--local",
-    default=local,
-    help="'ON' or 'OFF' to Enable/Disable sounding of local code.",
-    metavar="local-copy",
-    dest="local",
-)
-
-logging_level_override = argparse.ArgumentParser(add_help=False)
-logging_level_override.add_argument(
-    "--logging-level",
-    metavar="logging-level",
-    dest="logging_level",
-    type=int,
-    help="Logging level. A value of '0' disables DEBUG output, '-1' disables INFO, '-2' disables WARN, '-3' disables ERROR. Higher values above '0' enable more DEBUG output."
-)
-
-min_char_speed_override = argparse.ArgumentParser(add_help=False)
-min_char_speed_override.add_argument("-c", "--charspeed", default=min_char_speed, type=int,
-help="The minimum character speed to use in words per minute (used for Farnsworth timing).",
-metavar="wpm", dest="min_char_speed")
-
-no_key_closer_override = argparse.ArgumentParser(add_help=False)
-no_key_closer_override.add_argument(
-    "-X",
-    "--no-key-closer",
-    default=no_key_closer,
-    help="'TRUE' or 'FALSE' to indicate if the physical key does not have a closer.",
-    metavar="no-closer",
-    dest="no_key_closer",
-)
-
-open_check_extend_override = argparse.ArgumentParser(add_help=False)
-open_check_extend_override.add_argument(
-    "-O",
-    "--open-check-extend",
-    default=open_check_extend,
-    help="'TRUE' or 'FALSE' to indicate if the Key Open check time should be extended.",
-    metavar="extend",
-    dest="open_check_extend",
-)
-
-remote_override = argparse.ArgumentParser(add_help=False)
-remote_override.add_argument(
-    "-R",
-    "--remote",
-    default=remote,
-    help="'ON' or 'OFF' to Enable/Disable sending code to the connected wire (internet).",
-    metavar="remote-send",
-    dest="remote",
-)
-
-server_url_override = argparse.ArgumentParser(add_help=False)
-server_url_override.add_argument("-U", "--url", default=server_url,
-help="The KOB Server URL to use (or 'NONE' to use the default).", metavar="url", dest="server_url")
-
-use_serial_override = argparse.ArgumentParser(add_help=False)
-use_serial_override.add_argument(
-    "-P",
-    "--serial",
-    default="ON" if use_serial else "OFF",
-    choices=["ON","On","on","YES","Yes","yes","OFF","Off","off","NO","No","no"],
-    help="'ON' or 'OFF' to indicate whether a Serial key/sounder interface should be used.\
- GPIO takes priority over the Serial interface if both are specified.",
-    metavar="serial",
-    dest="use_serial",
-)
-
-serial_port_override = argparse.ArgumentParser(add_help=False)
-serial_port_override.add_argument(
-    "-p",
-    "--port",
-    default=serial_port,
-    help="The name/ID of the serial port to use, or the special value 'SDIF' to try to find a SilkyDESIGN-Interface, or 'NONE'.",
-    metavar="portname",
-    dest="serial_port"
-)
-
-use_gpio_override = argparse.ArgumentParser(add_help=False)
-use_gpio_override.add_argument(
-    "-g",
-    "--gpio",
-    default="ON" if use_gpio else "OFF",
-    choices=["ON","On","on","YES","Yes","yes","OFF","Off","off","NO","No","no"],
-    help="'ON' or 'OFF' to indicate whether GPIO (Raspberry Pi) key/sounder interface should be used.\
- GPIO takes priority over the Serial interface if both are specified.",
-    metavar="gpio",
-    dest="use_gpio",
-)
-
-sound_override = argparse.ArgumentParser(add_help=False)
-sound_override.add_argument("-a", "--sound", default="ON" if sound else "OFF",
-choices=["ON", "On", "on", "YES", "Yes", "yes", "OFF", "Off", "off", "NO", "No", "no"],
-help="'ON' or 'OFF' to indicate whether computer audio should be used to sound code.",
-metavar="sound", dest="sound")
-
-sounder_override = argparse.ArgumentParser(add_help=False)
-sounder_override.add_argument("-A", "--sounder", default="ON" if sounder else "OFF",
-choices=["ON", "On", "on", "YES", "Yes", "yes", "OFF", "Off", "off", "NO", "No", "no"],
-help="'ON' or 'OFF' to indicate whether to use sounder if 'gpio' or `port` is configured.",
-metavar="sounder", dest="sounder")
-
-sounder_pwrsv_override = argparse.ArgumentParser(add_help=False)
-sounder_pwrsv_override.add_argument("--power-save", "--pwrsv", default=sounder_power_save, type=int,
-help="The sounder power-save delay in seconds, or '0' to disable power-save.",
-metavar="seconds", dest="sounder_power_save")
-
-spacing_override = argparse.ArgumentParser(add_help=False)
-spacing_override.add_argument(
-    "-s",
-    "--spacing",
-    default=spacing.name.upper(),
-    help="Where to add spacing for Farnsworth (NONE|CHAR|WORD).",
-    metavar="spacing",
-    dest="spacing",
-)
-
-station_override = argparse.ArgumentParser(add_help=False)
-station_override.add_argument("-S", "--station", default=station,
-help="The Station ID to use (or 'NONE').", metavar="station", dest="station")
-
-text_speed_override = argparse.ArgumentParser(add_help=False)
-text_speed_override.add_argument(
-    "-t",
-    "--textspeed",
-    default=text_speed,
-    type=int,
-    help="The morse text speed in words per minute. Used for Farnsworth timing. "
-    + "Spacing must not be 'NONE' to enable Farnsworth.",
-    metavar="wpm",
-    dest="text_speed",
-)
-
-wire_override = argparse.ArgumentParser(add_help=False)
-wire_override.add_argument("-W", "--wire", default=wire,
-help="The Wire to use (or 'NONE').", metavar="wire", dest="wire")
+def _create_overrides():
+    """Create the command line override parsers (the defaults are the configured values)
+    """
+    global audio_type_override
+    global auto_connect_override
+    global code_type_override
+    global decode_at_detected_override
+    global interface_type_override
+    global invert_key_input_override
+    global local_override
+    global logging_level_override
+    global min_char_speed_override
+    global no_key_closer_override
+    global open_check_extend_override
+    global remote_override
+    global server_url_override
+    global use_serial_override
+    global serial_port_override
+    global use_gpio_override
+    global sound_override
+    global sounder_override
+    global sounder_pwrsv_override
+    global spacing_override
+    global station_override
+    global text_speed_override
+    global wire_override
+
+    import argparse
+    _ensure_config_read()
+
+    audio_type_override = argparse.ArgumentParser(add_help=False)
+    audio_type_override.add_argument(
+        "-Z",
+        "--audiotype",
+        default=audio_type.name.upper(),
+        help="The audio type (SOUNDER|TONE) to use.",
+        metavar="audio-type",
+        dest="audio_type",
+    )
+
+    auto_connect_override = argparse.ArgumentParser(add_help=False)
+    auto_connect_override.add_argument("-C", "--autoconnect", default="ON" if auto_connect else "OFF",
+    choices=["ON", "On", "on", "YES", "Yes", "yes", "OFF", "Off", "off", "NO", "No", "no"],
+    help="'ON' or 'OFF' to indicate whether an application should automatically connect to a configured wire.",
+    metavar="auto-connect", dest="auto_connect")
+
+    code_type_override = argparse.ArgumentParser(add_help=False)
+    code_type_override.add_argument("-T", "--type", default=code_type.name.upper(),
+    help="The code type (AMERICAN|INTERNATIONAL) to use.", metavar="code-type", dest="code_type")
+
+    decode_at_detected_override = argparse.ArgumentParser(add_help=False)
+    decode_at_detected_override.add_argument("-D", "--decode-at-detected", default=decode_at_detected,
+    help="True/False to Enable/Disable decoding Morse at the detected speed.", metavar="use-detected-speed", dest="decode_at_detected")
+
+    interface_type_override = argparse.ArgumentParser(add_help=False)
+    interface_type_override.add_argument("-I", "--interface", default=interface_type.name.upper(),
+    help="The interface type (KEY_SOUNDER|LOOP|KEYER) to use.", metavar="interface-type", dest="interface_type")
+
+    invert_key_input_override = argparse.ArgumentParser(add_help=False)
+    invert_key_input_override.add_argument("-M", "--iki", default=invert_key_input,
+    help="True/False to Enable/Disable inverting the key input signal (used for dial-up/modem connections).", metavar="invert-key-input", dest="invert_key_input")
+
+    local_override = argparse.ArgumentParser(add_help=False)
+    local_override.add_argument(
+        "-L",
+        "--local",
+        default=local,
+        help="'ON' or 'OFF' to Enable/Disable sounding of local code.",
+        metavar="local-copy",
+        dest="local",
+    )
+
+    logging_level_override = argparse.ArgumentParser(add_help=False)
+    logging_level_override.add_argument(
+        "--logging-level",
+        metavar="logging-level",
+        dest="logging_level",
+        type=int,
+        help="Logging level. A value of '0' disables DEBUG output, '-1' disables INFO, '-2' disables WARN, '-3' disables ERROR. Higher values above '0' enable more DEBUG output."
+    )
+
+    min_char_speed_override = argparse.ArgumentParser(add_help=False)
+    min_char_speed_override.add_argument("-c", "--charspeed", default=min_char_speed, type=int,
+    help="The minimum character speed to use in words per minute (used for Farnsworth timing).",
+    metavar="wpm", dest="min_char_speed")
+
+    no_key_closer_override = argparse.ArgumentParser(add_help=False)
+    no_key_closer_override.add_argument(
+        "-X",
+        "--no-key-closer",
+        default=no_key_closer,
+        help="'TRUE' or 'FALSE' to indicate if the physical key does not have a closer.",
+        metavar="no-closer",
+        dest="no_key_closer",
+    )
+
+    open_check_extend_override = argparse.ArgumentParser(add_help=False)
+    open_check_extend_override.add_argument(
+        "-O",
+        "--open-check-extend",
+        default=open_check_extend,
+        help="'TRUE' or 'FALSE' to indicate if the Key Open check time should be extended.",
+        metavar="extend",
+        dest="open_check_extend",
+    )
+
+    remote_override = argparse.ArgumentParser(add_help=False)
+    remote_override.add_argument(
+        "-R",
+        "--remote",
+        default=remote,
+        help="'ON' or 'OFF' to Enable/Disable sending code to the connected wire (internet).",
+        metavar="remote-send",
+        dest="remote",
+    )
+
+    server_url_override = argparse.ArgumentParser(add_help=False)
+    server_url_override.add_argument("-U", "--url", default=server_url,
+    help="The KOB Server URL to use (or 'NONE' to use the default).", metavar="url", dest="server_url")
+
+    use_serial_override = argparse.ArgumentParser(add_help=False)
+    use_serial_override.add_argument(
+        "-P",
+        "--serial",
+        default="ON" if use_serial else "OFF",
+        choices=["ON","On","on","YES","Yes","yes","OFF","Off","off","NO","No","no"],
+        help="'ON' or 'OFF' to indicate whether a Serial key/sounder interface should be used.\
+     GPIO takes priority over the Serial interface if both are specified.",
+        metavar="serial",
+        dest="use_serial",
+    )
+
+    serial_port_override = argparse.ArgumentParser(add_help=False)
+    serial_port_override.add_argument(
+        "-p",
+        "--port",
+        default=serial_port,
+        help="The name/ID of the serial port to use, or the special value 'SDIF' to try to find a SilkyDESIGN-Interface, or 'NONE'.",
+        metavar="portname",
+        dest="serial_port"
+    )
+
+    use_gpio_override = argparse.ArgumentParser(add_help=False)
+    use_gpio_override.add_argument(
+        "-g",
+        "--gpio",
+        default="ON" if use_gpio else "OFF",
+        choices=["ON","On","on","YES","Yes","yes","OFF","Off","off","NO","No","no"],
+        help="'ON' or 'OFF' to indicate whether GPIO (Raspberry Pi) key/sounder interface should be used.\
+     GPIO takes priority over the Serial interface if both are specified.",
+        metavar="gpio",
+        dest="use_gpio",
+    )
+
+    sound_override = argparse.ArgumentParser(add_help=False)
+    sound_override.add_argument("-a", "--sound", default="ON" if sound else "OFF",
+    choices=["ON", "On", "on", "YES", "Yes", "yes", "OFF", "Off", "off", "NO", "No", "no"],
+    help="'ON' or 'OFF' to indicate whether computer audio should be used to sound code.",
+    metavar="sound", dest="sound")
+
+    sounder_override = argparse.ArgumentParser(add_help=False)
+    sounder_override.add_argument("-A", "--sounder", default="ON" if sounder else "OFF",
+    choices=["ON", "On", "on", "YES", "Yes", "yes", "OFF", "Off", "off", "NO", "No", "no"],
+    help="'ON' or 'OFF' to indicate whether to use sounder if 'gpio' or `port` is configured.",
+    metavar="sounder", dest="sounder")
+
+    sounder_pwrsv_override = argparse.ArgumentParser(add_help=False)
+    sounder_pwrsv_override.add_argument("--power-save", "--pwrsv", default=sounder_power_save, type=int,
+    help="The sounder power-save delay in seconds, or '0' to disable power-save.",
+    metavar="seconds", dest="sounder_power_save")
+
+    spacing_override = argparse.ArgumentParser(add_help=False)
+    spacing_override.add_argument(
+        "-s",
+        "--spacing",
+        default=spacing.name.upper(),
+        help="Where to add spacing for Farnsworth (NONE|CHAR|WORD).",
+        metavar="spacing",
+        dest="spacing",
+    )
+
+    station_override = argparse.ArgumentParser(add_help=False)
+    station_override.add_argument("-S", "--station", default=station,
+    help="The Station ID to use (or 'NONE').", metavar="station", dest="station")
+
+    text_speed_override = argparse.ArgumentParser(add_help=False)
+    text_speed_override.add_argument(
+        "-t",
+        "--textspeed",
+        default=text_speed,
+        type=int,
+        help="The morse text speed in words per minute. Used for Farnsworth timing. "
+        + "Spacing must not be 'NONE' to enable Farnsworth.",
+        metavar="wpm",
+        dest="text_speed",
+    )
+
+    wire_override = argparse.ArgumentParser(add_help=False)
+    wire_override.add_argument("-W", "--wire", default=wire,
+    help="The Wire to use (or 'NONE').", metavar="wire", dest="wire")
+
+"""
+Test code
+"""
+if __name__ == "__main__":
+    # Self-test: Check the time it takes to import the module (and `morse`, which
+    # uses it) against a budget, using the Python `-X importtime` option.
+    import subprocess
+    from pathlib import Path
+
+    IMPORT_BUDGET_MS = 50.0
+    modules = ("pykob.config", "pykob.morse")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "; ".join("import " + m for m in modules)],
+        cwd=Path(__file__).parent.parent, capture_output=True, text=True)
+    times = {}  # module: (self us, cumulative us)
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and not "self [us]" in line:
+            t_self, t_cum, name = line[len("import time:"):].split("|")
+            times[name.strip()] = (int(t_self), int(t_cum))
+    total_ms = sum(times[m][1] for m in modules if m in times) / 1000.0
+    for m in modules:
+        if m in times:
+            print("{}: {:.1f}ms (self {:.1f}ms)".format(m, times[m][1] / 1000.0, times[m][0] / 1000.0))
+    print("Slowest (self):")
+    for name, t in sorted(times.items(), key=lambda item: item[1][0], reverse=True)[:5]:
+        print("  {:.1f}ms {}".format(t[0] / 1000.0, name))
+    ok = total_ms <= IMPORT_BUDGET_MS
+    print("Import time {:.1f}ms, budget {:.1f}ms: {}".format(total_ms, IMPORT_BUDGET_MS, "PASS" if ok else "FAIL"))
+    sys.exit(0 if ok else 1)
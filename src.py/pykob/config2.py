@@ -43,9 +43,11 @@ from json import JSONDecodeError
 import os.path
 from pathlib import Path
 import sys
+from threading import Lock
+import time
 from typing import Any, Callable, Optional
 
-from pykob import config, log, util
+from pykob import config, log, scheduler, util
 from pykob.config import AudioType, CodeType, InterfaceType, Spacing
 from pykob.util import strtobool
 
@@ -53,6 +55,9 @@ PYKOB_CFG_EXT = ".pkcfg"
 VERSION = "2.2.0"
 _PYKOB_CFG_VERSION_KEY = "PYKOB_CFG_VERSION"
 
+NOTIFY_DEBOUNCE = 0.05  # Seconds to collect setting changes into one notification
+NOTIFY_SLOW_LISTENER = 0.05  # Listener run time (seconds) logged at a higher priority
+
 # SPECIAL Configuration Path values
 """ Use the user's global (non-named) configuration """
 CONFIG_PATH_GLOBAL = "GLOBAL"
@@ -98,7 +103,7 @@ class Config:
             x = x - 1
             self._pause_notify = x
             if x == 0:
-                self._notify_listeners()
+                self.flush_notifications()
         else:
             self._pause_notify = 0  # Fix erronious value
         return False  # Don't supress exceptions
@@ -211,6 +216,11 @@ class Config:
         self._saved_chng = False
         # type: int
         self._pause_notify = 0
+        # type: float
+        self._notify_debounce = NOTIFY_DEBOUNCE
+        # type: Optional[scheduler.Job]
+        self._notify_job = None
+        self._notify_lock = Lock()
         #
         # Our operational values
         self._dirty = False
@@ -247,33 +257,90 @@ class Config:
             config._LOGGING_LEVEL_KEY: self._set_logging_level
         }
         #
-        # Listeners is a dictionary of Callable(int) keys and int (ChangeType...) values.
-        # type: dict[Callable[[int],None],int]
+        # Listeners is a dictionary of Callable(int) keys and tuple of int (ChangeType...)
+        # and the optional dispatcher used to run the listener (for example, a Tk 'after_idle').
+        # type: dict[Callable[[int],None],tuple[int,Optional[Callable[[Callable[[],None]],Any]]]]
         self._change_listeners = {}  # Start out empty
         return
 
+    def _call_listener(self, listener:Callable[[int],None], ct:int) -> None:
+        """
+        Call a listener, logging how long it took.
+        """
+        t_start = time.perf_counter()
+        try:
+            listener(ct)
+        except Exception as ex:
+            log.error("Config change listener {} error: {}".format(listener, ex))
+        t_run = time.perf_counter() - t_start
+        level = 1 if t_run > NOTIFY_SLOW_LISTENER else 3
+        log.debug("Config change listener {} ({}) took {:.1f}ms".format(
+            getattr(listener, "__qualname__", listener), ct, t_run * 1000.0), level)
+        return
+
+    def _job_notify_body(self):
+        """
+        Debounce time has passed. Send the collected notifications.
+        """
+        with self._notify_lock:
+            self._notify_job = None
+        if self._pause_notify > 0:
+            return  # The transaction will flush when it completes
+        self.flush_notifications()
+        return
+
     def _notify_listeners(self):
         """
-        Notify interested parties of changes
+        Notify interested parties of changes.
+
+        Changes are collected while notification is paused (a transaction) and
+        for `notify_debounce` seconds after the first change, and then sent as a
+        single notification from the shared scheduler thread.
         """
         if self._pause_notify > 0:
             return
-        # Collect all of the change types
-        ct = ChangeType.NONE
-        if self._hw_chng:
-            ct = ct | ChangeType.HARDWARE
-        if self._morse_chng:
-            ct = ct | ChangeType.MORSE
-        if self._ops_chng:
-            ct = ct | ChangeType.OPERATIONS
-        if self._saved_chng:
-            ct = ct | ChangeType.SAVE
-        if not ct == ChangeType.NONE:
-            for listener, change_types in self._change_listeners.items():
-                if not ((ct & change_types) == 0):
-                    # Call the listener with the change types
-                    listener(ct)
-        self.clear_pending_notifications()
+        if len(self._change_listeners) == 0 or self._notify_debounce <= 0.0:
+            self.flush_notifications()
+            return
+        with self._notify_lock:
+            if self._notify_job is None:
+                self._notify_job = scheduler.shared().once(
+                    "Config-Notify", self._notify_debounce, self._job_notify_body
+                )
+        return
+
+    def flush_notifications(self):
+        """
+        Send any pending change notifications now (rather than waiting for the debounce time).
+        """
+        with self._notify_lock:
+            if self._notify_job:
+                self._notify_job.cancel()
+                self._notify_job = None
+            # Collect all of the change types
+            ct = ChangeType.NONE
+            if self._hw_chng:
+                ct = ct | ChangeType.HARDWARE
+            if self._morse_chng:
+                ct = ct | ChangeType.MORSE
+            if self._ops_chng:
+                ct = ct | ChangeType.OPERATIONS
+            if self._saved_chng:
+                ct = ct | ChangeType.SAVE
+            self.clear_pending_notifications()
+            listeners = list(self._change_listeners.items())
+        if ct == ChangeType.NONE:
+            return
+        for listener, (change_types, dispatcher) in listeners:
+            if not ((ct & change_types) == 0):
+                # Call the listener with the change types
+                if dispatcher:
+                    try:
+                        dispatcher(lambda l=listener: self._call_listener(l, ct))
+                    except Exception as ex:
+                        log.debug("Config change listener {} dispatch failed: {}".format(listener, ex), 2)
+                else:
+                    self._call_listener(listener, ct)
         return
 
     def _changed_hw(self):
@@ -312,6 +379,18 @@ class Config:
     def version_loaded(self) -> Optional[str]:
         return self._version_loaded
 
+    @property
+    def notify_debounce(self) -> float:
+        """
+        Seconds to collect setting changes before notifying listeners (0 to notify immediately).
+        """
+        return self._notify_debounce
+
+    @notify_debounce.setter
+    def notify_debounce(self, secs: float) -> None:
+        self._notify_debounce = secs if secs > 0.0 else 0.0
+        return
+
     # ########################################################################
     # Hardware Settings
     #
@@ -1310,7 +1389,12 @@ class Config:
         print("Logging level: {}".format(self._logging_level), file=f)
         return
 
-    def register_listener(self, listener:Callable[[int],None], change_types: int) -> None:
+    def register_listener(
+            self,
+            listener:Callable[[int],None],
+            change_types: int,
+            dispatcher:Optional[Callable[[Callable[[],None]],Any]]=None
+        ) -> None:
         """
         Register a change listener to be notified of changes to settings of a given type.
 
@@ -1320,18 +1404,25 @@ class Config:
         parameter indicating all of the types that have changed.
 
         change_types : int value comprised of one or more ChangeType values (or'ed together)
+        dispatcher : Optional callable that is given a no-argument function to run the
+                     listener on a different thread/loop (for example, a Tk root 'after_idle').
+                     If None, the listener is called on the thread sending the notification.
         """
-        # Get the change types for the listener if it is already registered.
-        ct = 0
-        if listener in self._change_listeners:
-            ct = self._change_listeners[listener]
-        ct = ct | change_types  # Merge in the requested types
-        self._change_listeners[listener] = ct
+        with self._notify_lock:
+            # Get the change types for the listener if it is already registered.
+            ct = 0
+            if listener in self._change_listeners:
+                ct, current_dispatcher = self._change_listeners[listener]
+                if dispatcher is None:
+                    dispatcher = current_dispatcher
+            ct = ct | change_types  # Merge in the requested types
+            self._change_listeners[listener] = (ct, dispatcher)
         return
 
     def remove_listener(self, listener:Callable[[int],None]) -> None:
-        if listener in self._change_listeners:
-            del self._change_listeners[listener]
+        with self._notify_lock:
+            if listener in self._change_listeners:
+                del self._change_listeners[listener]
         return
 
     def restore_config(self, clear_dirty:bool=True):
@@ -36,7 +36,7 @@ from threading import Event, Lock, Thread
 import time
 from typing import Any, Callable, Optional
 
-from pykob import VERSION, config2, log, util
+from pykob import VERSION, config2, log, metrics, scheduler, trace, util
 from pykob.config2 import Config
 
 HOST_DEFAULT = "mtc-kob.dyndns.org"
@@ -53,9 +53,106 @@ shortPacketFormat = struct.Struct("<hh")  # cmd, wire
 idPacketFormat = struct.Struct("<hh 128s 4x i i 8x 208x 128s 8x")  # cmd, byts, id, seq, idflag, ver
 codePacketFormat = struct.Struct("<hh 128s 4x i 12x 51i i 128s 8x")  # cmd, byts, id, seq, code list, n, txt
 
+_m_rcvd = metrics.counter("pykob_internet_packets_received_total", "Packets received from the KOB server.")
+_m_sent_code = metrics.counter("pykob_internet_packets_sent_total", "Packets sent to the KOB server.", {"type": "code"})
+_m_sent_id = metrics.counter("pykob_internet_packets_sent_total", "Packets sent to the KOB server.", {"type": "id"})
+
+MUX_WAIT = 5.0  # Longest the multiplexer waits before checking its sockets again
+
+class Multiplexer:
+    """
+    Reads the sockets of many `Internet` instances with a single thread, for
+    applications (like the FeedServer) that connect to many wires. Pass it as
+    the `mux` of each `Internet`, instead of each one having a read thread.
+    """
+    def __init__(self):
+        self._inets = set()  # type: set[Internet]
+        self._guard: Lock = Lock()
+        self._shutdown: Event = Event()
+        # Writing to the wake socket makes the thread pick up socket changes.
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._thread_mux: Thread = Thread(name="Internet-Mux", daemon=True, target=self._thread_mux_body)
+        self._thread_mux.start()
+        return
+
+    def _thread_mux_body(self):
+        """
+        Called by the Internet Multiplexer thread `run` to read code from all
+        of the registered connections.
+        """
+        while not self._shutdown.is_set():
+            skts = {}
+            with self._guard:
+                for inet in self._inets:
+                    skt = inet._socket
+                    if skt is not None and inet.connected:
+                        skts[skt] = inet
+            try:
+                ready, _, _ = select.select([self._wake_r, *skts], [], [], MUX_WAIT)
+            except (OSError, ValueError):
+                # A socket was closed while we were waiting. Try again with the current ones.
+                continue
+            for skt in ready:
+                if skt is self._wake_r:
+                    try:
+                        while self._wake_r.recv(64):
+                            pass
+                    except (BlockingIOError, OSError):
+                        pass
+                    continue
+                skts[skt]._read_ready(skt)
+            pass
+        log.debug("{} thread done.".format(threading.current_thread().name))
+        return
+
+    def add(self, inet):  # type: (Internet) -> None
+        with self._guard:
+            self._inets.add(inet)
+        self.wake()
+        return
+
+    def remove(self, inet):  # type: (Internet) -> None
+        with self._guard:
+            self._inets.discard(inet)
+        self.wake()
+        return
+
+    def wake(self):
+        """
+        Have the multiplexer thread check for socket changes.
+        """
+        try:
+            self._wake_w.send(b'\0')
+        except OSError:
+            pass  # Already has a wake pending (or is shut down)
+        return
+
+    def exit(self):
+        """
+        Stop the thread and exit.
+        """
+        self.shutdown()
+        if self._thread_mux.is_alive():
+            self._thread_mux.join()
+        self._wake_r.close()
+        self._wake_w.close()
+        return
+
+    def shutdown(self):
+        """
+        Initiate shutdown of our operations (and don't start anything new),
+        but DO NOT BLOCK.
+        """
+        self._shutdown.set()
+        self.wake()
+        return
+
+
 
 class Internet:
-    def __init__(self, officeID='', code_callback=None, record_callback=None, pckt_callback=None, appver=None, server_url=None, err_msg_hndlr=None):
+    def __init__(self, officeID='', code_callback=None, record_callback=None, pckt_callback=None, appver=None, server_url=None, err_msg_hndlr=None, mux=None):
         self._host = HOST_DEFAULT
         self._port = PORT_DEFAULT
         self._err_msg_hndlr = err_msg_hndlr if err_msg_hndlr else log.warn  # Function that can take a string
@@ -95,8 +192,12 @@ class Internet:
         socket.setdefaulttimeout(3.0)
         self._socketRDGuard: Lock = Lock()  # Guard for reading from the socket (get RD then WR for both)
         self._socketWRGuard: Lock = Lock()  # Guard for writing to the socket (get RD then WR for both)
-        self._thread_inet_read: Thread = Thread(name="Internet-Data-Read", target=self._thread_inet_read_body)
-        self._thread_keep_alive: Thread = Thread(name="Internet-Keep-Alive", target=self._thread_keep_alive_body)
+        self._mux: Optional[Multiplexer] = mux  # Reads our socket instead of our own read thread
+        self._thread_inet_read: Optional[Thread] = None
+        if not mux:
+            self._thread_inet_read = Thread(name="Internet-Data-Read", target=self._thread_inet_read_body)
+        self._job_keep_alive: Optional[scheduler.Job] = None
+        self._thread_renew_address: Optional[Thread] = None  # Renews the address after a send error (off the scheduler)
         self._code_callback = code_callback
         self._packet_callback = pckt_callback
         self._record_callback = record_callback
@@ -132,6 +233,14 @@ class Internet:
     def err_msg_hndlr(self, f):
         self._err_msg_hndlr = f if not f is None else log.warn
 
+    @property
+    def last_listener_time(self) -> float:
+        """
+        The time (epoch seconds) a code or ID packet was last received from
+        another station, or 0 if none have been.
+        """
+        return self._t_last_listener
+
     @property
     def packet_callback(self):
         return self._packet_callback
@@ -154,29 +263,72 @@ class Internet:
         while not self._shutdown.is_set():
             if self._connected.wait(0.01):
                 code = self.read()
-                if code and len(code) > 0 and self._connected.is_set() and not self._shutdown.is_set():
-                    if self._code_callback:
-                        self._code_callback(code)
-                    if self._record_callback:
-                        self._record_callback(code)
-                else:
-                    pass
+                self._deliver(code)
             pass
         log.debug("{} thread done.".format(threading.current_thread().name))
         return
 
-    def _thread_keep_alive_body(self):
+    def _deliver(self, code):
+        if code and len(code) > 0 and self._connected.is_set() and not self._shutdown.is_set():
+            if self._code_callback:
+                self._code_callback(code)
+            if self._record_callback:
+                self._record_callback(code)
+        return
+
+    def _read_ready(self, skt):
         """
-        Called by the Keep Alive thread `run` to send our ID to the internet connection.
+        Called by the multiplexer when our socket has data ready.
         """
-        while not self._shutdown.is_set():
-            if self._connected.is_set():
-                self._current_sender = None  # clear the current sender so it will update
-                self.sendID()
-                self._shutdown.wait(10.0)  # send another keepalive sequence every ten seconds
-            self._shutdown.wait(3.0)  # don't hog CPU when we aren't connected
-            pass
-        log.debug("{} thread done.".format(threading.current_thread().name))
+        buf = None
+        try:
+            with self._socketRDGuard:
+                if self._socket is skt and self._connected.is_set() and not self._shutdown.is_set():
+                    buf = skt.recv(500)
+        except (TimeoutError, BlockingIOError):
+            return
+        except OSError as ex:
+            log.debugf("internet._read_ready - {}", ex, level=2)
+            return
+        if buf:
+            log.debugf("internet.read - recv:[{}]", buf, level=6)
+            self._deliver(self._process_packet(buf))
+        return
+
+    def _job_keep_alive_body(self):
+        """
+        Called periodically (every ten seconds) by the shared scheduler to send
+        our ID to the internet connection.
+
+        This mustn't block the scheduler, so if the send fails the address is
+        renewed by a thread of its own, and nothing is sent until it has been.
+        """
+        if self._connected.is_set() and not self._shutdown.is_set():
+            tra = self._thread_renew_address
+            if tra and tra.is_alive():
+                return  # The address is being renewed
+            self._current_sender = None  # clear the current sender so it will update
+            self.sendID(renew_in_background=True)
+        return
+
+    def _renew_address_in_background(self):
+        with self._threadsGuard:
+            tra = self._thread_renew_address
+            if self._shutdown.is_set() or (tra and tra.is_alive()):
+                return
+            self._thread_renew_address = Thread(name="Internet-Renew-Address", daemon=True,
+                target=self._thread_renew_address_body)
+            self._thread_renew_address.start()
+        return
+
+    def _thread_renew_address_body(self):
+        """
+        Get the server address again (retrying until it succeeds or we are shut
+        down), then send our ID.
+        """
+        self._get_address(renew=True)
+        self.sendID()
+        log.debug("internet - '{}' thread done.".format(threading.current_thread().name), 2)
         return
 
     def _close_socket(self):
@@ -188,6 +340,8 @@ class Internet:
                     self._socket.close()
                     self._socket = None
                 log.debug("internet._close_socket -   socketGuards-release", 7)
+        if self._mux:
+            self._mux.wake()
         return
 
     def _create_socket(self):
@@ -211,11 +365,14 @@ class Internet:
             return
         with self._threadsGuard:
             if not self._shutdown.is_set():
-                if not self._thread_inet_read.is_alive():
+                if self._mux:
+                    self._mux.add(self)
+                elif not self._thread_inet_read.is_alive():
                     self._thread_inet_read.start()
-                if not self._thread_keep_alive.is_alive():
-                    self._thread_keep_alive.start()
-                while not (self._thread_inet_read.is_alive() and self._thread_keep_alive.is_alive()):
+                if not self._job_keep_alive:
+                    self._job_keep_alive = scheduler.shared().every(
+                        "Internet-Keep-Alive", 10.0, self._job_keep_alive_body, delay=0)
+                while self._thread_inet_read and not self._thread_inet_read.is_alive():
                     self._shutdown.wait(0.01)
             pass  #
         return
@@ -243,9 +400,11 @@ class Internet:
                 self._shutdown.set()
                 self._close_socket()
             finally:
-                if self._thread_keep_alive and self._thread_keep_alive.is_alive():
-                    self._thread_keep_alive.join()
-                    self._thread_keep_alive = None
+                if self._job_keep_alive:
+                    self._job_keep_alive.cancel()
+                    self._job_keep_alive = None
+                if self._mux:
+                    self._mux.remove(self)
                 if self._thread_inet_read and self._thread_inet_read.is_alive():
                     self._thread_inet_read.join()
                     self._thread_inet_read = None
@@ -372,40 +531,52 @@ class Internet:
                     self._err_msg_hndlr("{}".format(s))
                     self._shutdown.wait(5.0)
                     continue
-            log.debug("internet.read - recv:[{}]".format(buf), 6)
-            if nBytes == 2:
-                # ignore Ack packet, but indicate that it was received
-                if self._packet_callback:
-                    self._packet_callback("\n<rcvd: {}>".format(ACK))
-            elif nBytes == 496:  # code or ID packet
-                self._t_last_listener = time.time()
-                cp = codePacketFormat.unpack(buf)
-                cmd, byts, stnID, seqNo, code = cp[0], cp[1], cp[2], cp[3], cp[4:]
-                stnID, sep, fill = stnID.decode(encoding='latin-1').partition(NUL)
-                n = code[51]
-                if n == 0:  # ID packet
-                    if self._ID_callback:
-                        self._ID_callback(stnID)
-                    if seqNo == self._rcvd_seq_no + 2:
-                        self._rcvd_seq_no = seqNo  # update sender's seq no, ignore others
-                elif n > 0 and seqNo != self._rcvd_seq_no:  # code packet
-                    if self._sender_callback:
-                        if not self._current_sender or not self._current_sender == stnID:
-                            self._current_sender = stnID
-                            self._sender_callback(self._current_sender)
-                    if seqNo != self._rcvd_seq_no + 1:  # sequence break
-                        code = (-0x7fff,) + code[1:n]
-                    else:
-                        code = code[:n]
-                    self._rcvd_seq_no = seqNo
-                    if self._packet_callback:
-                        self._packet_callback("\n<rcvd: {}:{}>".format(DAT, code))
-                    return code
-            elif not self._shutdown.is_set() and self._connected.is_set():
-                log.warn("pykob.internet received invalid record length: {0}".format(nBytes))
+            log.debugf("internet.read - recv:[{}]", buf, level=6)
+            code = self._process_packet(buf)
+            if code:
+                return code
             pass
         return
 
+    def _process_packet(self, buf):  # type: (bytes) -> tuple[int,...]|None
+        """
+        Process a packet received from the server. Return the code sequence if
+        it is a (new) code packet, otherwise None.
+        """
+        nBytes = len(buf)
+        _m_rcvd.inc()
+        if nBytes == 2:
+            # ignore Ack packet, but indicate that it was received
+            if self._packet_callback:
+                self._packet_callback("\n<rcvd: {}>".format(ACK))
+        elif nBytes == 496:  # code or ID packet
+            self._t_last_listener = time.time()
+            cp = codePacketFormat.unpack(buf)
+            cmd, byts, stnID, seqNo, code = cp[0], cp[1], cp[2], cp[3], cp[4:]
+            stnID, sep, fill = stnID.decode(encoding='latin-1').partition(NUL)
+            n = code[51]
+            if n == 0:  # ID packet
+                if self._ID_callback:
+                    self._ID_callback(stnID)
+                if seqNo == self._rcvd_seq_no + 2:
+                    self._rcvd_seq_no = seqNo  # update sender's seq no, ignore others
+            elif n > 0 and seqNo != self._rcvd_seq_no:  # code packet
+                if self._sender_callback:
+                    if not self._current_sender or not self._current_sender == stnID:
+                        self._current_sender = stnID
+                        self._sender_callback(self._current_sender)
+                if seqNo != self._rcvd_seq_no + 1:  # sequence break
+                    code = (-0x7fff,) + code[1:n]
+                else:
+                    code = code[:n]
+                self._rcvd_seq_no = seqNo
+                if self._packet_callback:
+                    self._packet_callback("\n<rcvd: {}:{}>".format(DAT, code))
+                return code
+        elif not self._shutdown.is_set() and self._connected.is_set():
+            log.warn("pykob.internet received invalid record length: {0}".format(nBytes))
+        return None
+
     def write(self, code, txt=""):
         if self._connected.is_set() and not self._shutdown.is_set():
             n = len(code)
@@ -419,24 +590,40 @@ class Internet:
             codePacket = codePacketFormat.pack(
                     DAT, 492, self._office_id.encode('latin-1'),
                     self._sent_seq_no, *codeBuf)
-            for i in range(2):  # Retry once if we get an error trying to send.
-                try:
-                    log.debug("internet.write - Getting socketWRGuard", 7)
-                    with self._socketWRGuard:
-                        log.debug("internet.write -  socketWRGuard-ed", 7)
-                        if self._socket:
-                            log.debug("internet.write - sendto:[{}]".format(codePacket), 6)
-                            self._socket.sendto(codePacket, self._get_address())
-                    log.debug("internet.write -   socketWRGuard-release", 7)
-                    break
-                except:
-                    self._get_address(renew=True)
+            # Don't look up the server address here, as it can take a long time if
+            # the network is down. If there isn't an address, or sending fails, it
+            # is renewed by a thread of its own and the packet is dropped.
+            tra = self._thread_renew_address
+            address = self._ip_address
+            if not address or (tra and tra.is_alive()):
+                log.debug("internet.write - Server address being renewed. Packet dropped.", 4)
+                self._renew_address_in_background()
+                return
+            try:
+                log.debug("internet.write - Getting socketWRGuard", 7)
+                with self._socketWRGuard:
+                    log.debug("internet.write -  socketWRGuard-ed", 7)
+                    if self._socket:
+                        log.debugf("internet.write - sendto:[{}]", codePacket, level=6)
+                        self._socket.sendto(codePacket, address)
+                        _m_sent_code.inc()
+                log.debug("internet.write -   socketWRGuard-release", 7)
+            except (OSError, socket.gaierror) as ex:
+                log.debugf("internet.write - {}", ex, level=2)
+                self._renew_address_in_background()
+                return
+            trace.mark(code, trace.Stage.WIRE)
             # Write packet info if requested
             if self._packet_callback:
                 self._packet_callback("\n<sent: {}:{}>".format(DAT, code))
         return
 
-    def sendID(self):
+    def sendID(self, renew_in_background=False):
+        """
+        Send our ID to the server. If sending fails the server address is
+        renewed, by this thread (which can take a while if the network is down)
+        or, if `renew_in_background`, by a thread of its own.
+        """
         if self._connected.is_set() and not self._shutdown.is_set():
             try:
                 log.debug("internet.sendID - Getting socketWRGuard", 7)
@@ -449,13 +636,18 @@ class Internet:
                         idPacket = idPacketFormat.pack(DAT, 492, self._office_id.encode('latin-1'),
                                 self._sent_seq_no, 1, self._app)
                         self._socket.sendto(idPacket, self._ip_address)
+                        _m_sent_id.inc()
                     log.debug("internet.sendID -   socketWRGuard-release", 7)
                 if self._packet_callback:
                     self._packet_callback("\n<sent: {}>".format(DAT))
                 if self._ID_callback:
                     self._ID_callback(self._office_id)
             except (OSError, socket.gaierror) as ex:
-                self._get_address(renew=True)
+                log.debugf("internet.sendID - {}", ex, level=2)
+                if renew_in_background:
+                    self._renew_address_in_background()
+                else:
+                    self._get_address(renew=True)
         return
 
     def set_officeID(self, officeID):
@@ -482,6 +674,11 @@ class Internet:
         """
         self.disconnect()
         self._shutdown.set()
+        ka = self._job_keep_alive
+        if ka:
+            ka.cancel()
+        if self._mux:
+            self._mux.remove(self)
         self._ID_callback = None
         self._sender_callback = None
         self._record_callback = None
@@ -49,9 +49,10 @@ import re  # RegEx
 import sys
 import time
 from enum import Enum, IntEnum, unique
-from pykob import config, log, morse, util
+from pykob import config, log, metrics, morse, scheduler, trace, util
 from pykob import serial as pkserial
 from pykob.config import AudioType, InterfaceType
+from pykob.virtualhw import VirtualHW
 import threading
 from threading import Event, RLock, Thread
 import traceback
@@ -62,6 +63,9 @@ CODESPACE = 0.120  # amount of space to signal end of code sequence (sec)
 CKTCLOSE  = 0.800  # length of mark to signal circuit closure (sec)
 CKTOPENEXTEND = 0.800  # extended time to check for consistent OPEN state (sec)
 
+_m_energize_hw = metrics.counter("pykob_sounder_energize_total", "Times the sounder was energized.", {"sounder": "hw"})
+_m_energize_synth = metrics.counter("pykob_sounder_energize_total", "Times the sounder was energized.", {"sounder": "synth"})
+
 log.debug("Platform: {}".format(sys.platform))
 if sys.platform == "win32" or sys.platform == "cygwin":
     # We are on a Windows system
@@ -83,6 +87,7 @@ class HWInterface(IntEnum):
     NONE = 0
     GPIO = 1
     SERIAL = 2
+    VIRTUAL = 3
 
 @unique
 class KeyerMode(IntEnum):
@@ -166,13 +171,28 @@ class KOB:
             self, interfaceType=InterfaceType.loop, useSerial=False, portToUse=None,
             useGpio=False, useAudio=False, audioType=AudioType.SOUNDER, useSounder=False, invertKeyInput=False,
             noKeyCloser=False, koCheckExtend=False, soundLocal=True, sounderPowerSaveSecs=0,
-            virtual_closer_in_use=False, err_msg_hndlr=None, status_msg_hndlr=None, keyCallback=None):
-        # type: (InterfaceType, bool, str|None, bool, bool, AudioType, bool, bool, bool, bool, bool, int, bool, Callable, Callable, Callable) -> None
+            virtual_closer_in_use=False, err_msg_hndlr=None, status_msg_hndlr=None, keyCallback=None,
+            virtual_hw=None, audioFramesPerBuffer=None, audioPrewarm=False, audioSink=None):
+        # type: (InterfaceType, bool, str|None, bool, bool, AudioType, bool, bool, bool, bool, bool, int, bool, Callable, Callable, Callable, VirtualHW|None, int|None, bool, audio.NullSink|None) -> None
         """
         When PyKOB code is not running, the physical sounder (if connected) is not powered by
         a connected interface, so set the initial state flags accordingly.
 
         Initialize the hardware and update the flags and mode.
+
+        If `virtual_hw` is supplied, it is used as the key/sounder interface
+        (HWInterface.VIRTUAL) in place of GPIO or Serial.
+
+        `audioFramesPerBuffer` can be used to tune the audio latency versus the
+        chance of dropouts. None uses the audio module default.
+
+        The audio system isn't initialized until the synth sounder/tone is first
+        energized, so applications that never sound locally don't pay for it.
+        If `audioPrewarm` is True it is initialized in the background right
+        away, so it's ready when first needed.
+
+        `audioSink` (an `audio.NullSink` or `audio.FileSink`) can be supplied to
+        run the synth without an audio device (for testing and measurement).
         """
         self._interface_type = interfaceType        # type: InterfaceType
         self._invert_key_input = invertKeyInput     # type: bool
@@ -187,8 +207,12 @@ class KOB:
         self._use_gpio = useGpio                    # type: bool
         self._use_audio = useAudio                  # type: bool
         self._audio_type = audioType                # type: AudioType
+        self._audio_frames_per_buffer = audioFramesPerBuffer  # type: int|None
+        self._audio_prewarm = audioPrewarm          # type: bool
+        self._audio_sink = audioSink                # type: audio.NullSink|None
         self._use_sounder = useSounder              # type: bool
         self._virtual_closer_in_use = virtual_closer_in_use  # type: bool  # The owning code will drive the VC
+        self._virtual_hw = virtual_hw               # type: VirtualHW|None
         #
         self._shutdown = Event()                    # type: Event
         self._hw_interface = HWInterface.NONE       # type: HWInterface
@@ -201,6 +225,7 @@ class KOB:
         self._audio = None                          # type: audio.Audio|None
         self._paddle_is_supported = False           # type: bool  # Set in HW Init if possible.
         self._audio_guard = RLock()                 # type: RLock
+        self._audio_init_guard = RLock()            # type: RLock  # Held while creating the Audio
         self._keyer_mode_guard = RLock()            # type: RLock
         self._sounder_guard = RLock()               # type: RLock
         #
@@ -224,14 +249,16 @@ class KOB:
         self._t_sounder_energized = -1.0            # type: float
         self._t_soundcode_last_change = 0.0         # type: float  # time of last code sounding transition
         self._t_key_last_change = -1.0              # type: float  # time of last key transition
+        self._t_trace_edge = 0.0                    # type: float  # perf_counter time of last key edge (for tracing)
         #
         self._key_callback = None  # type: Callable|None  # Set to the passed in value once we establish an interface
         #
         self._thread_keyer = None                   # type: Thread|None
         self._thread_keyread = None                 # type: Thread|None
-        self._thread_powersave = None               # type: Thread|None
+        self._job_powersave = None                  # type: scheduler.Job|None
         self._threadsStop_KS = Event()              # type: Event
         self._threadsStop_keyer = Event()           # type: Event
+        self._keyer_mode_changed = Event()          # type: Event
         #
         self._key_state_last_closed = True          # type: bool
         #
@@ -249,29 +276,50 @@ class KOB:
 
     def __init_audio(self): # type: () -> None
         """
-        Load the audio module if they want the synth sounder
+        Release the current audio (if any). The audio is created when it is
+        first needed (or in the background if pre-warm was requested).
         """
         if self._shutdown.is_set():
             return
-        with self._audio_guard:
+        with self._audio_init_guard:
             if self._audio:
                 self._audio.exit()
                 self._audio = None
-            if self._use_audio:
-                # Try to import the audio module.
-                try:
-                    from pykob import audio
-                    self._audio = audio.Audio(self._audio_type)
-                except ModuleNotFoundError:
-                    self._err_msg_hndlr("Audio module is not available. The synth sounder and tone cannot be used.")
-                    log.debug(traceback.format_exc(), 3)
-                    self._use_audio = False
+        if self._use_audio and self._audio_prewarm:
+            Thread(name="KOB-AudioPrewarm", daemon=True, target=self._get_audio).start()
         return
 
+    def _get_audio(self): # type: () -> audio.Audio|None
+        """
+        Get the Audio, loading the audio module and creating it if needed.
+        Returns None if audio isn't being used or isn't available.
+        """
+        aud = self._audio
+        if aud or not self._use_audio:
+            return aud
+        with self._audio_init_guard:
+            if self._audio or not self._use_audio or self._shutdown.is_set():
+                return self._audio
+            t = time.perf_counter()
+            try:
+                from pykob import audio
+                if self._audio_frames_per_buffer is None:
+                    aud = audio.Audio(self._audio_type, sink=self._audio_sink)
+                else:
+                    aud = audio.Audio(self._audio_type, self._audio_frames_per_buffer, sink=self._audio_sink)
+                log.info("Audio initialized in {:.0f}ms ({}).".format(
+                    (time.perf_counter() - t) * 1000.0, threading.current_thread().name))
+                self._audio = aud
+            except ModuleNotFoundError:
+                self._err_msg_hndlr("Audio module is not available. The synth sounder and tone cannot be used.")
+                log.debug(traceback.format_exc(), 3)
+                self._use_audio = False
+        return self._audio
+
     def __init_hw_interface(self): # type: () -> None
         """
         Conditionally load GPIO or Serial library if requested.
-        GPIO takes priority if both are requested.
+        A virtual interface takes priority, then GPIO if both GPIO and Serial are requested.
         """
         if self._shutdown.is_set():
             return
@@ -280,7 +328,9 @@ class KOB:
             serial_support_available = False
             gpio_led = None
             gpio_button = None
-            if self._use_gpio:
+            if self._virtual_hw:
+                pass
+            elif self._use_gpio:
                 try:
                     from gpiozero import LED, Button
 
@@ -298,9 +348,13 @@ class KOB:
                 pass
             pass
             #
-            # At this point, we have either the GPIO or the Serial module available, or none.
+            # At this point, we have either a virtual interface, the GPIO or the Serial module available, or none.
             #
-            if gpio_module_available:
+            if self._virtual_hw:
+                self._hw_interface = HWInterface.VIRTUAL
+                self._paddle_is_supported = False
+                log.debug("The virtual interface is active and will be used.", 1)
+            elif gpio_module_available:
                 try:
                     self._gpio_key_read = gpio_button(21, pull_up=True)  # GPIO21 is key input.
                     self._gpio_pdl_dah = gpio_button(20, pull_up=True)   # GPIO20 is paddle-dah (dash).
@@ -401,9 +455,8 @@ class KOB:
                 if not self._thread_keyread:
                     self._thread_keyread = Thread(name="KOB-KeyRead", target=self._thread_keyread_body)
                     self._thread_keyread.start()
-            if not self._thread_powersave:
-                self._thread_powersave = Thread(name="KOB-PowerSave", target=self._thread_powersave_body)
-                self._thread_powersave.start()
+            if not self._job_powersave:
+                self._job_powersave = scheduler.shared().every("KOB-PowerSave", 0.5, self._job_powersave_body)
         return
 
     def __start_keyer_processing(self): # type: () -> None
@@ -417,10 +470,10 @@ class KOB:
         self._threadsStop_KS.set()
         if self._thread_keyread and self._thread_keyread.is_alive():
             self._thread_keyread.join(timeout=2.0)
-        if self._thread_powersave and self._thread_powersave.is_alive():
-            self._thread_powersave.join(timeout=2.0)
+        if self._job_powersave:
+            self._job_powersave.cancel()
         self._thread_keyread = None
-        self._thread_powersave = None
+        self._job_powersave = None
         return
 
     def __str_sync(self, s):  # type: (str) -> None
@@ -443,8 +496,9 @@ class KOB:
                 elif code[-1] == 2: # special code for closer/circuit open
                     # self._set_key_closer_open(True)
                     pass
-                if self._key_callback and not self._threadsStop_keyer.is_set():
-                    self._key_callback(code)
+                cb = self._key_callback  # Read once, it can be changed by another thread
+                if cb and not self._threadsStop_keyer.is_set():
+                    cb(code)
         log.debug("{} thread done.".format(threading.current_thread().name))
         return
 
@@ -459,22 +513,24 @@ class KOB:
                     self._set_key_closer_open(False)
                 elif code[-1] == 2: # special code for closer/circuit open
                     self._set_key_closer_open(True)
-                if self._key_callback and not self._threadsStop_KS.is_set():
-                    self._key_callback(code)
+                cb = self._key_callback  # Read once, it can be changed by another thread
+                if cb and not self._threadsStop_KS.is_set():
+                    if trace.is_enabled() and self._t_trace_edge:
+                        trace.begin(code, self._t_trace_edge)
+                    cb(code)
         log.debug("{} thread done.".format(threading.current_thread().name))
         return
 
-    def _thread_powersave_body(self): # type: () -> None
+    def _job_powersave_body(self): # type: () -> None
         """
-        Called by the PowerSave thread 'run' to control the power save (sounder energize)
+        Called periodically by the shared scheduler to control the power save (sounder energize)
         """
-        while not self._threadsStop_KS.is_set() and not self._shutdown.is_set():
-            now = time.time()
-            if self._sounder_power_save_secs > 0 and not self._power_saving:
-                if self._t_sounder_energized > 0 and (now - self._t_sounder_energized) > self._sounder_power_save_secs:
-                    self.power_save(True)
-            self._threadsStop_KS.wait(0.5)
-        log.debug("{} thread done.".format(threading.current_thread().name))
+        if self._threadsStop_KS.is_set() or self._shutdown.is_set():
+            return
+        now = time.time()
+        if self._sounder_power_save_secs > 0 and not self._power_saving:
+            if self._t_sounder_energized > 0 and (now - self._t_sounder_energized) > self._sounder_power_save_secs:
+                self.power_save(True)
         return
 
     def _energize_hw_sounder(self, energize): # type: (bool) -> None
@@ -485,10 +541,11 @@ class KOB:
             return
         with self._sounder_guard:
             hw_energize = (energize and self._use_sounder)
-            log.debug("kob._energize_hw_sounder: {}:{}".format(energize, hw_energize), 3)
+            log.debugf("kob._energize_hw_sounder: {}:{}", energize, hw_energize, level=3)
             if not self._sounder_energized == hw_energize:
                 if hw_energize:
                     self._t_sounder_energized = time.time()
+                    _m_energize_hw.inc()
                 else:
                     self._t_sounder_energized = -1.0
                 self._sounder_energized = hw_energize
@@ -514,6 +571,8 @@ class KOB:
                         self._err_msg_hndlr("Serial RTS error setting sounder state. Disabling interface.")
                         log.debug(traceback.format_exc(), 3)
                     pass
+                elif self._hw_interface == HWInterface.VIRTUAL:
+                    self._virtual_hw.sounder_energize(hw_energize)
                 pass
             pass
         return
@@ -530,6 +589,7 @@ class KOB:
         with self._audio_guard:
             try:
                 if energize:
+                    _m_energize_synth.inc()
                     if no_tone:
                         self._play_click()
                     else:
@@ -570,6 +630,8 @@ class KOB:
                 self._status_msg_hndlr("Error reading key. Check interface.")
                 log.debug(traceback.format_exc(), 3)
             pass
+        elif self._hw_interface == HWInterface.VIRTUAL:
+            kc = self._virtual_hw.key_is_closed()
         # Invert key state if configured to do so (ex: input is from a modem)
         if self._invert_key_input:
             kc = not kc
@@ -581,8 +643,10 @@ class KOB:
         log.debug("kob._play_clack_silence - requested", 5)
         if self._use_audio and self._synth_energized:
             log.debug("kob._play_clack_silence", 3)
-            self._audio.play(0)  # clack/silence
-            self._synth_energized = False
+            aud = self._get_audio()
+            if aud:
+                aud.play(0)  # clack/silence
+                self._synth_energized = False
         return
 
     def _play_click(self): # type: () -> None
@@ -591,7 +655,11 @@ class KOB:
         log.debug("kob._play_click - requested", 5)
         if (self._use_audio and self._audio_type == AudioType.SOUNDER and not self._synth_energized):
             log.debug("kob._play_click", 3)
-            self._audio.play(1)  # click
+            # This is only used to reflect a mode change (circuit closed), so
+            # don't initialize the audio just for it. Track the state though.
+            aud = self._audio
+            if aud:
+                aud.play(1)  # click
             self._synth_energized = True
         return
 
@@ -601,15 +669,17 @@ class KOB:
         log.debug("kob._play_click_tone - requested", 5)
         if self._use_audio and not self._synth_energized:
             log.debug("kob._play_click_tone", 3)
-            self._audio.play(1)  # click/tone
-            self._synth_energized = True
+            aud = self._get_audio()
+            if aud:
+                aud.play(1)  # click/tone
+                self._synth_energized = True
         return
 
     def _set_key_closer_open(self, open): # type: (bool) -> None
         """
         Track the physical key closer. This controls the Loop/KOB sounder state.
         """
-        log.debug("kob._set_key_closer_open: {}->{}".format(self._key_closer_is_open, open), 3)
+        log.debugf("kob._set_key_closer_open: {}->{}", self._key_closer_is_open, open, level=3)
         if not open == self._key_closer_is_open:
             was_open = self._key_closer_is_open
             self._key_closer_is_open = open
@@ -633,7 +703,7 @@ class KOB:
         """
         Track the virtual closer. This controls the Loop/KOB sounder state.
         """
-        log.debug("kob._set_virtual_closer_open: {}->{}".format(self._virtual_closer_is_open, open), 3)
+        log.debugf("kob._set_virtual_closer_open: {}->{}", self._virtual_closer_is_open, open, level=3)
         if not open == self._virtual_closer_is_open:
             vcow = self._virtual_closer_is_open
             self._virtual_closer_is_open = open
@@ -655,18 +725,18 @@ class KOB:
             return
         sounder_mode_was = self._sounder_mode
         synth_mode_was = self._synth_mode
-        log.debug("kob._update_modes: was {}:{} - [{}:{}]|[{}:{}]({})".format(
-            sounder_mode_was.name, synth_mode_was.name, kcow, kcon, vcow, vcon, from_key_closer), 2)
+        log.debugf("kob._update_modes: was {}:{} - [{}:{}]|[{}:{}]({})",
+            sounder_mode_was.name, synth_mode_was.name, kcow, kcon, vcow, vcon, from_key_closer, level=2)
         #
         mode_col = KOB.__COL_SEL[self._key_closer_is_open][self._virtual_closer_is_open]
         mode_row = KOB.__ROW_SEL[self._wire_connected][self._sound_local]
         sounder_tbl = KOB.__LOOP_MODES if self._interface_type == InterfaceType.loop else KOB.__KS_MODES
-        log.debug("kob._update_modes: Table: '{}'  Row: {}  Col: {}  KO: {}  VO: {}".format(
+        log.debugf("kob._update_modes: Table: '{}'  Row: {}  Col: {}  KO: {}  VO: {}",
             sounder_tbl[0],
             mode_row,
             mode_col + 1,
             self._key_closer_is_open,
-            self._virtual_closer_is_open), 4)  # Print COL 1-based
+            self._virtual_closer_is_open, level=4)  # Print COL 1-based
 
         sounder_mode = SounderMode.DIS if (self._hw_interface == HWInterface.NONE) else (
             (sounder_tbl[mode_row])[mode_col]
@@ -682,8 +752,8 @@ class KOB:
         if not synth_mode == synth_mode_was:
             log.debug("kob._update_modes: synth_mode changed", 4)
 
-        log.debug("kob._update_modes: now {}:{}".format(
-            self._sounder_mode.name, self._synth_mode.name), 2)
+        log.debugf("kob._update_modes: now {}:{}",
+            self._sounder_mode.name, self._synth_mode.name, level=2)
         energize_sounder = (not sounder_mode == SounderMode.DIS) and ((sounder_mode == SounderMode.EFK) or (not sounder_mode == SounderMode.SLC and not sounder_mode == SounderMode.FK) or (sounder_mode == SounderMode.SLC and not kcon))
         self._energize_hw_sounder(energize_sounder)
         if not (from_key_closer and self._virtual_closer_in_use):
@@ -704,6 +774,26 @@ class KOB:
             self._internet_circuit_closed = closed
         return
 
+    @property
+    def key_callback(self): # type: () -> Callable|None
+        return self._key_callback
+    @key_callback.setter
+    def key_callback(self, f): # type: (Callable|None) -> None
+        """
+        Set the function called with the code read from the key (None for none).
+        This allows a KOB to be handed from one user to another.
+
+        The key is only read while there is a callback, so setting one on a KOB
+        that was created without one starts reading the key.
+        """
+        self._key_callback = f
+        if f and not self._shutdown.is_set():
+            t = self._thread_keyread
+            if not t or not t.is_alive():
+                self._thread_keyread = None
+                self.__start_hw_processing()
+        return
+
     @property
     def keyer_dit_len(self): # type: () -> int
         return self._keyer_dit_len
@@ -865,8 +955,9 @@ class KOB:
         Stop the threads and exit.
         """
         self.shutdown()
-        if self._audio:
-            self._audio.exit()
+        with self._audio_init_guard:
+            if self._audio:
+                self._audio.exit()
         if self._port:
             self._port.exit()
         if self._gpio_key_read:
@@ -885,11 +976,16 @@ class KOB:
         sleep_time = 0.001
         waiting_for_open = False
         t_first_opened = 0
+        t_edge = 0.0  # perf_counter time the current key change was first seen (for tracing)
         while not self._threadsStop_KS.is_set() and self._hw_is_available():
             kc = self._key_state_last_closed
             try:
                 kc1 = self._key_is_closed()
-                if kc != kc1:
+                if kc == kc1:
+                    t_edge = 0.0
+                else:
+                    if not t_edge:
+                        t_edge = time.perf_counter()
                     self._threadsStop_KS.wait(DEBOUNCE)
                     kc2 = self._key_is_closed()
                     if kc1 != kc2:
@@ -930,6 +1026,10 @@ class KOB:
                 #
                 if self._sounder_mode == SounderMode.FK or self._synth_mode == SynthMode.FK:
                     self.energize_sounder(kc, CodeSource.key)
+                    if t_edge:
+                        trace.record(trace.Stage.SOUNDER, time.perf_counter() - t_edge)
+                self._t_trace_edge = t_edge
+                t_edge = 0.0
                 if kc:
                     code += (-dt,)
                 elif self._circuit_is_closed and not self._no_key_closer:
@@ -1006,7 +1106,12 @@ class KOB:
             if len(code) >= 50:  # code sequences can't have more than 50 elements
                 return code
             if km[0] == KeyerMode.IDLE:
-                self._threadsStop_keyer.wait(sleep_time)
+                if code:
+                    self._threadsStop_keyer.wait(sleep_time)
+                else:
+                    # Nothing in progress. Wait for the mode to change (or to be stopped).
+                    self._keyer_mode_changed.wait()
+                    self._keyer_mode_changed.clear()
         return code
 
     def keyer_mode_set(self, mode: KeyerMode, source: CodeSource): # type: (KeyerMode, CodeSource) -> None
@@ -1017,6 +1122,7 @@ class KOB:
         log.debug("kob.keyer_mode_set {}->{}".format(self._keyer_mode, km), 3)
         with self._keyer_mode_guard:
             self._keyer_mode = km
+        self._keyer_mode_changed.set()
         return
 
     def power_save(self, enable): # type: (bool) -> None
@@ -1054,6 +1160,7 @@ class KOB:
         """
         self._shutdown.set()
         self._threadsStop_keyer.set()
+        self._keyer_mode_changed.set()
         self._threadsStop_KS.set()
         self.__stop_hw_processing()
         self._key_callback = None
@@ -26,9 +26,23 @@ SOFTWARE.
 log module
 
 logs status, debug and error messages.
+
+Debug messages can be given as a format string and arguments, or as a callable
+that returns the message, so that no formatting is done unless the level is
+enabled. By default, debug messages are written by a background writer thread
+so that debug logging doesn't stall the caller (key and wire timing). Other
+messages are written synchronously (after any queued debug messages), to keep
+them in order with other console output. The most recent messages can also be
+kept in an in-memory ring buffer.
 """
+import atexit
+from collections import deque
 import sys
 import datetime
+from queue import SimpleQueue
+from threading import Event, Lock, Thread
+import time
+from typing import Callable
 
 __logging_level = 0
 
@@ -39,15 +53,105 @@ ERROR_LEVEL = -2
 """ Minimum logging level. This disables all logging. """
 LOGGING_MIN_LEVEL = -3
 
+FLUSH_TIMEOUT = 1.0  # Maximum seconds to wait for the writer to drain the queue
+
+_async_debug = True     # type: bool
+_pending = 0            # type: int  # Messages queued but not yet written
+_pending_guard = Lock() # type: Lock
+_queue = SimpleQueue()  # type: SimpleQueue
+_ring = None            # type: deque[str]|None
+_writer = None          # type: Thread|None
+_writer_guard = Lock()  # type: Lock
+
+def _format_line(msg, type, dt, t):
+    # type: (str, str, str|None, float) -> str
+    dtl = dt if not dt is None else str(datetime.datetime.fromtimestamp(t))[:19]
+    typestr = " {0}".format(type) if type else ""
+    if not typestr and not dtl:
+        return msg
+    return '{0}{1}: \t{2}\n'.format(dtl, typestr, msg)
+
+def _message(msg, args):
+    # type: (str|Callable[[], str], tuple) -> str
+    if callable(msg):
+        msg = msg()
+    if args:
+        msg = msg.format(*args)
+    return msg
+
+def _output(line):  # type: (str) -> None
+    if _ring is not None:
+        _ring.append(line)
+    sys.stdout.write(line)
+    return
+
+def _thread_writer_body():  # type: () -> None
+    """
+    Write the queued messages, flushing the output after each batch.
+    """
+    global _pending
+    while True:
+        item = _queue.get()
+        while item is not None:
+            if isinstance(item, Event):
+                try:
+                    sys.stdout.flush()
+                except Exception:
+                    pass
+                item.set()
+            else:
+                try:
+                    _output(_format_line(*item))
+                except Exception as ex:
+                    # Keep the writer running. The message is lost, but report why.
+                    try:
+                        sys.stderr.write("Log writer error: {}\n".format(ex))
+                    except Exception:
+                        pass
+                with _pending_guard:
+                    _pending -= 1
+            try:
+                item = _queue.get_nowait()
+            except Exception:
+                item = None
+        try:
+            sys.stdout.flush()
+        except Exception:
+            pass
+    return
+
+def _enqueue(msg, type, dt):  # type: (str, str, str|None) -> None
+    global _pending, _writer
+    if not _writer:
+        with _writer_guard:
+            if not _writer:
+                _writer = Thread(name="Log-Writer", daemon=True, target=_thread_writer_body)
+                _writer.start()
+    with _pending_guard:
+        _pending += 1
+    _queue.put((msg, type, dt, time.time()))
+    return
+
+def flush():  # type: () -> None
+    """
+    Wait (a limited time) for the queued messages to be written.
+
+    Returns immediately if there are no messages waiting to be written.
+    """
+    if _writer and _pending > 0:
+        done = Event()
+        _queue.put(done)
+        done.wait(FLUSH_TIMEOUT)
+    return
+
+atexit.register(flush)
+
 def log(msg, type="", dt=None, level_threshold=INFO_LEVEL):
     global __logging_level
     if __logging_level >= level_threshold:
-        dtl = dt if not dt is None else str(datetime.datetime.now())[:19]
-        typestr = " {0}".format(type) if type else ""
-        if not typestr and not dtl:
-            sys.stdout.write(msg)
-        else:
-            sys.stdout.write('{0}{1}: \t{2}\n'.format(dtl, typestr, msg))
+        msg = _message(msg, ())
+        flush()
+        _output(_format_line(msg, type, dt, time.time()))
         sys.stdout.flush()
     return
 
@@ -62,11 +166,38 @@ def logErr(msg, dt=None):
     return
 
 def debug(msg, level=DEBUG_MIN_LEVEL, dt=None):
+    """
+    Log a debug message if the logging level is `level` or higher.
+
+    `msg` can be a callable that returns the message (only called if the level is enabled).
+    """
+    global __logging_level
+    if __logging_level >= level:
+        debugf(msg, level=level, dt=dt)
+    return
+
+def debugf(fmt, *args, level=DEBUG_MIN_LEVEL, dt=None):
+    """
+    Log a debug message, formatted as `fmt.format(*args)` only if the logging level
+    is `level` or higher.
+    """
     global __logging_level
     if __logging_level >= level:
-        log(msg, type="DEBUG[{}]".format(level), level_threshold=level, dt=dt)
+        msg = _message(fmt, args)
+        type = "DEBUG[{}]".format(level)
+        if _async_debug:
+            _enqueue(msg, type, dt)
+        else:
+            log(msg, type=type, level_threshold=level, dt=dt)
     return
 
+def debug_enabled(level=DEBUG_MIN_LEVEL):
+    """
+    True if debug messages at `level` will be logged. For guarding expensive debug code.
+    """
+    global __logging_level
+    return __logging_level >= level
+
 def err(msg, dt=None):
     typ, val, trc = sys.exc_info()
     logErr("{0}\n{1}".format(msg, val), dt=dt)
@@ -94,3 +225,29 @@ def set_logging_level(level):
     __logging_level = level if level >= LOGGING_MIN_LEVEL else INFO_LEVEL
     debug("log.set_logging_level: " + str(__logging_level))
     return
+
+def set_async_debug(on):  # type: (bool) -> None
+    """
+    Write debug messages from the background writer (True) or on the caller's thread (False).
+    """
+    global _async_debug
+    if not on:
+        flush()
+    _async_debug = on
+    return
+
+def get_ring_buffer():  # type: () -> list[str]
+    """
+    Get the messages in the ring buffer (oldest first). Empty if it isn't enabled.
+    """
+    flush()
+    return list(_ring) if _ring is not None else []
+
+def set_ring_buffer(size):  # type: (int) -> None
+    """
+    Keep the most recent `size` messages in memory (0 to disable).
+    """
+    global _ring
+    flush()
+    _ring = deque(_ring if _ring else (), maxlen=size) if size > 0 else None
+    return
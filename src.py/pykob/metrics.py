@@ -0,0 +1,336 @@
+"""
+MIT License
+
+Copyright (c) 2020-24 PyKOB - MorseKOB in Python
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+"""
+metrics module
+
+Runtime metrics (counters, gauges and histograms) and an exporter that serves
+them in the Prometheus text format on a localhost HTTP port or a Unix socket.
+
+Metrics are created (or looked up) by name with `counter`, `gauge` and
+`histogram`, usually once, at module or instance creation. Updates are made
+to a cell owned by the updating thread, so they don't take a lock and can be
+used on hot paths. The cells are summed when the metrics are collected.
+
+A gauge can be given a function that is called when the metrics are collected
+(a queue's `qsize` for example), so it costs nothing until it is read.
+
+The liveness of the process' threads is reported as `pykob_thread_alive`.
+"""
+from bisect import bisect_left
+import os
+import socket
+import stat
+import threading
+from threading import Lock, Thread, get_ident
+from typing import Any, Callable, Optional
+
+from pykob import log
+
+# Default histogram bucket upper bounds (seconds). A '+Inf' bucket catches everything above.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LOCALHOST = "127.0.0.1"
+
+def _label_str(labels):  # type: (tuple[tuple[str,str],...]) -> str
+    if not labels:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(k, v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for k, v in labels) + "}"
+
+def _num(v):  # type: (float) -> str
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+class Counter:
+    """
+    A value that only increases (packets sent, characters decoded, ...).
+    """
+    TYPE = "counter"
+
+    def __init__(self, labels):  # type: (tuple[tuple[str,str],...]) -> None
+        self._labels = labels
+        self._cells = {}  # type: dict[int,list[float]]  # Thread ident -> [value]
+        return
+
+    @property
+    def value(self):  # type: () -> float
+        return sum(c[0] for c in list(self._cells.values()))
+
+    def inc(self, n=1):  # type: (float) -> None
+        cell = self._cells.get(get_ident())
+        if cell is None:
+            cell = self._cells.setdefault(get_ident(), [0])
+        cell[0] += n
+        return
+
+    def _samples(self, name):  # type: (str) -> list[str]
+        return ["{}{} {}".format(name, _label_str(self._labels), _num(self.value))]
+
+class Gauge:
+    """
+    A value that can go up and down (a queue depth, ...). It is either set, or
+    read from a function when the metrics are collected.
+    """
+    TYPE = "gauge"
+
+    def __init__(self, labels):  # type: (tuple[tuple[str,str],...]) -> None
+        self._labels = labels
+        self._value = 0         # type: float
+        self._fn = None         # type: Optional[Callable[[], float]]
+        return
+
+    @property
+    def value(self):  # type: () -> float
+        fn = self._fn
+        if fn is not None:
+            try:
+                return fn()
+            except Exception as ex:
+                log.debugf("metrics: gauge function error: {}", ex, level=2)
+                return float("nan")
+        return self._value
+
+    def set(self, v):  # type: (float) -> None
+        self._value = v
+        return
+
+    def set_function(self, fn):  # type: (Optional[Callable[[], float]]) -> None
+        """
+        Read the value from `fn` when the metrics are collected (None to stop).
+        """
+        self._fn = fn
+        return
+
+    def _samples(self, name):  # type: (str) -> list[str]
+        return ["{}{} {}".format(name, _label_str(self._labels), _num(self.value))]
+
+class Histogram:
+    """
+    Counts of observed values (latencies, ...) in fixed buckets, along with their
+    count and sum.
+    """
+    TYPE = "histogram"
+
+    def __init__(self, labels, buckets=DEFAULT_BUCKETS):
+        # type: (tuple[tuple[str,str],...], tuple[float,...]) -> None
+        self._labels = labels
+        self._bounds = tuple(sorted(buckets))
+        self._cells = {}  # type: dict[int,list[float]]  # Thread ident -> [bucket counts..., sum]
+        return
+
+    def observe(self, v):  # type: (float) -> None
+        cell = self._cells.get(get_ident())
+        if cell is None:
+            cell = self._cells.setdefault(get_ident(), [0] * (len(self._bounds) + 2))
+        cell[bisect_left(self._bounds, v)] += 1
+        cell[-1] += v
+        return
+
+    def _samples(self, name):  # type: (str) -> list[str]
+        n = len(self._bounds) + 1
+        totals = [0] * (n + 1)
+        for cell in list(self._cells.values()):
+            for i in range(n + 1):
+                totals[i] += cell[i]
+        lines = []
+        cumulative = 0
+        for i, bound in enumerate(self._bounds + (float("inf"),)):
+            cumulative += totals[i]
+            lines.append("{}_bucket{} {}".format(name, _label_str(self._labels + (("le", _num(bound)),)), cumulative))
+        lines.append("{}_sum{} {}".format(name, _label_str(self._labels), _num(float(totals[n]))))
+        lines.append("{}_count{} {}".format(name, _label_str(self._labels), cumulative))
+        return lines
+
+class _Family:
+    def __init__(self, mtype, help):  # type: (type, str) -> None
+        self.type = mtype
+        self.help = help
+        self.metrics = {}  # type: dict[tuple[tuple[str,str],...],Any]
+        return
+
+_guard = Lock()  # Only taken to create metrics and to collect them
+_families = {}  # type: dict[str,_Family]
+_exporter = None  # type: Any  # socketserver.BaseServer
+_exporter_thread = None  # type: Optional[Thread]
+_exporter_path = None  # type: Optional[str]
+
+def _get(mtype, name, help, labels, *args):  # type: (type, str, str, Optional[dict[str,str]], Any) -> Any
+    key = tuple(sorted((str(k), str(v)) for k, v in labels.items())) if labels else ()
+    with _guard:
+        family = _families.get(name)
+        if family is None:
+            family = _families[name] = _Family(mtype, help)
+        elif not family.type == mtype:
+            raise ValueError("Metric '{}' is a {}, not a {}".format(name, family.type.TYPE, mtype.TYPE))
+        metric = family.metrics.get(key)
+        if metric is None:
+            metric = family.metrics[key] = mtype(key, *args)
+    return metric
+
+def counter(name, help="", labels=None):  # type: (str, str, Optional[dict[str,str]]) -> Counter
+    """
+    Get (creating if needed) the counter with a name and labels.
+    """
+    return _get(Counter, name, help, labels)
+
+def gauge(name, help="", labels=None, fn=None):
+    # type: (str, str, Optional[dict[str,str]], Optional[Callable[[], float]]) -> Gauge
+    """
+    Get (creating if needed) the gauge with a name and labels. If `fn` is
+    given, the gauge's value is read from it (replacing any previous function).
+    """
+    g = _get(Gauge, name, help, labels)
+    if fn is not None:
+        g.set_function(fn)
+    return g
+
+def histogram(name, help="", labels=None, buckets=DEFAULT_BUCKETS):
+    # type: (str, str, Optional[dict[str,str]], tuple[float,...]) -> Histogram
+    """
+    Get (creating if needed) the histogram with a name and labels.
+    """
+    return _get(Histogram, name, help, labels, buckets)
+
+def collect():  # type: () -> str
+    """
+    Return all of the metrics in the Prometheus text format.
+    """
+    lines = []
+    with _guard:
+        families = sorted(_families.items())
+        families = [(name, f.type.TYPE, f.help, list(f.metrics.values())) for name, f in families]
+    for name, mtype, help, metrics in families:
+        if help:
+            lines.append("# HELP {} {}".format(name, help.replace('\\', '\\\\').replace('\n', '\\n')))
+        lines.append("# TYPE {} {}".format(name, mtype))
+        for m in metrics:
+            lines.extend(m._samples(name))
+    lines.append("# HELP pykob_thread_alive Threads that are running.")
+    lines.append("# TYPE pykob_thread_alive gauge")
+    for t in sorted(threading.enumerate(), key=lambda t: t.name):
+        lines.append("pykob_thread_alive{} 1".format(_label_str((("thread", t.name),))))
+    return "\n".join(lines) + "\n"
+
+def _server(endpoint):  # type: (str) -> Any
+    # The server modules are imported here, so importing metrics stays cheap.
+    import http.server
+    import socketserver
+
+    class _HTTPHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if not self.path.split('?')[0] in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = collect().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        def log_message(self, format, *args):
+            log.debugf("metrics: " + format, *args, level=4)
+            return
+
+    class _UnixHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            self.wfile.write(collect().encode("utf-8"))
+            return
+
+    if endpoint.isdigit():
+        server = http.server.ThreadingHTTPServer((LOCALHOST, int(endpoint)), _HTTPHandler)
+    else:
+        server = socketserver.ThreadingUnixStreamServer(endpoint, _UnixHandler)
+    server.daemon_threads = True
+    return server
+
+def start_exporter(endpoint):  # type: (str|int) -> None
+    """
+    Start serving the metrics. `endpoint` is a port number, to serve HTTP on
+    localhost, or the path of a Unix socket to write the metrics to each
+    connection.
+
+    A socket left at the path (from a previous run) is replaced. Raises
+    FileExistsError if something other than a socket is at the path.
+    """
+    global _exporter, _exporter_path, _exporter_thread
+    stop_exporter()
+    ep = str(endpoint).strip()
+    if ep.isdigit():
+        server = _server(ep)
+        log.info("Metrics available at http://{}:{}/metrics".format(LOCALHOST, server.server_address[1]))
+    else:
+        if not hasattr(socket, "AF_UNIX"):
+            raise ValueError("Unix sockets are not supported on this system. Use a port number for metrics.")
+        try:
+            st = os.lstat(ep)
+        except FileNotFoundError:
+            st = None
+        if st is not None:
+            if not stat.S_ISSOCK(st.st_mode):
+                raise FileExistsError("Metrics socket path '{}' exists and is not a socket.".format(ep))
+            os.unlink(ep)  # Left from a previous run
+        server = _server(ep)
+        _exporter_path = ep
+        log.info("Metrics available from Unix socket {}".format(ep))
+    _exporter = server
+    _exporter_thread = Thread(name="Metrics-Exporter", daemon=True, target=server.serve_forever, args=(0.5,))
+    _exporter_thread.start()
+    return
+
+def stop_exporter():  # type: () -> None
+    """
+    Stop serving the metrics (if they are being served).
+    """
+    global _exporter, _exporter_path, _exporter_thread
+    server = _exporter
+    if server:
+        _exporter = None
+        server.shutdown()
+        server.server_close()
+        _exporter_thread = None
+        path = _exporter_path
+        _exporter_path = None
+        if path:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+    return
+
+"""
+Test code
+"""
+if __name__ == "__main__":
+    # Self-test
+    c = counter("test_events_total", "Events", {"kind": "a"})
+    h = histogram("test_latency_seconds", "Latency")
+    g = gauge("test_depth", "Depth", fn=lambda: 3)
+    for n in range(10):
+        c.inc()
+        h.observe(n / 1000.0)
+    print(collect())
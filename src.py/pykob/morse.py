@@ -31,8 +31,8 @@ Provides classes for sending and reading American and International Morse code.
 import sys
 import codecs
 from pathlib import Path
-from threading import current_thread, Event, Timer
-from pykob import config, log
+from threading import current_thread, Event, Lock, Timer
+from pykob import config, log, metrics, trace
 
 DOTSPERWORD = 45     # dot units per word, including all spaces (MORSE is 43, PARIS is 47)
 MAXINT = sys.maxsize # a very large integer
@@ -41,23 +41,37 @@ MAXINT = sys.maxsize # a very large integer
 root_folder = Path(__file__).parent
 data_folder = root_folder / "data"
 
-# read code tables
+# Code tables
+#  They are read when a Sender or Reader for the code type is first created
+#  (rather than when the module is imported). Each file is read once, for both
+#  the encode and the decode table.
 encodeTable = [{}, {}]  # one dictionary each for American and International
+decodeTable = [{}, {}]  # one dictionary each for American and International
+_codeTableFiles = ('codetable-american.txt', 'codetable-international.txt')
+_codeTablesLoaded = [False, False]
+_codeTablesGuard = Lock()
 
-def readEncodeTable(codeType, filename):
-    fn = data_folder / filename
-    # print("Load encode table: ", fn)
-    f = codecs.open(fn, encoding='utf-8')
-    cti = 0 if codeType == config.CodeType.american else 1
-    f.readline()  # ignore first line
-    for s in f:
-        a, t, c = s.rstrip().partition('\t')
-        encodeTable[cti][a] = c  # dictionary key is character
-    f.close()
-    return
+_m_chars = metrics.counter("pykob_reader_chars_decoded_total", "Characters decoded by Readers.")
 
-readEncodeTable(config.CodeType.american, 'codetable-american.txt')
-readEncodeTable(config.code_type.international, 'codetable-international.txt')
+def loadCodeTables(codeType):
+    """
+    Read the encode and decode tables for a code type, if they haven't been.
+    Returns the table index (0 for American, 1 for International).
+    """
+    cti = 0 if codeType == config.CodeType.american else 1
+    if _codeTablesLoaded[cti]:
+        return cti
+    with _codeTablesGuard:
+        if not _codeTablesLoaded[cti]:
+            fn = data_folder / _codeTableFiles[cti]
+            with codecs.open(fn, encoding='utf-8') as f:
+                f.readline()  # ignore first line
+                for s in f:
+                    a, t, c = s.rstrip().partition('\t')
+                    encodeTable[cti][a] = c  # dictionary key is character
+                    decodeTable[cti][c] = a  # dictionary key is code
+            _codeTablesLoaded[cti] = True
+    return cti
 
 class Sender:
     """
@@ -69,6 +83,7 @@ class Sender:
 
     def __init__(self, wpm, cwpm=0, codeType=config.CodeType.american, spacing=config.Spacing.char):
         self._codeType = codeType
+        loadCodeTables(codeType)
         self._spacing = spacing
         self.setWPM(wpm, cwpm)
         self._space = self._wordSpace  # delay before next code element (ms)
@@ -157,6 +172,14 @@ class Sender:
         self.shutdown()
         return
 
+    def reset(self):
+        """
+        Reset the spacing state, so the next character is encoded as if it
+        starts a new transmission.
+        """
+        self._space = self._wordSpace
+        return
+
     def setWPM(self, wpm, cwpm=0):
         if cwpm == 0:
             cwpm = wpm  # adjust for legacy clients
@@ -210,21 +233,6 @@ MINXLLEN        = 7.0  # minimum length of 0 character (in dots)
 MORSERATIO      = 0.95 # length of Morse space relative to surrounding spaces
 ALPHA           = 0.5  # weight given to wpm update values (for smoothing)
 
-# read code tables
-decodeTable = [{}, {}]  # one dictionary each for American and International
-def readDecodeTable(codeType, filename):
-    fn = data_folder / filename
-    f = codecs.open(fn, encoding='utf-8')
-    f.readline()  # ignore first line
-    for s in f:
-        a, t, c = s.rstrip().partition('\t')
-        decodeTable[codeType][c] = a  # dictionary key is code
-    f.close()
-    return
-
-readDecodeTable(0, 'codetable-american.txt') # American code table is at 0 index
-readDecodeTable(1, 'codetable-international.txt') # International code table is at 1 index
-
 class Reader:
     """
     The Morse decoding algorithm has to wait until two characters have been received before
@@ -236,6 +244,7 @@ class Reader:
 
     def __init__(self, wpm=20, cwpm=0, codeType=config.CodeType.american, callback=None, decode_at_detected=False):
         self._codeType  = codeType     # American or International
+        loadCodeTables(codeType)
         self.setWPM(wpm, cwpm)
         self._codeBuf   = ['', '']     # code elements for two characters
         self._spaceBuf  = [0, 0]       # space before each character
@@ -357,6 +366,7 @@ class Reader:
                     self._space = 0
                 elif self._mark > 0:  # continuation of mark
                     self._mark += c
+        trace.mark(codeSeq, trace.Stage.DECODE)
         if use_flusher and not self._shutdown.is_set():
             self._flusher = Timer(((20.0 * self._truDot) / 1000.0), self._flushHandler)  # if idle call `flush`
             self._flusher.setName("Reader-Flusher <:{}".format(current_thread().name))
@@ -522,8 +532,10 @@ class Reader:
         if code != '' and s == '':
             s = '[' + code + ']'
         cb = self._char_callback
-        if s != '' and cb:
-            cb(s, float(sp1) / (3 * self._truDot) - 1)
+        if s != '':
+            _m_chars.inc()
+            if cb:
+                cb(s, float(sp1) / (3 * self._truDot) - 1)
         return
 
     def lookupChar(self, code):
@@ -51,13 +51,15 @@ import threading
 import time
 from datetime import datetime, timedelta
 from enum import Enum, IntEnum, unique
-from pykob import kob, log
+from pykob import kob, log, metrics, scheduler
 from threading import Event, Lock, Thread
 from typing import Optional
 
 PYKOB_RECORDING_EXT = ".pkrec"
 PYKOB_RECORDING_EXT_DEP = ".json"  # Deprecated file extension for recordings
 
+_m_write = metrics.histogram("pykob_recorder_write_seconds", "Time to write a code sequence to a recording.")
+
 @unique
 class PlaybackState(IntEnum):
     """
@@ -131,6 +133,20 @@ def hms_from_ts(ts1: int, ts2: int) -> str:
     tdelta = timedelta(milliseconds=duration)
     return str(tdelta)
 
+def read_packets(path: str):
+    """
+    Generator that reads a recording and yields each packet (dict).
+
+    Blank lines and comment lines (leading '#' or '//') are skipped.
+    """
+    ex = re.compile(r"^(\s*|(\s*(#|(//)+).*)?)$")
+    with open(path, "r") as fp:
+        for line in fp:
+            if ex.match(line):
+                continue
+            yield json.loads(line)
+    return
+
 class Recorder:
     """
     Recorder class provides functionality to record and playback a code stream.
@@ -162,7 +178,7 @@ class Recorder:
 
         self._shutdown = Event()
         self._thread_playback = None
-        self._thread_pb_stations = None
+        self._job_pb_stations = None
 
         self._playback_resume_flag = Event()
         self._playback_stop_flag = Event()
@@ -261,11 +277,10 @@ class Recorder:
         self.shutdown()
         # Wait on our threads.
         log.debug("recorder.exit - 2", 3)
-        if self._thread_pb_stations and self._thread_pb_stations.is_alive():
-            log.debug("recorder.exit - 3a", 3)
-            self._thread_pb_stations.join()
-            log.debug("recorder.exit - 3b", 3)
-            self._thread_pb_stations = None
+        if self._job_pb_stations:
+            log.debug("recorder.exit - 3", 3)
+            self._job_pb_stations.cancel()
+            self._job_pb_stations = None
         if self._thread_playback and self._thread_playback.is_alive():
             log.debug("recorder.exit - 4a", 3)
             self._thread_playback.join()
@@ -288,9 +303,11 @@ class Recorder:
                 "t":text,
                 "c":code
             }
+            t_start = time.perf_counter()
             with open(self._target_file_path, "a+") as fp:
                 json.dump(data, fp)
                 fp.write('\n')
+            _m_write.observe(time.perf_counter() - t_start)
 
     def playback_move_seconds(self, seconds: int):
         """
@@ -536,8 +553,10 @@ class Recorder:
         self._thread_playback = Thread(name='Recorder-Playback-Play', daemon=True, target=self._thread_playback_body)
         self._thread_playback.start()
         if self._play_station_list_callback:
-            self._thread_pb_stations = Thread(name='Recorder-Playback-StationList', daemon=True, target=self._thread_pb_stations_body)
-            self._thread_pb_stations.start()
+            if self._job_pb_stations:
+                self._job_pb_stations.cancel()
+            self._job_pb_stations = scheduler.shared().every(
+                'Recorder-Playback-StationList', 5.0, self._job_pb_stations_body, delay=0)
         if self._list_data:
             # Print some values about the recording
             print(
@@ -701,23 +720,22 @@ class Recorder:
             log.debug("{} thread done.".format(threading.current_thread().name))
         return
 
-    def _thread_pb_stations_body(self):
+    def _job_pb_stations_body(self):
         """
-        Called by the station list thread run method to update a station list 
-        via the registered callback. The station list is refreshed every 5 seconds.
+        Called periodically by the shared scheduler to update a station list
+        via the registered callback. The station list is refreshed every 5 seconds
+        until playback is stopped.
         """
-        try:
-            if not self._play_station_list_callback:
-                return
-            while not self._shutdown.is_set():
-                for stn in self._p_stations:
-                    self._play_station_list_callback(stn)
-                stop = self._playback_stop_flag.is_set() # Wait until 'stop' flag is set or 5 seconds
-                if stop:
-                    return # Stop signalled - return from run method
-                self._shutdown.wait(5.0)
-        finally:
-            log.debug("{} thread done.".format(threading.current_thread().name))
+        job = self._job_pb_stations
+        if self._shutdown.is_set() or not self._play_station_list_callback:
+            if job:
+                job.cancel()
+            return
+        for stn in self._p_stations:
+            self._play_station_list_callback(stn)
+        if self._playback_stop_flag.is_set():
+            if job:
+                job.cancel()
         return
 
 """
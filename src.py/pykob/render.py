@@ -0,0 +1,223 @@
+"""
+MIT License
+
+Copyright (c) 2020-24 PyKOB - MorseKOB in Python
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+"""
+render module
+
+Renders code to an audio (WAV) file, without playing it in real time.
+
+Text is encoded by a `morse.Sender` and recordings are read from `.pkrec`
+files, using the same timing that `KOB.soundCode` and `Recorder` playback
+use. The sounder samples (from `resources`) or the synthesized tone are mixed
+by an `audio.Mixer` directly into the output, and written a chunk at a time,
+so rendering takes a fraction of the time it would take to play the code and
+the memory used doesn't depend on the length of the output.
+"""
+import wave
+from pathlib import Path
+from pykob import audio, config, log, morse, recorder
+from pykob.config import AudioType, CodeType, Spacing
+from typing import Optional, Sequence
+
+CHUNK_FRAMES = 4096  # Frames mixed and written at a time
+
+class Renderer:
+    """
+    Render code sequences to a WAV file (48kHz, 16 bit, stereo).
+    """
+    def __init__(self, path, audio_type=AudioType.SOUNDER, tone_frequency=audio.TONE_FREQUENCY):
+        # type: (str|Path, AudioType, int) -> None
+        self._path = path                       # type: str|Path
+        self._audio_type = audio_type           # type: AudioType
+        self._mixer = audio.Mixer(voices=2, max_frames=CHUNK_FRAMES)
+        self._frame_rate = self._mixer.frame_rate  # type: int
+        self._sound_ids = [-1, -1]              # type: list[int]
+        self._tone = None                       # type: audio.Wavetable|None
+        if audio_type == AudioType.SOUNDER:
+            resource_folder = Path(audio.__file__).parent / "resources"
+            self._sound_ids[0] = self._mixer.add_wav(resource_folder / "clack48.wav")
+            self._sound_ids[1] = self._mixer.add_wav(resource_folder / "click48.wav")
+        else:
+            self._tone = audio.get_wavetable(tone_frequency, self._frame_rate)
+        self._silence = bytes(CHUNK_FRAMES * 4)
+        self._frames = 0                        # type: int  # Frames written
+        self._t_ms = 0.0                        # type: float  # Time (ms) of the code processed
+        self._energized = False                 # type: bool
+        self._wav = wave.open(str(path), "wb")
+        self._wav.setnchannels(2)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(self._frame_rate)
+        return
+
+    @property
+    def duration(self):  # type: () -> float
+        """
+        Duration (seconds) of the audio rendered so far.
+        """
+        return self._t_ms / 1000.0
+
+    @property
+    def frames_written(self):  # type: () -> int
+        return self._frames
+
+    def _energize(self, energize):  # type: (bool) -> None
+        if energize == self._energized:
+            return
+        self._energized = energize
+        if self._tone:
+            if energize:
+                self._mixer.tone_on(0, self._tone)
+            else:
+                self._mixer.tone_off(0)
+        else:
+            snd = audio.SOUND_CLICK if energize else audio.SOUND_CLACK
+            self._mixer.play(snd, self._sound_ids[snd])
+        return
+
+    def _render_to(self, t_ms):  # type: (float) -> None
+        """
+        Mix and write the audio up to time `t_ms`.
+        """
+        self._t_ms = max(self._t_ms, t_ms)
+        end = int(self._t_ms * self._frame_rate / 1000.0)
+        while self._frames < end:
+            n = min(end - self._frames, CHUNK_FRAMES)
+            if self._mixer.active:
+                self._wav.writeframesraw(self._mixer.mix(n))
+            else:
+                self._wav.writeframesraw(self._silence[:n * 4])
+            self._frames += n
+        return
+
+    def close(self):  # type: () -> None
+        """
+        Let any sound that is still playing finish, then close the file.
+        """
+        if self._wav:
+            self._energize(False)
+            while self._mixer.active:
+                self._render_to(self._t_ms + (CHUNK_FRAMES * 1000.0 / self._frame_rate))
+            self._wav.close()  # Updates the header with the final length
+            self._wav = None
+            log.debug("Render: {} frames ({:.1f} seconds) written to: {}".format(
+                self._frames, self._frames / self._frame_rate, self._path), 2)
+        return
+
+    def pause(self, seconds):  # type: (float) -> None
+        """
+        Render silence (the sounder state doesn't change).
+        """
+        self._render_to(self._t_ms + seconds * 1000.0)
+        return
+
+    def render_code(self, code):  # type: (Sequence[int]) -> None
+        """
+        Render a code sequence, with the same timing as `KOB.soundCode`.
+        """
+        for c in code:
+            if c < -3000:  # long pause, change of senders, or missing packet
+                c = -1
+            if c == 1 or c > 2:  # start of mark
+                self._energize(True)
+            self._render_to(self._t_ms + abs(c))
+            if c > 1:  # end of (nonlatching) mark
+                self._energize(False)
+        return
+
+    def render_recording(self, path, max_silence=0, speed_factor=100):
+        # type: (str, float, int) -> None
+        """
+        Render a recording, with the same timing as `Recorder` playback.
+
+        max_silence: Longest silence (seconds) between code sequences. 0 to
+            render all silence as recorded.
+        speed_factor: Percentage to adjust the code speed by.
+        """
+        pblts = -1
+        station_id = None
+        for data in recorder.read_packets(path):
+            code = data['c']        # Code sequence
+            ts = data['ts']         # Timestamp
+            station = data['s']     # Station ID
+            if pblts < 0:
+                pblts = ts
+            pblts, ts_prev = ts, pblts
+            if code == []:  # Ignore empty code packets
+                continue
+            codePause = -code[0] / 1000.0
+            pause = 0
+            if codePause == 32.767 and len(code) > 1 and code[1] == 2:
+                # Probable sender change
+                if not station == station_id:
+                    pause = round((ts - ts_prev) / 1000, 4)
+            elif codePause > 2.0 and codePause < 32.767:
+                # Long pause in sent code
+                pause = round((((ts - ts_prev) / 1000) - 2.0), 4)
+                code[0] = -2000
+            if pause > 0:
+                if max_silence > 0 and pause > max_silence:
+                    pause = max_silence
+                self.pause(pause)
+            if not speed_factor == 100:
+                sf = 1.0 / (speed_factor / 100.0)
+                code[:] = [round(sf * c) if (c < 0 or c > 2) and c != -32767 else c for c in code]
+            station_id = station
+            self.render_code(code)
+        return
+
+    def render_text(self, text, wpm, cwpm=0, code_type=CodeType.american, spacing=Spacing.char):
+        # type: (str, int, int, CodeType, Spacing) -> None
+        """
+        Render text, encoded by a `morse.Sender`.
+        """
+        sender = morse.Sender(wpm, cwpm, code_type, spacing)
+        for c in text:
+            code = sender.encode(c)
+            if code:
+                self.render_code(code)
+        return
+
+"""
+Test code
+"""
+if __name__ == "__main__":
+    # Self-test
+    import os
+    import tempfile
+    import time
+
+    text = "The quick brown fox jumps over the lazy dog. " * 20
+    for audio_type in (AudioType.SOUNDER, AudioType.TONE):
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        t = time.perf_counter()
+        r = Renderer(path, audio_type)
+        r.render_text(text, 20)
+        r.close()
+        dt = time.perf_counter() - t
+        with wave.open(path, "rb") as w:
+            frames = w.getnframes()
+        print("{}: {:.1f} seconds of audio rendered in {:.2f} seconds ({:.0f}x). {} frames.".format(
+            audio_type.name, r.duration, dt, r.duration / dt, frames))
+        os.remove(path)
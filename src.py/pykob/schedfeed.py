@@ -0,0 +1,492 @@
+"""
+MIT License
+
+Copyright (c) 2020-24 PyKOB - MorseKOB in Python
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+"""
+schedfeed module
+
+Scheduled Feed (SchedFeed) processing. A SchedFeed spec file (.mrtsfs)
+specifies messages to be sent at given times or when the wire has been idle.
+Used by MRT and the FeedServer.
+"""
+import json
+from enum import IntEnum, unique
+import os
+from pathlib import Path
+import random
+import re  # RegEx
+from threading import Event
+import time
+from typing import Any, Callable
+
+from pykob.morse import Sender
+
+class SchedFeedError(Exception):
+    pass
+class MultipleSFConditions(SchedFeedError):
+    pass
+
+class SFConditionUnknown(SchedFeedError):
+    pass
+class SFConditionTimeInvalid(SchedFeedError):
+    pass
+
+class SFConditionPeriodInvalid(SchedFeedError):
+    pass
+
+class SFConditionMultipleMsgMsgsEntries(SchedFeedError):
+    pass
+
+class SFConditionMsgsNotList(SchedFeedError):
+    pass
+
+class SFControlInvalid(SchedFeedError):
+    pass
+
+class _SFSpecOp:
+    """
+    Internal class to contain a Scheduled Feed Spec and operation history.
+
+    Contains:
+        condition   - The condition that triggers the feed
+        time        - The time/period specified for the condition
+        msg         - A single message (if a single one was specified)
+        msgs        - A list of messages (if multiple were specified, used randomly)
+        --------
+        last_dt     - The date-time of the last transmission
+    """
+
+    def __init__(self, spec):  # type: (dict[str,Any]) -> None
+        self._condition = None      # type: SchedFeedProcessor._Condition|None
+        self._time = None           # type: int|None
+        self._period = None         # type: int|None
+        self._msg = None            # type: str|None
+        self._msgs = None           # type: list[str]|None
+        self._last_activity = -1    # type: int
+        self._last_dt = -1          # type: int
+        #
+        for key, value in spec.items():
+            if (key == SchedFeedProcessor._Condition.at.name
+                or key == SchedFeedProcessor._Condition.at_ii.name
+                or key == SchedFeedProcessor._Condition.when_i.name
+                or key == SchedFeedProcessor._Condition.idle.name):
+                if self._condition is not None:
+                    raise MultipleSFConditions("SchedFeed condition {} already set when condition {} was encountered in spec.".format(self._condition, value))
+                self._condition = SchedFeedProcessor._Condition[key]
+                if self._condition == SchedFeedProcessor._Condition.idle:
+                    try:
+                        self._period = int(value)
+                        if self._period < 1 or self._period > 2359:
+                            raise SFConditionPeriodInvalid("SchedFeed spec period value {} is not valid. Period must be 0 < p < 2400.".format(self._period))
+                    except ValueError as ex:
+                        raise SFConditionPeriodInvalid("SchedFeed spec period specified is invalid {}. Must be an integer. Error: {}".format(value, ex))
+                else:
+                    try:
+                        self._time = int(value)
+                        if self._time < 0 or self._time > 2359:
+                            raise SFConditionPeriodInvalid("SchedFeed spec time value {} is not valid. Time must be 0 <= p < 2400.".format(self._time))
+                    except ValueError as ex:
+                        raise SFConditionPeriodInvalid("SchedFeed spec time specified is invalid {}. Must be an integer. Error: {}".format(value, ex))
+            elif key == "msg":
+                if self._msg is not None or self._msgs is not None:
+                    raise SFConditionMultipleMsgMsgsEntries("Only a single 'msg' or 'msgs' entry is allowed in a SchedFeed spec.")
+                self._msg = value
+            elif key == "msgs":
+                if self._msg is not None or self._msgs is not None:
+                    raise SFConditionMultipleMsgMsgsEntries("Only a single 'msgs' or 'msg' entry is allowed in a SchedFeed spec.")
+                if not isinstance(value, list):
+                    raise SFConditionMsgsNotList("The SchedFeed spec 'msgs' value must be a list of two or more message strings.")
+                self._msgs = list()
+                for v in value:
+                    self._msgs.append(str(v))
+                pass
+            else:
+                raise SFConditionUnknown("Unknown SchedFeed condition '{}'")
+            pass
+        # Adjust the last time sent and activity
+        self._last_activity = time.time()//60
+        if self._time is not None:
+            t0 = time.localtime()
+            now_mins = t0.tm_hour*60 + t0.tm_min  # current time (min)
+            tMsg = 60*(self._time//100) + (self._time%100)  # time to send message
+            if tMsg < now_mins:
+                # Trigger time is in the past for today. Indicate that we've sent.
+                self._last_dt = now_mins
+        return
+
+    def __str__(self):
+        s = ""
+        if self._condition == SchedFeedProcessor._Condition.idle:
+            s = "Idle for {} minutes, send: ".format(self._period)
+        elif self._condition == SchedFeedProcessor._Condition.at:
+            s = "At {}, send: ".format(self._time)
+        elif self._condition == SchedFeedProcessor._Condition.at_ii:
+            s = "At {}, if idle, send: ".format(self._time)
+        else:
+            s = "When idle at/after {}, send ".format(self._time)
+        if self._msg is not None:
+            s += self._msg
+        elif self._msgs is not None:
+            s += self._msgs
+        return (s)
+
+    def __repr__(self):
+        return self.__str__()
+
+    @property
+    def condition(self):  # type: () -> SchedFeedProcessor._Condition
+        return self._condition
+
+    @property
+    def last_activity(self):  # type: () -> int
+        return self._last_activity
+    @last_activity.setter
+    def last_activity(self, t):  # type: (int) -> None
+        self._last_activity = t
+        return
+
+    @property
+    def last_dt(self):  # type: () -> int
+        return self._last_dt
+    @last_dt.setter
+    def last_dt(self, dt):  # type: (int) -> None
+        self._last_dt = dt
+        return
+
+    @property
+    def msg(self):  # type: () -> str|None
+        return self._msg
+
+    @property
+    def msgs(self):  # type: () -> list[str]|None
+        return self._msgs
+
+    @property
+    def period(self):  # type: () -> int|None
+        return self._period
+
+    @property
+    def time(self):  # type: () -> int|None
+        return self._time
+
+class SchedFeedProcessor:
+    """
+    Loads and parses a SchedFeed Spec to create a definition of what needs
+    to be sent and what times.
+
+    Methods are provided that need to be called as activity occurs such that
+    the class knows when the wire is idle, and how long it has been idle.
+
+    A method is also provided that needs to be called so the current time can
+    be checked to see if something needs to be sent. `next_due` gives the time
+    until it needs to be called again.
+
+    The format of a spec is as follows (example):
+    {
+        "specs": [
+            {
+                "at":815,
+                "msg":"~ ES ON +     ~ OK ES +"
+            },
+            {
+                "at_ii":1310,
+                "msg":"~ ES CHECKING IN +     ~ OK ES +"
+            },
+            {
+                "when_i":1310,
+                "msg":"~ ES CHECKING IN +     ~ OK ES +"
+            },
+            {
+                "idle":15,
+                "msgs":[
+                    "~ «$STN_NAME» SEEING WHO IS THERE. = OK «$STN_NAME» +",
+                    "~ «$STN_NAME» INVITING YOU TO JOIN IN. = OK «$STN_NAME» +",
+                    "~ «$STN_NAME» WELCOME TO OUR WIRE. = «P3.2» WE HOPE YOU ARE ENJOYING YOURSELF. OK «$STN_NAME» +",
+                    "~ «$STN_NAME» PLEASE COME VISIT «$SITE_NAME» AND SEE US IN ACTION. = OK «$STN_NAME» +"
+                ]
+            }
+        ]
+    }
+
+    The value of specs is an array/list with a condition and a time or period and a msg with a text_string or a msgs with an array/list of text_strings.
+    condition is one of:
+    at : Sends a message at a specified time. The message will be sent no matter what (it will break in if the wire is currently active).
+    at_ii : Send a message at a specified time if the wire is idle. If the wire is active, the message will not be sent.
+    when_i : Send a message as soon as the wire is idle at, or as soon after, the specified time.
+    idle : Send a message if the wire is idle for the specified period.
+
+    time or period : 24-Hour Hour+Minute value.
+
+    msg : A single text_string containing the message to be sent.
+    msgs : Array/list of text_string values. One of the messages will be used at random when a message is to be sent.
+
+    The text_string can include plain text, or the following special characters/sequences:
+    '~' : Opens the key (same as keyboard sending)
+    '+' : Closes the key (same as keyboard sending)
+    ' «ctrl» : Control value, which is one of: ('«' is Unicode U+00AB and '»' is Unicode U+00BB)
+    $env_var : Replaced with the value of the environment variable env_var
+    Pseconds : Pause the given number of seconds (can be fractional)
+
+    """
+
+    MRT_SCHDFEED_SPEC_EXT = ".mrtsfs"
+    NEXT_DUE_MARGIN = 0.05  # Seconds past a due time, to be sure the minute has changed
+
+    SPECS_KEY = "specs"
+    #
+    AT_KEY = "at"
+    AT_IF_IDLE_KEY = "at_ii"
+    WHEN_IDLE_KEY = "when_i"
+    IDLE_KEY = "idle"
+    #
+    MSG_KEY = "msg"
+    MSGS_KEY = "msgs"
+    #
+    CTRL_VAL_START_CHAR = '\u00AB'  # Unicode character: «
+    CTRL_VAL_END_CHAR = '\u00BB'    # Unicode character: »
+    CTRL_VAL_ENV_VAR_START = '$'    # Environment variables are specified by '$'
+    CTRL_VAL_PAUSE_VAR_START = 'P'  # Pause 4.2 seconds example: "P4.2"
+
+    @unique
+    class _Condition(IntEnum):
+        at = 1
+        at_ii = 2
+        when_i = 3
+        idle = 4
+
+
+    def add_ext_if_needed(s: str) -> str:
+        """
+        Add the MRT scheduled feed spec file extension if needed.
+
+        Adds '.mrtsfs' to the string argument if it doesn't already end with it.
+        """
+        if s and not s.endswith(SchedFeedProcessor.MRT_SCHDFEED_SPEC_EXT):
+            return (s + SchedFeedProcessor.MRT_SCHDFEED_SPEC_EXT)
+        return s
+
+    def __init__(self, schedfeed_spec_path, morse_sender, code_char_send_callback, shutdown_event, pause_callback=None):
+        # type: (Path|None, Sender, Callable[[tuple[int,...],str], None], Event, Callable[[float], None]|None) -> None
+        """
+        `pause_callback` is called with the seconds for a Pause control. If it
+        is None, the pause is done by waiting (on the shutdown event).
+        """
+        self._schedfeed_spec_path = schedfeed_spec_path
+        self._sender = morse_sender
+        self._code_char_send = code_char_send_callback
+        self._shutdown = shutdown_event
+        self._pause = pause_callback if pause_callback else shutdown_event.wait
+        self._spec_ops = None  # type: list[_SFSpecOp]|None
+
+        self._load_specs()
+        return
+
+    def _load_specs(self):  # type: () -> None
+        if self._schedfeed_spec_path:
+            specs = None
+            jd = None
+            with open(self._schedfeed_spec_path, 'r', encoding="utf-8") as fp:
+                jd = json.load(fp)
+            if jd:
+                specs = jd[SchedFeedProcessor.SPECS_KEY]
+            if specs:
+                self._spec_ops = list()
+                for spec in specs:
+                    self._spec_ops.append(_SFSpecOp(spec))
+                pass
+            pass
+        return
+
+    def _process_ctrl(self, msg, index):  # type: (str, int) -> int
+        """
+        Process a control sequence within a message. The `index` param is pointing
+        to the lead-in ctrl character.
+
+        Return the index of the beginning of the remainder of the message.
+        """
+        i = index + 1  # The first character of the control sequence
+        ctrl = ''
+        if i < len(msg):
+            ctrl = msg[i]
+            i += 1
+        if not (ctrl == SchedFeedProcessor.CTRL_VAL_ENV_VAR_START or ctrl == SchedFeedProcessor.CTRL_VAL_PAUSE_VAR_START):
+            raise SFControlInvalid("Unknown Control '{}' in message: '{}'".format(ctrl, msg))
+        # Read the control value
+        s = msg[i:]
+        ex = re.compile("^([^»]*)(»)")
+        m = ex.match(s)
+        if m:
+            cv = m.group(1)
+            ce = m.group(2)
+            if not cv or len(cv) == 0:
+                raise SFControlInvalid("No Control Value found for '{}' in message: '{}'".format(ctrl, msg))
+            if not ce or len(ce) == 0:
+                raise SFControlInvalid("Control close not found for '{}' in message: '{}'".format(ctrl, msg))
+            if ctrl == SchedFeedProcessor.CTRL_VAL_ENV_VAR_START:
+                # cv is the name of an environment variable. Get the value and send it.
+                evv = os.environ.get(cv)
+                if evv is not None:
+                    self._send_message(evv)
+                pass
+            else:
+                # ctrl_val should be a float value to use as a delay
+                d = 0.0
+                try:
+                    d = float(cv)
+                except ValueError as ex:
+                    raise SFControlInvalid("Invalid Pause value '{}' in message: '{}'  Error: {}".format(cv, msg, ex))
+                self._pause(d)
+            return (i + len(cv) + len(ce))
+        raise SFControlInvalid("Invalid Control Value for '{}' in message: '{}'".format(ctrl, msg))
+
+    def _send_msg_from_spec(self, spec):  # type: (_SFSpecOp) -> None
+        """
+        Send the message if there is a single one, or randomly send one of the
+        list of messages from the spec.
+        """
+        msg = None
+        if spec.msg is not None:
+            msg = spec.msg
+        elif spec.msgs is not None:
+            ec = len(spec.msgs)
+            rnd_indx = random.randint(0, ec-1)
+            msg = spec.msgs[rnd_indx]
+        if msg is not None and len(msg) > 0:
+            self._send_message(msg)
+        return
+
+    def _send_message(self, msg):  # type: (str) -> None
+        """
+        Send a message from the SchedFeed Spec as though it was from the keyboard.
+        """
+        try:
+            i = 0  # Use an index to allow processing parts
+            while i < len(msg):
+                ch = msg[i]
+                # Check for a Control Sequence
+                if ch == SchedFeedProcessor.CTRL_VAL_START_CHAR:
+                    i = self._process_ctrl(msg, i)
+                else:
+                    i += 1
+                    code = self._sender.encode(ch)
+                    self._code_char_send(code, ch)
+                pass
+            pass
+        except Exception as ex:
+            print("<<< SchedFeed sender encountered an error on message: '{}'  Error: {}".format(msg, ex))
+        return
+
+    def activity(self):  # type: () -> None
+        """
+        Should be called by MRT any time characters are sent or received.
+        """
+        if not self._spec_ops:
+            return
+        now_mins = time.time()//60  # Now in integer minutes
+        for spec in self._spec_ops:
+            if spec.condition == SchedFeedProcessor._Condition.idle:
+                spec.last_activity = now_mins
+            pass
+        return
+
+    def next_due(self):  # type: () -> float|None
+        """
+        Return the number of seconds until `process` needs to be called (an 'at'
+        time, an idle period expiring, or midnight to reset the daily specs).
+        It should also be called when the wire or key state changes.
+
+        Returns None if there are no specs.
+        """
+        if not self._spec_ops:
+            return None
+        t = time.time()
+        t0 = time.localtime(t)
+        now_mins = t0.tm_hour*60 + t0.tm_min
+        to_next_min = 60.0 - (t % 60.0)  # Seconds to the start of the next minute
+        due = (24*60 - now_mins - 1)*60 + to_next_min  # Midnight
+        for spec in self._spec_ops:
+            if spec.time is not None:
+                tMsg = 60*(spec.time//100) + (spec.time%100)  # time to send message
+                if now_mins < tMsg:
+                    due = min(due, (tMsg - now_mins - 1)*60 + to_next_min)
+                elif spec.last_dt < 0:
+                    # Waiting for the wire to be idle ('when_i'). State changes will
+                    # also call `process`, but check again in the next minute.
+                    due = min(due, to_next_min)
+            elif spec.period is not None:
+                due = min(due, (spec.last_activity + spec.period)*60 - t)
+            pass
+        return max(due, 0.0) + SchedFeedProcessor.NEXT_DUE_MARGIN
+
+    def process(self, key_closed, wire_active):  # type: (bool, bool) -> None
+        """
+        Process specs based on the current time and wire state.
+
+        This MUST BE CALLED by the main code flow when `next_due` indicates and
+        when the wire or key state changes, to allow SchedFeed conditions to be
+        checked to see if any messages need to be sent.
+
+        Param key_closed indicates if the local (virtual) key is closed.
+        Param wire_active indicates if a remote station is currently active on the wire.
+        """
+        if not self._spec_ops:
+            return
+        # Get current time in minutes
+        t0 = time.localtime()
+        now_mins = t0.tm_hour*60 + t0.tm_min
+        #
+        # Run through the specs and see if the condition is met.
+        for spec in self._spec_ops:
+            if spec.time is not None:   # If the spec has a time see if now is the time to do something
+                tMsg = 60*(spec.time//100) + (spec.time%100)  # time to send message
+                if now_mins < tMsg and spec.last_dt >= 0:
+                    # It is before the trigger time for today, yet the last sent time is set...
+                    # Reset the last sent time for today.
+                    spec.last_dt = -1
+                    continue
+                if now_mins >= tMsg:   # Now could be the time
+                    if spec.last_dt < 0:    # The operation has not yet been performed
+                        if spec.condition == SchedFeedProcessor._Condition.at:
+                            # 'AT' Sends now, regardless of other activity.
+                            spec.last_dt = now_mins  # Mark as done
+                            self._send_msg_from_spec(spec)
+                        elif spec.condition == SchedFeedProcessor._Condition.at_ii:
+                            # 'AT If Idle' Sends now, if the wire is idle, otherwise it is skipped.
+                            spec.last_dt = now_mins  # Mark as done (even if we don't send)
+                            if not wire_active:
+                                self._send_msg_from_spec(spec)
+                        elif spec.condition == SchedFeedProcessor._Condition.when_i:
+                            # 'When Idle' will send as soon as the wire is idle
+                            if not wire_active and key_closed:
+                                self._send_msg_from_spec(spec)
+                                spec.last_dt = now_mins
+                        pass
+                    pass
+                pass
+            elif spec.period is not None:  # If the spec has a period, see if it has been long enough.
+                dt = (time.time()//60) - spec.last_activity
+                if dt >= spec.period:
+                    self._send_msg_from_spec(spec)
+                pass
+            pass
+        return
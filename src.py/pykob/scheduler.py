@@ -0,0 +1,303 @@
+"""
+MIT License
+
+Copyright (c) 2020-24 PyKOB - MorseKOB in Python
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+"""
+scheduler module
+
+Provides a single shared housekeeping scheduler that runs periodic and one-shot
+jobs on one thread. Components that only need to poll (check a port, send a
+keep-alive, refresh a list) register a job rather than creating a thread of
+their own that spends its life waiting.
+
+Jobs run on the scheduler thread, one at a time, so they must be short and must
+not block for long. A job that raises an exception is logged and, if periodic,
+continues to be scheduled.
+
+The time each job takes to run is tracked, and can be obtained using `report`.
+"""
+import heapq
+import threading
+from threading import Condition, Thread
+import time
+import traceback
+from typing import Any, Callable, Optional
+
+from pykob import log
+
+class JobStats:
+    """
+    Run time statistics for jobs of a given name.
+    """
+    def __init__(self, name):  # type: (str) -> None
+        self.name = name            # type: str
+        self.runs = 0               # type: int
+        self.errors = 0             # type: int
+        self.t_total = 0.0          # type: float
+        self.t_max = 0.0            # type: float
+        self.late_max = 0.0         # type: float  # Longest a job ran after it was due
+        return
+
+    @property
+    def t_mean(self):  # type: () -> float
+        return (self.t_total / self.runs) if self.runs > 0 else 0.0
+
+class Job:
+    """
+    A scheduled job. Returned from `Scheduler.every` and `Scheduler.once`.
+    Cancel it with `cancel`.
+    """
+    def __init__(self, scheduler, name, period, fn, args):
+        # type: (Scheduler, str, Optional[float], Callable[..., Any], tuple) -> None
+        self._scheduler = scheduler     # type: Scheduler
+        self._name = name               # type: str
+        self._period = period           # type: float|None
+        self._fn = fn                   # type: Callable[..., Any]
+        self._args = args               # type: tuple
+        self._t_due = 0.0               # type: float
+        self._cancelled = False         # type: bool
+        return
+
+    @property
+    def active(self):  # type: () -> bool
+        return not self._cancelled
+
+    @property
+    def name(self):  # type: () -> str
+        return self._name
+
+    @property
+    def period(self):  # type: () -> float|None
+        """
+        The period (seconds) of a periodic job. None for a one-shot job.
+        """
+        return self._period
+
+    @period.setter
+    def period(self, secs):  # type: (float) -> None
+        """
+        Change the period of a periodic job. Takes effect after the next run.
+        """
+        if self._period is not None:
+            self._period = secs
+        return
+
+    def cancel(self):  # type: () -> None
+        """
+        Cancel the job. Can be called from any thread, including from the job itself.
+        """
+        self._cancelled = True
+        self._scheduler._wakeup()
+        return
+
+class Scheduler:
+    """
+    Runs periodic and one-shot jobs on a single thread.
+    """
+    def __init__(self, name="PyKOB-Scheduler"):  # type: (str) -> None
+        self._name = name                           # type: str
+        self._cond = Condition()                    # type: Condition
+        self._heap = []                             # type: list[tuple[float,int,Job]]
+        self._seq = 0                               # type: int
+        self._stats = {}                            # type: dict[str,JobStats]
+        self._shutdown = False                      # type: bool
+        self._thread = None                         # type: Thread|None
+        return
+
+    def _add(self, job, delay):  # type: (Job, float) -> Job
+        with self._cond:
+            if self._shutdown:
+                job._cancelled = True
+                return job
+            job._t_due = time.monotonic() + delay
+            self._seq += 1
+            heapq.heappush(self._heap, (job._t_due, self._seq, job))
+            if not job.name in self._stats:
+                self._stats[job.name] = JobStats(job.name)
+            if not self._thread:
+                self._thread = Thread(name=self._name, daemon=True, target=self._thread_scheduler_body)
+                self._thread.start()
+            self._cond.notify()
+        return job
+
+    def _run(self, job, t_now):  # type: (Job, float) -> None
+        stats = self._stats[job.name]
+        late = t_now - job._t_due
+        t_start = time.perf_counter()
+        try:
+            job._fn(*job._args)
+        except Exception:
+            stats.errors += 1
+            log.error("Scheduler job '{}' error:".format(job.name))
+            log.debug(traceback.format_exc(), 3)
+        t_run = time.perf_counter() - t_start
+        with self._cond:
+            stats.runs += 1
+            stats.t_total += t_run
+            if t_run > stats.t_max:
+                stats.t_max = t_run
+            if late > stats.late_max:
+                stats.late_max = late
+            if job._period is not None and not job._cancelled and not self._shutdown:
+                # Schedule from when it was due (to avoid drift), but don't try to catch up.
+                job._t_due += job._period
+                now = time.monotonic()
+                if job._t_due < now:
+                    job._t_due = now + job._period
+                self._seq += 1
+                heapq.heappush(self._heap, (job._t_due, self._seq, job))
+            else:
+                job._cancelled = True
+        return
+
+    def _thread_scheduler_body(self):  # type: () -> None
+        """
+        Called by the scheduler thread `run` to run the jobs as they become due.
+        """
+        while True:
+            with self._cond:
+                job = None
+                while not self._shutdown:
+                    # Discard cancelled jobs at the head of the queue
+                    while self._heap and self._heap[0][2]._cancelled:
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    now = time.monotonic()
+                    t_due = self._heap[0][0]
+                    if t_due > now:
+                        self._cond.wait(t_due - now)
+                        continue
+                    job = heapq.heappop(self._heap)[2]
+                    break
+                if self._shutdown:
+                    break
+            self._run(job, now)
+        log.debug("{} thread done.".format(threading.current_thread().name))
+        return
+
+    def _wakeup(self):  # type: () -> None
+        with self._cond:
+            self._cond.notify()
+        return
+
+    def every(self, name, period, fn, *args, delay=None):
+        # type: (str, float, Callable[..., Any], Any, float|None) -> Job
+        """
+        Run `fn(*args)` every `period` seconds. The first run is after `delay`
+        seconds (defaults to `period`).
+        """
+        job = Job(self, name, period, fn, args)
+        return self._add(job, period if delay is None else delay)
+
+    def once(self, name, delay, fn, *args):
+        # type: (str, float, Callable[..., Any], Any) -> Job
+        """
+        Run `fn(*args)` once, after `delay` seconds.
+        """
+        job = Job(self, name, None, fn, args)
+        return self._add(job, delay)
+
+    def report(self):  # type: () -> str
+        """
+        Return a text table of the job run times (milliseconds).
+        """
+        lines = ["{:<32} {:>7} {:>6} {:>9} {:>9} {:>9}".format(
+            "Job (ms)", "runs", "errors", "mean", "max", "late max")]
+        with self._cond:
+            for stats in sorted(self._stats.values(), key=lambda s: s.name):
+                lines.append("{:<32} {:>7} {:>6} {:>9.3f} {:>9.3f} {:>9.3f}".format(
+                    stats.name, stats.runs, stats.errors,
+                    stats.t_mean * 1000.0, stats.t_max * 1000.0, stats.late_max * 1000.0))
+        return "\n".join(lines)
+
+    def exit(self):  # type: () -> None
+        """
+        Stop running jobs and wait for the scheduler thread to end.
+        """
+        self.shutdown()
+        t = self._thread
+        if t and t.is_alive() and not t is threading.current_thread():
+            t.join(timeout=2.0)
+        return
+
+    def shutdown(self):  # type: () -> None
+        """
+        Initiate shutdown of our operations (and don't start anything new),
+        but DO NOT BLOCK.
+        """
+        with self._cond:
+            self._shutdown = True
+            for entry in self._heap:
+                entry[2]._cancelled = True
+            self._heap.clear()
+            self._cond.notify()
+        return
+
+_shared = None  # type: Scheduler|None
+_shared_guard = threading.Lock()
+
+def shared():  # type: () -> Scheduler
+    """
+    The scheduler shared by all of the PyKOB components.
+    """
+    global _shared
+    with _shared_guard:
+        if _shared is None:
+            _shared = Scheduler()
+        return _shared
+
+def exit_shared():  # type: () -> None
+    """
+    Exit the shared scheduler (if it was used), logging the job report.
+    Called by applications as they exit.
+    """
+    global _shared
+    with _shared_guard:
+        s = _shared
+        _shared = None
+    if s:
+        s.exit()
+        log.debug("Scheduler jobs:\n{}".format(s.report()), 2)
+    return
+
+"""
+Test code
+"""
+if __name__ == "__main__":
+    # Self-test
+    sched = Scheduler()
+    ticks = []
+    job = sched.every("Test-Tick", 0.1, lambda: ticks.append(time.monotonic()))
+    sched.once("Test-Once", 0.25, print, "One-shot job ran.")
+    def _fail():
+        raise ValueError("expected failure")
+    sched.once("Test-Error", 0.3, _fail)
+    time.sleep(1.05)
+    job.cancel()
+    n = len(ticks)
+    time.sleep(0.3)
+    print("Ticks: {} (after cancel: {})".format(n, len(ticks) - n))
+    print(sched.report())
+    sched.exit()
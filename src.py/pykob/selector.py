@@ -38,12 +38,11 @@ SOFTWARE.
 from enum import Enum, IntEnum, unique
 import sys
 import time
-import threading
-from threading import Event, Thread
+from threading import Event
 import traceback
 from typing import Optional
 
-from pykob import log
+from pykob import log, scheduler
 from pykob import serial as pkserial
 
 serialModuleAvailable = pkserial.SERIAL_AVAILABLE
@@ -98,75 +97,71 @@ class Selector:
         self._binary_value = 0
         self._raw_value = 0
         self._t_last_change = time.time()
+        self._values_need_updating = False
+        self._oof_changed = False
+        self._binary_changed = False
         #
         self._shutdown = Event()
-        self._thread_port_checker = Thread(name='Selector-PortReader', daemon=True, target=self._thread_port_checker_body)
+        self._job_port_checker = None  # type: scheduler.Job|None
 
     def _null_status_hdlr(self, msg):  # type: (str|None) -> None
         log.debug("Selector status: {}".format(msg), 5)
         return
 
-    def _thread_port_checker_body(self):
+    def _job_port_checker_body(self):
         """
-        Called by the Port Checker thread `run` to read the handshake values from the port.
+        Called periodically by the shared scheduler to read the handshake values from the port.
         """
-        try:
-            values_need_updating = False
-            oof_changed = False
-            binary_changed = False
-            while not self._shutdown.is_set():
-                if self._port and not self._port.closed:
-                    b0 = 1 if self._port.cts else 0
-                    b1 = 2 if self._port.dsr else 0
-                    b2 = 4 if self._port.cd else 0
-                    b3 = 8 if self._port.ri else 0
-                    rval = (b3+b2+b1+b0)
-                    if not rval == self._raw_value:
-                        self._raw_value = rval
-                        values_need_updating = True
-                        self._t_last_change = time.time()
-                    else:
-                        # The value read is the same as last time
-                        # see if enough time has passed to record it.
-                        now = time.time()
-                        if (now - self._t_last_change) >= self._steady_time:
-                            if values_need_updating:
-                                if not self._binary_value == rval:
-                                    self._binary_value = rval
-                                    binary_changed = True
-                                # 1 of 4 only if a single bit is set
-                                oof = 0
-                                if rval == 1:
-                                    oof = 1
-                                elif rval == 2:
-                                    oof = 2
-                                elif rval == 4:
-                                    oof = 3
-                                elif rval == 8:
-                                    oof = 4
-                                if not oof == self._one_of_four:
-                                    self._one_of_four = oof
-                                    oof_changed = True
-                                # Call On-Change?
-                                if self._on_change:
-                                    if (oof_changed and self._mode == SelectorMode.OneOfFour):
-                                        self._on_change(SelectorChange.OneOfFour, self._one_of_four)
-                                    else:
-                                        change = (SelectorChange.BinaryAnd1of4 if binary_changed and oof_changed else
-                                            (SelectorChange.Binary if binary_changed else SelectorChange.OneOfFour))
-                                        if (binary_changed and self._mode == SelectorMode.Binary):
-                                            self._on_change(change, self._binary_value)
-                                        else:
-                                            self._on_change(change, (self._binary_value, self._one_of_four))
-                                # Clear the flags
-                                values_need_updating = False
-                                oof_changed = False
-                                binary_changed = False
-                    pass
-                self._shutdown.wait(self._pole_cycle_time)
+        if self._shutdown.is_set():
+            return
+        if self._port and not self._port.closed:
+            b0 = 1 if self._port.cts else 0
+            b1 = 2 if self._port.dsr else 0
+            b2 = 4 if self._port.cd else 0
+            b3 = 8 if self._port.ri else 0
+            rval = (b3+b2+b1+b0)
+            if not rval == self._raw_value:
+                self._raw_value = rval
+                self._values_need_updating = True
+                self._t_last_change = time.time()
+            else:
+                # The value read is the same as last time
+                # see if enough time has passed to record it.
+                now = time.time()
+                if (now - self._t_last_change) >= self._steady_time:
+                    if self._values_need_updating:
+                        if not self._binary_value == rval:
+                            self._binary_value = rval
+                            self._binary_changed = True
+                        # 1 of 4 only if a single bit is set
+                        oof = 0
+                        if rval == 1:
+                            oof = 1
+                        elif rval == 2:
+                            oof = 2
+                        elif rval == 4:
+                            oof = 3
+                        elif rval == 8:
+                            oof = 4
+                        if not oof == self._one_of_four:
+                            self._one_of_four = oof
+                            self._oof_changed = True
+                        # Call On-Change?
+                        if self._on_change:
+                            if (self._oof_changed and self._mode == SelectorMode.OneOfFour):
+                                self._on_change(SelectorChange.OneOfFour, self._one_of_four)
+                            else:
+                                change = (SelectorChange.BinaryAnd1of4 if self._binary_changed and self._oof_changed else
+                                    (SelectorChange.Binary if self._binary_changed else SelectorChange.OneOfFour))
+                                if (self._binary_changed and self._mode == SelectorMode.Binary):
+                                    self._on_change(change, self._binary_value)
+                                else:
+                                    self._on_change(change, (self._binary_value, self._one_of_four))
+                        # Clear the flags
+                        self._values_need_updating = False
+                        self._oof_changed = False
+                        self._binary_changed = False
             pass
-        finally:
-            log.debug("{} thread done.".format(threading.current_thread().name))
         return
 
     @property
@@ -211,8 +206,7 @@ class Selector:
         Stop the threads and exit.
         """
         self.shutdown()
-        if self._thread_port_checker and self._thread_port_checker.is_alive():
-            self._thread_port_checker.join(timeout=2.0)
+        self._job_port_checker = None
         if self._port and not self._port.closed:
             self._port.exit()
             self._port = None
@@ -223,6 +217,8 @@ class Selector:
         but DO NOT BLOCK.
         """
         self._shutdown.set()
+        if self._job_port_checker:
+            self._job_port_checker.cancel()
         return
 
     def start(self):  # type: () -> bool
@@ -258,8 +254,9 @@ class Selector:
                 log.log("Serial port '{}' error. Selector cannot be used.\n".format(self._portToUse), dt="")
                 raise SDSelectorNotFound(ex)
         finally:
-            if self._port is not None:
-                self._thread_port_checker.start()
+            if self._port is not None and not self._job_port_checker:
+                self._job_port_checker = scheduler.shared().every(
+                    'Selector-PortReader', self._pole_cycle_time, self._job_port_checker_body)
         return True
 
 """
@@ -34,11 +34,9 @@ SOFTWARE.
 
     Callbacks notify on error, but otherwise problems are handled by this class.
 """
-from pykob import log
+from pykob import log, scheduler
 import re  # RegEx
-import threading
-from threading import Event, Thread
-import time
+from threading import Event, Lock, Thread
 import traceback
 from typing import Any, Callable
 
@@ -95,9 +93,13 @@ class PKSerial:
         self._lg_timeout = timeout                  # type: float|None
         self._lg_write_timeout = None               # type: float|None
 
-        # Thread to check port availability and to retry connection if lost
+        # Scheduled job to check port availability and to retry connection if lost
+        self._job_portchk = None                    # type: scheduler.Job|None
+        # The port check (enumerating the ports, or opening it) is done by a thread
+        # that the job starts. The job only reads the result.
         self._thread_portchk = None                 # type: Thread|None
-        self._portchk_t = time.time()               # type: float
+        self._portchk_guard = Lock()                # type: Lock
+        self._portchk_port_present = True           # type: bool  # Result of the last check
         self._shutdown = Event()                    # type: Event
 
         self._port_requested = port                 # type: str|None
@@ -321,8 +323,7 @@ class PKSerial:
 
     def _enable_retries(self):  # type: () -> None
         if self.serial_available and self._retries_enabled and not self._shutdown.is_set():
-            self._thread_portchk = Thread(name="PKSerial-PortChk", target=self._thread_portchk_body)
-            self._thread_portchk.start()
+            self._job_portchk = scheduler.shared().every("PKSerial-PortChk", 3.2, self._job_portchk_body)
         return
 
     def _open_port(self): # type: () -> None
@@ -427,32 +428,47 @@ class PKSerial:
             self._status_callback(self._op_err_msg)
         return
 
-    def _thread_portchk_body(self):  # type: () -> None
+    def _job_portchk_body(self):  # type: () -> None
         """
-        Called by the Port Check thread 'run' to assure the port is alive, or
+        Called periodically by the shared scheduler to assure the port is alive, or
         to retry opening it.
+
+        Enumerating the ports and opening one can take a while, so that is done by
+        a thread of its own. The job acts on the result of the last check, then
+        starts the next one.
         """
-        pass  # Breakpoint location for entering
-        while not self._shutdown.is_set():
-            now = time.time()
-            if now - self._portchk_t > 3.2:
-                self._portchk_t = now
-                # If we have a port, try to access it. If we don't have a port
-                # and one was requested, try to open it.
-                if self._port is None:
-                    if self._port_requested is not None and len(self._port_requested) > 0:
-                        # try again to open it
-                        self._open_port()
-                else:
-                    # We have a port, see if we can still access it without error
-                    if not self._port_still_available(self._port_name_used):
-                        self._port.close()
-                        self._port = None
-                        self._op_err_msg = "PKSerial Error: Port {} not available".format(self._port_name_used)
-                    pass
-                pass
-            self._shutdown.wait(0.5)
-        log.debug("{} thread done.".format(threading.current_thread().name))
+        if self._shutdown.is_set():
+            return
+        with self._portchk_guard:
+            t = self._thread_portchk
+            if t and t.is_alive():
+                return  # The last check hasn't finished
+            # If we have a port, see if the last check found it still available.
+            port = self._port
+            if port is not None and not self._portchk_port_present:
+                port.close()
+                self._port = None
+                self._op_err_msg = "PKSerial Error: Port {} not available".format(self._port_name_used)
+            self._portchk_port_present = True
+            self._thread_portchk = Thread(name="PKSerial-PortChk", daemon=True, target=self._thread_portchk_body)
+            self._thread_portchk.start()
+        return
+
+    def _thread_portchk_body(self):  # type: () -> None
+        """
+        If we have a port, check that it is still available. If we don't have a
+        port and one was requested, try to open it.
+        """
+        try:
+            if self._port is None:
+                if self._port_requested is not None and len(self._port_requested) > 0:
+                    # try again to open it
+                    self._open_port()
+            else:
+                self._portchk_port_present = self._port_still_available(self._port_name_used)
+        except Exception as ex:
+            log.debug("PKSerial port check error: {}".format(ex), 2)
+            log.debug(traceback.format_exc(), 3)
         return
 
 
@@ -491,8 +507,9 @@ class PKSerial:
         if self._port and not self._port.closed:
             self._port.close()
             self._port = None
-        if self._thread_portchk:
-            self._thread_portchk.join()
+        if self._job_portchk:
+            self._job_portchk.cancel()
+            self._job_portchk = None
         log.debug("PKSerial.exit - 2", 3)
         return
 
@@ -512,6 +529,8 @@ class PKSerial:
         if not self._shutdown.is_set():
             self._shutdown.set()
             log.debug("PKSerial.shutdown", 3)
+            if self._job_portchk:
+                self._job_portchk.cancel()
             self._err_callback = self.null_err_callback
             self._status_callback = self.null_status_callback
         return
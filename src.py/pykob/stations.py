@@ -0,0 +1,186 @@
+"""
+MIT License
+
+Copyright (c) 2020-24 PyKOB - MorseKOB in Python
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+"""
+stations module
+
+Tracks the stations present on a wire (from their pings and the current sender
+updates) and keeps them in the order they are listed by the station list
+displays:
+
+    Current sender
+    Stations that haven't sent (in the order they connected)
+    Stations that have sent, from the least recent sender to the most recent
+
+Stations are indexed by name, and a heap of ping times is used to expire the
+stations that haven't pinged for `timeout` seconds, so an update costs the same
+however many stations are on the wire.
+
+The update methods return the changes to the list of stations after the current
+sender (see `others`), as `(ADDED|REMOVED, index, name)` tuples, so a display
+only needs to change those rows. Changes to the current sender are seen with
+`current_sender`. This is not thread-safe; use it from one thread (normally
+the GUI thread).
+"""
+from bisect import bisect_left, insort
+import heapq
+import time
+from typing import Optional
+
+STATION_TIMEOUT = 40.0  # Seconds without a ping before a station is removed
+
+ADDED = "added"
+REMOVED = "removed"
+
+class StationInfo:
+    """
+    What is known about a station.
+    """
+    def __init__(self, name, t_connected, t_sent, t_ping):  # type: (str, float, float, float) -> None
+        self.name = name                # type: str
+        self.t_connected = t_connected  # type: float  # When the station was first seen
+        self.t_sent = t_sent            # type: float  # When the station last sent (-1 if it hasn't)
+        self.t_ping = t_ping            # type: float  # When the station last pinged
+        return
+
+    @property
+    def has_sent(self):  # type: () -> bool
+        return self.t_sent >= 0
+
+class StationPresence:
+    """
+    The stations present on a wire.
+    """
+    def __init__(self, timeout=STATION_TIMEOUT):  # type: (float) -> None
+        self._timeout = timeout                 # type: float
+        self._stations = {}                     # type: dict[str, StationInfo]
+        self._order = []                        # type: list[tuple[int, float, str]]  # Sort keys of the others
+        self._expiry = []                       # type: list[tuple[float, str]]  # Heap of (ping time, name)
+        self._current_sender = None             # type: str|None
+        return
+
+    def __contains__(self, name):  # type: (str) -> bool
+        return name in self._stations
+
+    def __len__(self):  # type: () -> int
+        return len(self._stations)
+
+    @staticmethod
+    def _key(info):  # type: (StationInfo) -> tuple[int, float, str]
+        if info.has_sent:
+            return (1, info.t_sent, info.name)
+        return (0, info.t_connected, info.name)
+
+    def _insert(self, info):  # type: (StationInfo) -> int
+        key = self._key(info)
+        insort(self._order, key)
+        return bisect_left(self._order, key)
+
+    def _remove(self, info):  # type: (StationInfo) -> int
+        i = bisect_left(self._order, self._key(info))
+        del self._order[i]
+        return i
+
+    def _ping(self, info, now):  # type: (StationInfo, float) -> None
+        info.t_ping = now
+        heapq.heappush(self._expiry, (now, info.name))
+        return
+
+    @property
+    def current_sender(self):  # type: () -> str|None
+        return self._current_sender
+
+    @property
+    def others(self):  # type: () -> list[str]
+        """
+        The stations, other than the current sender, in order.
+        """
+        return [key[2] for key in self._order]
+
+    def active(self, name, now=None):  # type: (str, Optional[float]) -> list[tuple[str, int, str]]
+        """
+        Record that a station has pinged (it is still on the wire).
+        """
+        now = time.time() if now is None else now
+        info = self._stations.get(name)
+        if info is not None:
+            self._ping(info, now)
+            return []
+        info = StationInfo(name, now, -1, now)
+        self._stations[name] = info
+        self._ping(info, now)
+        return [(ADDED, self._insert(info), name)]
+
+    def clear(self):  # type: () -> None
+        self._stations.clear()
+        self._order.clear()
+        self._expiry.clear()
+        self._current_sender = None
+        return
+
+    def expire(self, now=None):  # type: (Optional[float]) -> list[tuple[str, int, str]]
+        """
+        Remove the stations that haven't pinged within the timeout.
+        """
+        now = time.time() if now is None else now
+        limit = now - self._timeout
+        changes = []
+        while self._expiry and self._expiry[0][0] <= limit:
+            t, name = heapq.heappop(self._expiry)
+            info = self._stations.get(name)
+            if info is None or not info.t_ping == t:
+                continue  # The station has pinged since (or was removed)
+            del self._stations[name]
+            if name == self._current_sender:
+                self._current_sender = None
+            else:
+                changes.append((REMOVED, self._remove(info), name))
+        return changes
+
+    def get(self, name):  # type: (str) -> StationInfo|None
+        return self._stations.get(name)
+
+    def sender(self, name, now=None):  # type: (str, Optional[float]) -> list[tuple[str, int, str]]
+        """
+        Record that a station is sending. It becomes the current sender, and
+        the previous sender goes to the end of the others.
+        """
+        now = time.time() if now is None else now
+        changes = []
+        info = self._stations.get(name)
+        if info is None:
+            info = StationInfo(name, now, now, now)
+            self._stations[name] = info
+            self._ping(info, now)
+        elif name == self._current_sender:
+            info.t_sent = now
+            return changes
+        else:
+            changes.append((REMOVED, self._remove(info), name))
+            info.t_sent = now
+        prev = self._stations.get(self._current_sender) if self._current_sender else None
+        if prev is not None:
+            changes.append((ADDED, self._insert(prev), prev.name))
+        self._current_sender = name
+        return changes
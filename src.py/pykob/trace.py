@@ -0,0 +1,282 @@
+"""
+MIT License
+
+Copyright (c) 2020-24 PyKOB - MorseKOB in Python
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+"""
+trace module
+
+Lightweight latency tracing for code sequences as they move through the
+system, from the key edge that completed the sequence, through the application,
+to the wire, the decoder and the display.
+
+A trace span is started when the key produces a code sequence (`begin`). The
+span is keyed by the code sequence itself, so it follows the code through
+queues and thread (and Tk event) hand-offs without changing any interfaces.
+Each stage calls `mark` with the code it is processing, which stamps the
+span with `time.perf_counter()` and feeds a per-stage histogram.
+
+Stages that don't have the code sequence available (the decoded character and
+the display of it) use `mark_latest`, which stamps the most recent span that
+has passed the preceding stage.
+
+Tracing is disabled by default, and when it is disabled each call is a single
+flag check. The histograms can be dumped at any time using `report`.
+"""
+from collections import OrderedDict
+from enum import IntEnum, unique
+from threading import Lock
+import time
+from typing import Optional, Sequence
+
+@unique
+class Stage(IntEnum):
+    KEY = 0             # KOB.key() returned the code sequence
+    FROM_KEY = 1        # The application key callback received it
+    EMIT_QUEUED = 2     # Placed in the application's emit queue
+    EMIT_DEQUEUED = 3   # Taken from the emit queue for processing
+    WIRE = 4            # Sent to the wire by Internet.write
+    DECODE = 5          # Processed by Reader.decode
+    CHAR = 6            # A character was decoded (Reader callback)
+    DISPLAY = 7         # The character was displayed
+    SOUNDER = 8         # Per edge: key edge to the sounder being driven
+
+_STAGE_NAMES = {
+    Stage.KEY: "kob.key",
+    Stage.FROM_KEY: "app.from_key",
+    Stage.EMIT_QUEUED: "app.emit_queued",
+    Stage.EMIT_DEQUEUED: "app.emit_dequeued",
+    Stage.WIRE: "internet.write",
+    Stage.DECODE: "reader.decode",
+    Stage.CHAR: "reader.char",
+    Stage.DISPLAY: "app.display",
+    Stage.SOUNDER: "kob.sounder",
+}
+
+# Histogram bucket upper bounds (milliseconds). The last bucket catches everything above.
+BUCKET_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+MAX_OPEN_SPANS = 32  # Spans that never complete are dropped oldest first
+
+class Histogram:
+    """
+    Simple fixed bucket latency histogram (values in seconds, reported in milliseconds).
+    Not thread-safe on its own; the module guard protects it.
+    """
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)  # type: list[int]
+        self.count = 0                                      # type: int
+        self.total = 0.0                                    # type: float
+        self.min = 0.0                                      # type: float
+        self.max = 0.0                                      # type: float
+        return
+
+    def add(self, secs):  # type: (float) -> None
+        ms = secs * 1000.0
+        i = 0
+        for bound in BUCKET_BOUNDS_MS:
+            if ms <= bound:
+                break
+            i += 1
+        self.buckets[i] += 1
+        if self.count == 0 or ms < self.min:
+            self.min = ms
+        if ms > self.max:
+            self.max = ms
+        self.count += 1
+        self.total += ms
+        return
+
+    @property
+    def mean(self):  # type: () -> float
+        return (self.total / self.count) if self.count > 0 else 0.0
+
+    def percentile(self, pct):  # type: (float) -> float
+        """
+        Approximate percentile (interpolated within the bucket it falls in).
+        """
+        if self.count == 0:
+            return 0.0
+        target = self.count * pct / 100.0
+        n = 0
+        for i, c in enumerate(self.buckets):
+            if c > 0 and n + c >= target:
+                lo = max(BUCKET_BOUNDS_MS[i - 1] if i > 0 else 0.0, self.min)
+                hi = min(BUCKET_BOUNDS_MS[i], self.max) if i < len(BUCKET_BOUNDS_MS) else self.max
+                return lo + (hi - lo) * ((target - n) / c)
+            n += c
+        return self.max
+
+class Span:
+    """
+    The timestamps (perf_counter) of one code sequence at each stage it has passed.
+    """
+    def __init__(self, t0):  # type: (float) -> None
+        self.t0 = t0                    # type: float
+        self.marks = {}                 # type: dict[Stage,float]
+        self.t_last = t0                # type: float
+        return
+
+    def elapsed_ms(self, stage):  # type: (Stage) -> Optional[float]
+        t = self.marks.get(stage)
+        return None if t is None else (t - self.t0) * 1000.0
+
+_enabled = False
+_guard = Lock()
+_spans = OrderedDict()  # type: OrderedDict[tuple[int,...],Span]
+_cumulative = {}  # type: dict[Stage,Histogram]
+_step = {}  # type: dict[Stage,Histogram]
+
+def enable(on=True):  # type: (bool) -> None
+    """
+    Enable (or disable) tracing.
+    """
+    global _enabled
+    _enabled = on
+    return
+
+def is_enabled():  # type: () -> bool
+    return _enabled
+
+def _record(span, stage, t):  # type: (Span, Stage, float) -> None
+    # Must be called while holding the guard
+    span.marks[stage] = t
+    h = _cumulative.get(stage)
+    if h is None:
+        h = _cumulative[stage] = Histogram()
+        _step[stage] = Histogram()
+    h.add(t - span.t0)
+    _step[stage].add(t - span.t_last)
+    span.t_last = t
+    return
+
+def begin(code, t_edge):  # type: (Sequence[int], float) -> None
+    """
+    Start a span for a code sequence produced by the key.
+
+    t_edge: The `time.perf_counter()` time of the key edge that completed the sequence.
+    """
+    if not _enabled:
+        return
+    t = time.perf_counter()
+    span = Span(t_edge)
+    with _guard:
+        key = tuple(code)
+        _spans[key] = span
+        _spans.move_to_end(key)
+        while len(_spans) > MAX_OPEN_SPANS:
+            _spans.popitem(last=False)
+        _record(span, Stage.KEY, t)
+    return
+
+def mark(code, stage):  # type: (Sequence[int], Stage) -> None
+    """
+    Stamp the span for a code sequence (if it is being traced) as having reached a stage.
+    """
+    if not _enabled:
+        return
+    t = time.perf_counter()
+    with _guard:
+        span = _spans.get(tuple(code))
+        if span is not None and stage not in span.marks:
+            _record(span, stage, t)
+    return
+
+def mark_latest(stage, after):  # type: (Stage, Stage) -> None
+    """
+    Stamp the most recent span that has reached stage 'after' but not 'stage'.
+    Used by stages that no longer have the code sequence available.
+    """
+    if not _enabled:
+        return
+    t = time.perf_counter()
+    with _guard:
+        for span in reversed(_spans.values()):
+            if stage in span.marks:
+                break
+            if after in span.marks:
+                _record(span, stage, t)
+                break
+    return
+
+def record(stage, secs):  # type: (Stage, float) -> None
+    """
+    Record a latency directly for a stage that isn't part of a span (e.g. SOUNDER).
+    """
+    if not _enabled:
+        return
+    with _guard:
+        h = _cumulative.get(stage)
+        if h is None:
+            h = _cumulative[stage] = Histogram()
+            _step[stage] = Histogram()
+        h.add(secs)
+        _step[stage].add(secs)
+    return
+
+def reset():  # type: () -> None
+    """
+    Clear all spans and histograms.
+    """
+    with _guard:
+        _spans.clear()
+        _cumulative.clear()
+        _step.clear()
+    return
+
+def report():  # type: () -> str
+    """
+    Return a text table of the histograms. 'step' is the time from the previous
+    stage of the span, the remaining columns are from the key edge.
+    """
+    lines = []
+    if not _enabled:
+        lines.append("Latency tracing is not enabled.")
+    lines.append("{:<18} {:>6} {:>9} {:>9} {:>9} {:>9} {:>9}".format(
+        "Stage (ms)", "count", "step", "mean", "p50", "p95", "max"))
+    with _guard:
+        for stage in Stage:
+            h = _cumulative.get(stage)
+            if h is None:
+                continue
+            lines.append("{:<18} {:>6} {:>9.2f} {:>9.2f} {:>9.2f} {:>9.2f} {:>9.2f}".format(
+                _STAGE_NAMES[stage], h.count, _step[stage].mean,
+                h.mean, h.percentile(50), h.percentile(95), h.max))
+    return "\n".join(lines)
+
+"""
+Test code
+"""
+if __name__ == "__main__":
+    # Self-test
+    enable()
+    for n in range(20):
+        code = (-1000, 60, -60, 180 + n)
+        t0 = time.perf_counter()
+        time.sleep(0.002)
+        begin(code, t0)
+        mark(code, Stage.FROM_KEY)
+        time.sleep(0.001)
+        mark(code, Stage.DECODE)
+        mark_latest(Stage.CHAR, Stage.DECODE)
+        mark_latest(Stage.DISPLAY, Stage.CHAR)
+        record(Stage.SOUNDER, 0.0105)
+    print(report())
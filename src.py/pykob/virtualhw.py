@@ -0,0 +1,230 @@
+"""
+MIT License
+
+Copyright (c) 2020-24 PyKOB - MorseKOB in Python
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+"""
+virtualhw module
+
+Provides a virtual (simulated) key and sounder that can be used as the hardware
+interface of a KOB instance (`kob.HWInterface.VIRTUAL`). This allows the key and
+sounder processing to be exercised, and timed, without any physical hardware.
+
+The key is driven by a script in the PyKOB code sequence format:
+    negative values - key open (space) for that many milliseconds
+    positive values - key closed (mark) for that many milliseconds
+    +1 - latch (close) the key
+    +2 - unlatch (open) the key
+
+Each change of the sounder drive is captured along with a timestamp from
+`time.perf_counter()`, as are the times the scripted key changes state. This
+allows the latency from a key transition to the sounder following it to be
+calculated.
+"""
+from bisect import bisect_right
+from threading import Lock
+import time
+from typing import Optional, Sequence
+
+class VirtualHW:
+    """
+    Virtual key and sounder.
+    """
+    def __init__(self, key_script=None, key_closed=True, end_closed=True):
+        # type: (Sequence[int]|None, bool, bool) -> None
+        """
+        key_script: Code sequence used to drive the key once `start` is called.
+        key_closed: The state of the key before the script is started.
+        end_closed: The state of the key once the script has completed.
+        """
+        self._key_closed_initial = key_closed       # type: bool
+        self._key_closed_end = end_closed           # type: bool
+        self._edge_offsets = []                     # type: list[float]  # Seconds from start
+        self._edge_states = []                      # type: list[bool]
+        self._script_len = 0.0                      # type: float  # Seconds
+        self._t_start = None                        # type: float|None
+        self._sounder_energized = False             # type: bool
+        self._sounder_events = []                   # type: list[tuple[float,bool]]
+        self._events_guard = Lock()                 # type: Lock
+        self.set_key_script(key_script if key_script else ())
+        return
+
+    @property
+    def key_script_done(self):  # type: () -> bool
+        """
+        True if the key script has been started and has run to completion.
+        """
+        t0 = self._t_start
+        return (t0 is not None) and ((time.perf_counter() - t0) >= self._script_len)
+
+    @property
+    def key_script_len(self):  # type: () -> float
+        """
+        Length of the key script in seconds.
+        """
+        return self._script_len
+
+    @property
+    def sounder_energized(self):  # type: () -> bool
+        return self._sounder_energized
+
+    @property
+    def sounder_events(self):  # type: () -> list[tuple[float,bool]]
+        """
+        Copy of the list of (timestamp, energized) sounder drive changes.
+        """
+        with self._events_guard:
+            return list(self._sounder_events)
+
+    def clear_events(self):  # type: () -> None
+        """
+        Clear the captured sounder events.
+        """
+        with self._events_guard:
+            self._sounder_events.clear()
+        return
+
+    def key_edges(self):  # type: () -> list[tuple[float,bool]]
+        """
+        List of (timestamp, closed) for the transitions of the key script since
+        it was started. The timestamps are in the `time.perf_counter()` time base.
+        """
+        t0 = self._t_start
+        if t0 is None:
+            return []
+        edges = []
+        closed = self._key_closed_initial
+        for offset, state in zip(self._edge_offsets, self._edge_states):
+            if not state == closed:
+                edges.append((t0 + offset, state))
+                closed = state
+        if not self._key_closed_end == closed:
+            edges.append((t0 + self._script_len, self._key_closed_end))
+        return edges
+
+    def key_is_closed(self):  # type: () -> bool
+        """
+        Read the key. Returns True if the key is closed.
+        """
+        t0 = self._t_start
+        if t0 is None:
+            return self._key_closed_initial
+        dt = time.perf_counter() - t0
+        if dt >= self._script_len:
+            return self._key_closed_end
+        i = bisect_right(self._edge_offsets, dt) - 1
+        if i < 0:
+            return self._key_closed_initial
+        return self._edge_states[i]
+
+    def key_to_sounder_latencies(self):  # type: () -> list[float]
+        """
+        For each key transition, the time (in seconds) until the sounder was
+        driven to the same state. Transitions the sounder didn't follow are skipped.
+        """
+        latencies = []
+        events = self.sounder_events
+        i = 0
+        for t_edge, closed in self.key_edges():
+            while i < len(events) and events[i][0] < t_edge:
+                i += 1
+            for t_evt, energized in events[i:]:
+                if energized == closed:
+                    latencies.append(t_evt - t_edge)
+                    break
+        return latencies
+
+    def set_key_script(self, key_script):  # type: (Sequence[int]) -> None
+        """
+        Set the code sequence used to drive the key. Takes effect at the next `start`.
+        """
+        offsets = []
+        states = []
+        t = 0.0
+        for c in key_script:
+            if c == 1 or c == 2:
+                offsets.append(t)
+                states.append(c == 1)
+                continue
+            offsets.append(t)
+            states.append(c > 0)
+            t += abs(c) / 1000.0
+        self._edge_offsets = offsets
+        self._edge_states = states
+        self._script_len = t
+        self._t_start = None
+        return
+
+    def sounder_energize(self, energize):  # type: (bool) -> None
+        """
+        Drive the sounder. The change is recorded with a timestamp.
+        """
+        t = time.perf_counter()
+        if not energize == self._sounder_energized:
+            self._sounder_energized = energize
+            with self._events_guard:
+                self._sounder_events.append((t, energize))
+        return
+
+    def start(self, t_start=None):  # type: (Optional[float]) -> None
+        """
+        Start driving the key from the script.
+
+        t_start: `time.perf_counter()` value to use as the script start. If None, now.
+        """
+        self._t_start = t_start if t_start is not None else time.perf_counter()
+        return
+
+    def stop(self):  # type: () -> None
+        """
+        Stop the key script. The key returns to its initial state.
+        """
+        self._t_start = None
+        return
+
+"""
+Test code
+"""
+if __name__ == "__main__":
+    # Self-test
+    import statistics
+    from pykob import kob, morse
+
+    sender = morse.Sender(20)
+    script = (-500,)
+    for c in "PARIS PARIS":
+        script += sender.encode(c)
+    script += (-500,)
+    # Start and end with the key closed (the first open will unlatch the circuit)
+    vhw = VirtualHW(script, key_closed=True, end_closed=True)
+    codes = []
+    myKOB = kob.KOB(interfaceType=kob.InterfaceType.key_sounder, useSounder=True,
+            virtual_hw=vhw, keyCallback=codes.append)
+    vhw.start()
+    time.sleep(vhw.key_script_len + 1.5)  # Allow time for the circuit to latch closed
+    myKOB.exit()
+    latencies = vhw.key_to_sounder_latencies()
+    print("Code sequences: {}".format(len(codes)))
+    print("Key transitions: {}  Sounder events: {}".format(len(vhw.key_edges()), len(vhw.sounder_events)))
+    if latencies:
+        print("Key to sounder latency (ms) - min: {:.3f}  mean: {:.3f}  max: {:.3f}".format(
+            min(latencies) * 1000, statistics.mean(latencies) * 1000, max(latencies) * 1000))